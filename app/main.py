@@ -1,9 +1,30 @@
+import asyncio
 import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.routes import extraction  # <-- tes routes
+from app.routes import extraction, jobs, health  # <-- tes routes
+from app.utils.job_service import get_job_workers
+from app.utils.warmup_service import WARMUP_ENABLED, warm_up, mark_ready
 
-app = FastAPI()
+
+# --- Démarrage / arrêt ---
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Préchauffage en tâche de fond : /health/live répond tout de suite,
+    # /health/ready seulement une fois poids, graphe YOLO et Tesseract chargés
+    warmup = asyncio.create_task(asyncio.to_thread(warm_up)) if WARMUP_ENABLED else None
+    if warmup is None:
+        mark_ready()
+    # Jobs asynchrones : reprise des fichiers en attente après un redémarrage
+    workers = get_job_workers()
+    yield
+    workers.stop()
+    if warmup is not None and not warmup.done():
+        warmup.cancel()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # --- Configuration CORS ---
 origins = [
@@ -21,6 +42,8 @@ app.add_middleware(
 
 # --- Inclusion des routes ---
 app.include_router(extraction.router, prefix="/api")
+app.include_router(jobs.router, prefix="/api")
+app.include_router(health.router)
 
 
 # --- Point d’entrée ---
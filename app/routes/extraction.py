@@ -1,129 +1,317 @@
-from fastapi import APIRouter, UploadFile, File, Body
-from fastapi.responses import JSONResponse, FileResponse
+from typing import List
+
+from fastapi import APIRouter, UploadFile, File, Form, Body, Query
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse
+from starlette.background import BackgroundTask
+import asyncio
+import json
 import os
-import shutil
 import time
 import traceback
-from pdf2image import convert_from_path
-
-from app.utils.parser import extract_bank_statement_data, detect_transactions
-from app.utils.yolo_service import extract_with_yolo_and_rules
-from app.utils.parser_saphir import extract_saphir_bank_statement_data  # ✅ parse du texte OCR
-from app.utils.excel_service import save_to_excel  # ✅ export excel
 
-import pytesseract
-from PIL import Image
+from app.utils.excel_service import save_to_excel, save_batch_to_excel  # ✅ export excel
+from app.utils.classifier_service import classify_document
+from app.utils.extraction_service import (
+    extract_document, result_cache_key, iter_document_events, events_from_result,
+)
+from app.utils.cache_service import get_result_cache
+from app.utils.ocr_service import get_ocr_cache
+from app.utils.worker_pool import get_pool, PoolSaturated, StageTimeout, EXTRACT_RETRY_AFTER
+from app.utils.upload_service import save_upload, discard_upload, expand_batch, BatchTooLarge
 
 router = APIRouter()
 
+
 # -----------------------
-# OCR Helper
+# Route principale : Extraction
 # -----------------------
-def ocr_to_text(filepath: str) -> str:
-    """
-    Convertit un fichier (pdf/image) en texte OCR brut (français),
-    en limitant les césures/lignes cassées.
-    """
-    config = "--oem 3 --psm 6"  # bloc de texte uniforme
-    if filepath.lower().endswith(".pdf"):
-        pages = convert_from_path(filepath, dpi=300)  # 300dpi : moins de “/ 24” cassés
-        text = "\n".join(pytesseract.image_to_string(p, lang="fra", config=config) for p in pages)
-    else:
-        text = pytesseract.image_to_string(Image.open(filepath), lang="fra", config=config)
+@router.post("/extract")
+async def extract_fields(file: UploadFile = File(...)):
+    data = await file.read()
+
+    # Upload déjà traité (même contenu, même modèle, mêmes parseurs) -> réponse immédiate
+    cache = get_result_cache()
+    cache_key = result_cache_key(data, file.filename)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return JSONResponse(content={"message": "Extraction réussie", **cached, "cache": "hit"})
+
+    pool = get_pool()
+    try:
+        queue_position = pool.acquire()
+    except PoolSaturated as e:
+        return JSONResponse(
+            status_code=429,
+            content={"error": str(e), "queue_position": e.queue_position},
+            headers={"Retry-After": str(EXTRACT_RETRY_AFTER)},
+        )
+
+    workdir = None
+    still_running = None  # étape expirée mais encore en cours dans le pool
+    try:
+        # Répertoire temporaire unique par requête (pas de `temp_<nom>` dans le CWD)
+        workdir, temp_path = save_upload(file.filename, data)
 
-    # Normalisation douce pour éviter les séparations bizarres
-    text = text.replace("\u00A0", " ").replace("\u202F", " ").replace("\u2009", " ")
-    return text
+        # OCR / YOLO exécutés dans le pool : la boucle asyncio reste disponible
+        # Routage rapide (en-tête page 1) : l'OCR complet ne tourne que pour le parseur choisi
+        routing = await pool.run_stage("classify", classify_document, temp_path)
+        final_data = await pool.run_stage("extract", extract_document, temp_path, routing)
+        cache.set(cache_key, {"extracted_data": final_data, "routing": routing})
+
+        return JSONResponse(content={
+            "message": "Extraction réussie",
+            "extracted_data": final_data,
+            "routing": routing,
+            "queue_position": queue_position,
+            "cache": "miss"
+        })
+
+    except StageTimeout as e:
+        still_running = e.future
+        return JSONResponse(status_code=504, content={"error": str(e), "stage": e.stage})
+
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+    finally:
+        def _finish(_=None):
+            pool.release()
+            if workdir:
+                discard_upload(workdir)
+
+        # la place n'est libérée qu'une fois le worker réellement terminé
+        if still_running is not None and not still_running.done():
+            still_running.add_done_callback(_finish)
+        else:
+            _finish()
 
 
 # -----------------------
-# Détection fichier SAFIR
+# Extraction en flux (NDJSON / SSE)
 # -----------------------
-def is_saphir_file(filepath: str) -> bool:
+STREAM_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "sse": "text/event-stream"}
+
+
+class _StreamCleanup:
     """
-    Vérifie rapidement si le fichier correspond à un relevé Saphir Consulting.
-    OCR brut + recherche de mots-clés.
+    Place dans la file + upload d'une réponse en flux, libérés une seule fois :
+    après la fin de la réponse (ou le départ du client) ET la fin réelle de
+    toute tâche encore en cours dans le pool pour ce flux.
     """
+
+    def __init__(self, pool, workdir: str):
+        self.pool = pool
+        self.workdir = workdir
+        self.running = set()
+        self.closed = False
+        self.done = False
+
+    def track(self, fut: asyncio.Future) -> None:
+        self.running.add(fut)
+        fut.add_done_callback(self._finished)
+
+    def _finished(self, fut: asyncio.Future) -> None:
+        self.running.discard(fut)
+        self._release()
+
+    def close(self) -> None:
+        self.closed = True
+        self._release()
+
+    def _release(self) -> None:
+        if self.closed and not self.running and not self.done:
+            self.done = True
+            self.pool.release()
+            discard_upload(self.workdir)
+
+
+def _encode_event(event: dict, fmt: str) -> str:
+    payload = json.dumps(event, ensure_ascii=False)
+    if fmt == "sse":
+        return f"event: {event['event']}\ndata: {payload}\n\n"
+    return payload + "\n"
+
+
+@router.post("/extract/stream")
+async def extract_fields_stream(file: UploadFile = File(...), fmt: str = Query("ndjson", alias="format")):
+    """
+    Même extraction que /extract, rendue au fil de l'eau : en-tête dès qu'un
+    champ est connu, transactions page par page ("header", "page", "done").
+    Il n'alimente pas le cache. Les relevés SAPHIR gardent les lignes envoyées
+    jusqu'à la fin (post-traitement sur le document complet) et "done" porte les
+    corrections ligne à ligne ; la voie générale n'accumule rien.
+    """
+    if fmt not in STREAM_MEDIA_TYPES:
+        return JSONResponse(status_code=400, content={"error": f"Format inconnu : {fmt} (ndjson | sse)"})
+    data = await file.read()
+
+    cached = get_result_cache().get(result_cache_key(data, file.filename))
+    if cached is not None:
+        async def replay():
+            yield _encode_event({"event": "routing", "routing": cached.get("routing"), "cache": "hit"}, fmt)
+            for event in events_from_result(cached["extracted_data"]):
+                yield _encode_event(event, fmt)
+        return StreamingResponse(replay(), media_type=STREAM_MEDIA_TYPES[fmt])
+
+    pool = get_pool()
     try:
-        text = ocr_to_text(filepath).lower()
-        return "saphir" in text or "afriland" in text
-    except Exception:
-        return False
+        queue_position = pool.acquire()
+    except PoolSaturated as e:
+        return JSONResponse(
+            status_code=429,
+            content={"error": str(e), "queue_position": e.queue_position},
+            headers={"Retry-After": str(EXTRACT_RETRY_AFTER)},
+        )
+
+    try:
+        workdir, temp_path = save_upload(file.filename, data)
+    except Exception as e:
+        pool.release()
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+    cleanup = _StreamCleanup(pool, workdir)
+
+    async def events():
+        try:
+            routing = await pool.run_stage("classify", classify_document, temp_path, track=cleanup.track)
+            yield _encode_event({"event": "routing", "routing": routing,
+                                 "queue_position": queue_position, "cache": "miss"}, fmt)
+            gen = iter_document_events(temp_path, routing)
+            async for event in pool.iterate_stage("extract", gen, track=cleanup.track):
+                yield _encode_event(event, fmt)
+        except StageTimeout as e:
+            yield _encode_event({"event": "error", "error": str(e), "stage": e.stage}, fmt)
+        except Exception as e:
+            yield _encode_event({"event": "error", "error": str(e)}, fmt)
+        finally:
+            # client parti (CancelledError) : rien n'est libéré tant qu'un
+            # `next(gen)` ou le classement tourne encore dans le pool
+            cleanup.close()
+
+    # tâche de fond : couvre aussi une réponse dont le corps n'a jamais démarré
+    return StreamingResponse(events(), media_type=STREAM_MEDIA_TYPES[fmt],
+                             background=BackgroundTask(cleanup.close))
 
 
 # -----------------------
-# Route principale : Extraction
+# Extraction groupée (plusieurs fichiers et/ou ZIP)
 # -----------------------
-@router.post("/extract")
-async def extract_fields(file: UploadFile = File(...)):
-    temp_path = f"temp_{file.filename}"
-    with open(temp_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+async def _extract_one(pool, filename: str, data: bytes) -> dict:
+    """Un relevé du lot ; une erreur n'interrompt pas les autres."""
+    cache = get_result_cache()
+    cache_key = result_cache_key(data, filename)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return {"filename": filename, "status": "ok", **cached, "cache": "hit"}
 
+    workdir = None
+    still_running = None
     try:
-        # === Cas spécifique SAFIR ===
-        if is_saphir_file(temp_path):
-            text = ocr_to_text(temp_path)   # ✅ OCR brut
-            final_data = extract_saphir_bank_statement_data(text)  # ✅ on passe le texte
-
-        else:
-            # === Cas général YOLO ===
-            image_paths = []
-            if file.filename.lower().endswith(".pdf"):
-                pages = convert_from_path(temp_path)
-                for i, img in enumerate(pages):
-                    p = f"{temp_path}_p{i+1}.png"
-                    img.save(p)
-                    image_paths.append(p)
+        workdir, temp_path = save_upload(filename, data)
+        routing = await pool.run_stage("classify", classify_document, temp_path)
+        final_data = await pool.run_stage("extract", extract_document, temp_path, routing)
+        cache.set(cache_key, {"extracted_data": final_data, "routing": routing})
+        return {"filename": filename, "status": "ok", "extracted_data": final_data,
+                "routing": routing, "cache": "miss"}
+    except StageTimeout as e:
+        still_running = e.future
+        return {"filename": filename, "status": "error", "error": str(e), "stage": e.stage}
+    except Exception as e:
+        return {"filename": filename, "status": "error", "error": str(e)}
+    finally:
+        if workdir:
+            if still_running is not None and not still_running.done():
+                still_running.add_done_callback(lambda _, d=workdir: discard_upload(d))
             else:
-                image_paths = [temp_path]
-
-            final_data = {
-                "banque": None,
-                "compte": None,
-                "titulaire": None,
-                "periode": None,
-                "transactions": []
-            }
-
-            for ipath in image_paths:
-                page_data = extract_with_yolo_and_rules(
-                    ipath,
-                    regex_fallback_fn=extract_bank_statement_data,
-                    parse_transactions_fn=detect_transactions
-                )
-
-                for k in ["banque", "compte", "titulaire", "periode"]:
-                    if not final_data[k] and page_data.get(k):
-                        final_data[k] = page_data[k]
-
-                if page_data.get("transactions"):
-                    final_data["transactions"].extend(page_data["transactions"])
+                discard_upload(workdir)
 
-        return JSONResponse(content={
-            "message": "Extraction réussie",
-            "extracted_data": final_data
-        })
 
+@router.post("/extract/batch")
+async def extract_batch(files: List[UploadFile] = File(...), excel: bool = Form(False)):
+    """
+    Plusieurs relevés (fichiers et/ou archives ZIP) en une requête : une place
+    dans la file, plus les workers encore libres à l'admission ; autant de
+    relevés traités à la fois que de places tenues, et les pages de ces
+    documents alimentent les mêmes lots YOLO (micro-batcher).
+    `excel=true` : un classeur, une feuille par relevé, au lieu du JSON.
+    """
+    try:
+        documents = expand_batch([(f.filename, await f.read()) for f in files])
+    except BatchTooLarge as e:
+        return JSONResponse(status_code=413, content={"error": str(e)})
     except Exception as e:
-        return JSONResponse(status_code=500, content={"error": str(e)})
+        return JSONResponse(status_code=400, content={"error": f"Lot illisible : {e}"})
+    if not documents:
+        return JSONResponse(status_code=400, content={"error": "Aucun relevé dans l'envoi"})
+
+    pool = get_pool()
+    try:
+        queue_position = pool.acquire()
+    except PoolSaturated as e:
+        return JSONResponse(
+            status_code=429,
+            content={"error": str(e), "queue_position": e.queue_position},
+            headers={"Retry-After": str(EXTRACT_RETRY_AFTER)},
+        )
+
+    # un lot de 50 relevés ne doit pas occuper plus de workers qu'il n'a de places
+    held = 1 + pool.acquire_idle(min(len(documents), pool.workers) - 1)
+    running = asyncio.Semaphore(held)
 
+    async def _bounded(name: str, data: bytes) -> dict:
+        async with running:
+            return await _extract_one(pool, name, data)
+
+    try:
+        results = await asyncio.gather(*(_bounded(name, data) for name, data in documents))
     finally:
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
-        for f in os.listdir():
-            if f.startswith(temp_path) and f.endswith(".png"):
-                try:
-                    os.remove(f)
-                except:
-                    pass
+        for _ in range(held):
+            pool.release()
+
+    if excel:
+        ok = [(r["filename"], r["extracted_data"]) for r in results if r["status"] == "ok"]
+        if not ok:
+            return JSONResponse(status_code=500, content={"error": "Aucun relevé extrait", "documents": results})
+        out_name = f"releves_{int(time.time())}.xlsx"
+        out_path = os.path.join("exports", out_name)
+        await asyncio.to_thread(save_batch_to_excel, ok, out_path)
+        return FileResponse(
+            path=out_path,
+            filename=out_name,
+            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        )
+
+    return JSONResponse(content={
+        "message": "Extraction réussie",
+        "documents": results,
+        "queue_position": queue_position,
+    })
+
+
+# -----------------------
+# Statistiques des caches (résultats complets / OCR par page)
+# -----------------------
+@router.get("/cache/stats")
+async def cache_stats():
+    return {"results": get_result_cache().stats(), "ocr": get_ocr_cache().stats()}
+
+
+# -----------------------
+# Temps passé par étape de prétraitement (par profil)
+# -----------------------
+@router.get("/preprocess/stats")
+async def preprocess_timings():
+    from app.utils.preprocess_service import preprocess_stats  # cv2 : import différé
+    return preprocess_stats()
 
 
 # -----------------------
 # Export Excel (Téléchargement direct)
 # -----------------------
+# `def` (et non `async def`) : FastAPI l'exécute dans son threadpool, l'écriture
+# xlsx ne bloque donc pas la boucle asyncio
 @router.post("/export-excel-from-json")
-async def export_excel_from_json(data: dict = Body(...)):
+def export_excel_from_json(data: dict = Body(...)):
     try:
         os.makedirs("exports", exist_ok=True)
 
@@ -0,0 +1,25 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from app.utils.warmup_service import warmup_state
+
+router = APIRouter()
+
+
+# -----------------------
+# Vivacité : le processus répond
+# -----------------------
+@router.get("/health/live")
+async def live():
+    return {"status": "ok"}
+
+
+# -----------------------
+# Disponibilité : modèles chargés (le load balancer n'envoie rien avant)
+# -----------------------
+@router.get("/health/ready")
+async def ready():
+    state = warmup_state()
+    if not state["ready"]:
+        return JSONResponse(status_code=503, content={"status": "warming_up" if not state["error"] else "error", **state})
+    return {"status": "degraded" if state["degraded"] else "ready", **state}
@@ -0,0 +1,59 @@
+from typing import List
+
+from fastapi import APIRouter, UploadFile, File, Form
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+
+from app.utils.job_service import JobNotFound, get_job_store, get_job_workers
+
+router = APIRouter()
+
+
+# -----------------------
+# Soumission d'un job (un ou plusieurs fichiers)
+# -----------------------
+@router.post("/jobs")
+async def submit_job(files: List[UploadFile] = File(...), priority: int = Form(0)):
+    try:
+        uploads = [(f.filename, await f.read()) for f in files]
+        # écritures disque + SQLite hors de la boucle asyncio
+        status = await run_in_threadpool(_submit, uploads, priority)
+        return JSONResponse(status_code=202, content=status)
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+
+def _submit(uploads, priority: int) -> dict:
+    store = get_job_store()
+    job_id = store.submit(uploads, priority=priority)
+    get_job_workers().notify()
+    return store.status(job_id)
+
+
+# -----------------------
+# État / progression
+# -----------------------
+@router.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    try:
+        return get_job_store().status(job_id)
+    except JobNotFound:
+        return JSONResponse(status_code=404, content={"error": f"Job inconnu : {job_id}"})
+
+
+# -----------------------
+# Résultat (une entrée par fichier, dans l'ordre d'envoi)
+# -----------------------
+@router.get("/jobs/{job_id}/result")
+def job_result(job_id: str):
+    store = get_job_store()
+    try:
+        status = store.status(job_id)
+    except JobNotFound:
+        return JSONResponse(status_code=404, content={"error": f"Job inconnu : {job_id}"})
+    if status["status"] in ("queued", "running"):
+        return JSONResponse(
+            status_code=409,
+            content={"error": "Job en cours", "status": status["status"], "progress": status["progress"]},
+        )
+    return {"job_id": job_id, "status": status["status"], "results": store.results(job_id)}
@@ -0,0 +1,153 @@
+# app/utils/cache_service.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+# ⚙️ CONFIG — cache des résultats d'extraction (uploads identiques)
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "256"))     # entrées en mémoire
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "86400"))   # secondes ; 0 = sans expiration
+RESULT_CACHE_DB = os.getenv("RESULT_CACHE_DB") or None             # ex: "cache/results.sqlite"
+RESULT_CACHE_DISK_SIZE = int(os.getenv("RESULT_CACHE_DISK_SIZE", "5000"))
+
+# À incrémenter dès qu'un parseur / une règle change le résultat produit
+PARSER_VERSION = "2025.08-4"
+
+
+def sha256_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class TieredCache:
+    """
+    Cache clé -> valeur JSON-sérialisable :
+      - niveau mémoire LRU borné (`max_items`) avec TTL,
+      - niveau disque SQLite optionnel (`db_path`), borné à `disk_max_items`.
+    Thread-safe ; compteurs hits / misses exposés par `stats()`.
+    """
+
+    def __init__(self, name: str, max_items: int, ttl: float = 0,
+                 db_path: Optional[str] = None, disk_max_items: int = 0):
+        self.name = name
+        self.max_items = max(0, max_items)
+        self.ttl = ttl
+        self.db_path = db_path
+        self.disk_max_items = disk_max_items
+        self._mem: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "disk_hits": 0, "misses": 0, "sets": 0, "evictions": 0}
+        if self.db_path:
+            self._init_db()
+
+    # ---- niveau disque ----
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=5)
+
+    def _init_db(self) -> None:
+        folder = os.path.dirname(self.db_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with self._connect() as con:
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                " ns TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,"
+                " expires REAL, accessed REAL, PRIMARY KEY (ns, key))"
+            )
+
+    def _disk_get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._connect() as con:
+            row = con.execute(
+                "SELECT value, expires FROM cache WHERE ns = ? AND key = ?", (self.name, key)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] and row[1] < now:
+                con.execute("DELETE FROM cache WHERE ns = ? AND key = ?", (self.name, key))
+                return None
+            con.execute("UPDATE cache SET accessed = ? WHERE ns = ? AND key = ?", (now, self.name, key))
+        return json.loads(row[0])
+
+    def _disk_set(self, key: str, value: Any) -> None:
+        now = time.time()
+        expires = now + self.ttl if self.ttl else None
+        with self._connect() as con:
+            con.execute(
+                "INSERT OR REPLACE INTO cache (ns, key, value, expires, accessed) VALUES (?, ?, ?, ?, ?)",
+                (self.name, key, json.dumps(value, ensure_ascii=False), expires, now),
+            )
+            con.execute("DELETE FROM cache WHERE ns = ? AND expires IS NOT NULL AND expires < ?", (self.name, now))
+            if self.disk_max_items:
+                # LRU disque : on ne garde que les plus récemment lues
+                con.execute(
+                    "DELETE FROM cache WHERE ns = ? AND key NOT IN ("
+                    " SELECT key FROM cache WHERE ns = ? ORDER BY accessed DESC LIMIT ?)",
+                    (self.name, self.name, self.disk_max_items),
+                )
+
+    # ---- API ----
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            item = self._mem.get(key)
+            if item is not None:
+                expires, value = item
+                if not expires or expires >= now:
+                    self._mem.move_to_end(key)
+                    self.counters["hits"] += 1
+                    return value
+                del self._mem[key]
+
+        value = self._disk_get(key) if self.db_path else None
+        with self._lock:
+            if value is None:
+                self.counters["misses"] += 1
+                return None
+            self.counters["disk_hits"] += 1
+            self._mem_set(key, value)
+        return value
+
+    def _mem_set(self, key: str, value: Any) -> None:
+        if not self.max_items:
+            return
+        expires = time.time() + self.ttl if self.ttl else None
+        self._mem[key] = (expires, value)
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_items:
+            self._mem.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self.counters["sets"] += 1
+            self._mem_set(key, value)
+        if self.db_path:
+            self._disk_set(key, value)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["disk_hits"] + self.counters["misses"]
+            hit_rate = (self.counters["hits"] + self.counters["disk_hits"]) / lookups if lookups else 0.0
+            return {
+                **self.counters,
+                "size": len(self._mem),
+                "max_items": self.max_items,
+                "disk": bool(self.db_path),
+                "hit_rate": round(hit_rate, 3),
+            }
+
+
+_result_cache: Optional[TieredCache] = None
+
+def get_result_cache() -> TieredCache:
+    global _result_cache
+    if _result_cache is None:
+        _result_cache = TieredCache(
+            "results", RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL,
+            db_path=RESULT_CACHE_DB, disk_max_items=RESULT_CACHE_DISK_SIZE,
+        )
+    return _result_cache
@@ -0,0 +1,116 @@
+# app/utils/classifier_service.py
+import os
+import time
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+from app.utils.document_service import OCR_DPI, normalize_text, read_text_layer
+from app.utils.ocr_service import ocr_string
+
+# ⚙️ CONFIG — pré-classification rapide (bandeau haut de la page 1 seulement)
+CLASSIFY_DPI = int(os.getenv("CLASSIFY_DPI", "100"))
+CLASSIFY_BAND = float(os.getenv("CLASSIFY_BAND", "0.35"))  # part de la hauteur lue
+CLASSIFY_MIN_CONFIDENCE = float(os.getenv("CLASSIFY_MIN_CONFIDENCE", "0.5"))
+CLASSIFY_IMAGE_WIDTH = 850  # largeur d'un A4 à ~100dpi pour les images envoyées telles quelles
+
+MIN_TEXT_CHARS = 20  # en dessous : lecture jugée inexploitable
+
+# Marqueurs pondérés par modèle de relevé (score plafonné à 1.0)
+TEMPLATES: Dict[str, Dict] = {
+    "saphir": {
+        "banque": "AFRILAND FIRST BANK",
+        "markers": {
+            "afriland": 0.6,
+            "saphir": 0.6,
+            "safir consulting": 0.6,
+            "extrait de compte": 0.2,
+            "débit (xaf)": 0.2,
+        },
+    },
+}
+GENERIC = "generic"
+
+
+def _first_page_band(filepath: str, dpi: int = CLASSIFY_DPI,
+                     max_width: Optional[int] = CLASSIFY_IMAGE_WIDTH) -> "Image.Image":
+    # rasterisation importée à la demande : inutile quand la couche texte suffit
+    from pdf2image import convert_from_path
+    from PIL import Image
+
+    if filepath.lower().endswith(".pdf"):
+        img = convert_from_path(filepath, dpi=dpi, first_page=1, last_page=1, grayscale=True)[0]
+    else:
+        img = Image.open(filepath).convert("L")
+        if max_width and img.width > max_width:
+            ratio = max_width / img.width
+            img = img.resize((max_width, max(1, int(img.height * ratio))))
+    return img.crop((0, 0, img.width, max(1, int(img.height * CLASSIFY_BAND))))
+
+
+def _read_header_text(filepath: str) -> Tuple[str, str]:
+    """
+    Texte de l'en-tête de la page 1 : couche texte PDF si disponible,
+    sinon OCR basse résolution du seul bandeau haut.
+    """
+    text = read_text_layer(filepath, first_page=1, last_page=1)
+    if len(text.strip()) >= MIN_TEXT_CHARS:
+        return text, "text_layer"
+    band = _first_page_band(filepath)
+    text = ocr_string(band, lang="fra", config="--oem 3 --psm 6", prep="band")
+    return normalize_text(text), "ocr_band"
+
+
+def read_header_band(filepath: str) -> str:
+    """
+    Bandeau haut de la page 1 à pleine résolution (OCR_DPI) : confirmation d'un
+    pré-classement douteux sans OCR des pages entières.
+    """
+    band = _first_page_band(filepath, dpi=OCR_DPI, max_width=None)
+    return normalize_text(ocr_string(band, lang="fra", config="--oem 3 --psm 6", prep="band_full"))
+
+
+def score_templates(text: str) -> Dict[str, float]:
+    low = text.lower()
+    scores = {}
+    for name, tpl in TEMPLATES.items():
+        score = sum(w for kw, w in tpl["markers"].items() if kw in low)
+        scores[name] = min(1.0, score)
+    return scores
+
+
+def classify_document(filepath: str) -> Dict:
+    """
+    Devine la banque / le modèle de relevé en quelques dizaines de ms, avant
+    tout OCR complet. Retourne {"template", "banque", "confidence", "source", "elapsed_ms"}.
+    Une confiance < CLASSIFY_MIN_CONFIDENCE signifie « à confirmer par l'OCR complet ».
+    """
+    t0 = time.perf_counter()
+    try:
+        text, source = _read_header_text(filepath)
+    except Exception:
+        text, source = "", "error"
+
+    scores = score_templates(text)
+    best = max(scores, key=scores.get) if scores else None
+    if best and scores[best] >= CLASSIFY_MIN_CONFIDENCE:
+        template, banque, confidence = best, TEMPLATES[best]["banque"], scores[best]
+    elif len(text.strip()) >= MIN_TEXT_CHARS:
+        # en-tête lisible sans marqueur suffisant -> modèle générique, d'autant
+        # moins sûr que le score approche du seuil ; en OCR basse résolution, un
+        # logo mal lu ne prouve rien : on reste sous le seuil pour que le SAPHIR
+        # soit confirmé (ou écarté) sur le bandeau de la page 1 à pleine résolution
+        template, banque = GENERIC, None
+        near = scores[best] / CLASSIFY_MIN_CONFIDENCE if best and CLASSIFY_MIN_CONFIDENCE > 0 else 0.0
+        confidence = 0.9 * (1.0 - near) if source == "text_layer" else CLASSIFY_MIN_CONFIDENCE * 0.8
+    else:
+        template, banque, confidence = GENERIC, None, 0.0
+
+    return {
+        "template": template,
+        "banque": banque,
+        "confidence": round(confidence, 2),
+        "source": source,
+        "elapsed_ms": round((time.perf_counter() - t0) * 1000, 1),
+    }
@@ -0,0 +1,358 @@
+# app/utils/document_service.py
+import os
+import subprocess
+import xml.etree.ElementTree as ET
+from typing import TYPE_CHECKING, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+# cv2 / numpy / pdf2image / PIL : importés à la première rasterisation seulement
+# (les pages à couche texte et le démarrage de l'API n'en ont pas besoin)
+if TYPE_CHECKING:
+    import numpy as np
+    from PIL import Image
+
+from app.utils.worker_pool import imap_pages, map_pages
+from app.utils.ocr_service import ocr_data  # OCR mis en cache par raster
+
+# ⚙️ CONFIG — une seule rasterisation / un seul OCR par page, partagés par toute la chaîne
+OCR_DPI = int(os.getenv("OCR_DPI", "300"))  # 300dpi : moins de “/ 24” cassés
+OCR_LANG = os.getenv("OCR_LANG", "fra")
+OCR_CONFIG = "--oem 3 --psm 6"  # bloc de texte uniforme
+
+SAPHIR_MARKERS = ("saphir", "afriland")
+
+# Rendu adaptatif : YOLO n'a besoin que de ~640px ; seules les zones détectées
+# sont re-rendues à OCR_DPI (options de recadrage de pdftoppm)
+DETECT_SIZE = int(os.getenv("DETECT_SIZE", "640"))  # plus grand côté de l'image de détection
+REGION_RENDERING = os.getenv("REGION_RENDERING", "1") == "1"
+
+MIN_TEXT_LAYER_CHARS = 20  # en dessous, la page est considérée comme scannée -> OCR
+XHTML_NS = "{http://www.w3.org/1999/xhtml}"
+
+
+class Word(NamedTuple):
+    """Mot OCR avec sa boîte en pixels (repère de l'image de la page)."""
+    text: str
+    x1: int
+    y1: int
+    x2: int
+    y2: int
+    line_key: Tuple[int, int, int]  # (block_num, par_num, line_num) Tesseract
+    conf: float
+
+
+def normalize_text(text: str) -> str:
+    # Normalisation douce pour éviter les séparations bizarres
+    return text.replace("\u00A0", " ").replace("\u202F", " ").replace("\u2009", " ")
+
+
+def words_from_data(data: Dict) -> List[Word]:
+    """Convertit la sortie `image_to_data(..., output_type=Output.DICT)` en liste de `Word`."""
+    words: List[Word] = []
+    for i in range(len(data["text"])):
+        text = normalize_text(data["text"][i] or "").strip()
+        if not text:
+            continue
+        x, y = int(data["left"][i]), int(data["top"][i])
+        w, h = int(data["width"][i]), int(data["height"][i])
+        key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+        words.append(Word(text, x, y, x + w, y + h, key, float(data["conf"][i])))
+    return words
+
+
+def lines_from_words(words: List[Word]) -> List[str]:
+    """Regroupe les mots par ligne Tesseract, dans l'ordre de lecture."""
+    lines: Dict[Tuple[int, int, int], List[str]] = {}
+    for w in words:
+        lines.setdefault(w.line_key, []).append(w.text)
+    return [" ".join(v) for v in lines.values()]
+
+
+def group_words_into_lines(words: List[Word]) -> List[Word]:
+    """
+    Regroupe des mots positionnés (couche texte PDF) en lignes visuelles :
+    tri par centre vertical, tolérance d'une demi-hauteur de mot, puis tri
+    par x dans chaque ligne. Les colonnes d'un tableau se retrouvent ainsi
+    sur une même ligne, comme avec l'OCR psm 6. O(n log n).
+    """
+    if not words:
+        return []
+    heights = sorted(max(1, w.y2 - w.y1) for w in words)
+    tol = heights[len(heights) // 2] / 2.0
+
+    rows: List[List[Word]] = []
+    row_center = None
+    for w in sorted(words, key=lambda w: (w.y1 + w.y2) / 2.0):
+        yc = (w.y1 + w.y2) / 2.0
+        if rows and abs(yc - row_center) <= tol:
+            rows[-1].append(w)
+            row_center += (yc - row_center) / len(rows[-1])
+        else:
+            rows.append([w])
+            row_center = yc
+
+    out: List[Word] = []
+    for n, row in enumerate(rows, start=1):
+        out.extend(w._replace(line_key=(1, 1, n)) for w in sorted(row, key=lambda w: w.x1))
+    return out
+
+
+# -----------------------
+# Couche texte PDF
+# -----------------------
+def read_text_layer(filepath: str, first_page: int = 1, last_page: Optional[int] = None) -> str:
+    """
+    Texte embarqué d'un PDF (pdftotext / poppler, déjà requis par pdf2image).
+    Renvoie "" si le PDF n'a pas de couche texte ou si l'outil est indisponible.
+    """
+    if not filepath.lower().endswith(".pdf"):
+        return ""
+    cmd = ["pdftotext", "-layout", "-f", str(first_page)]
+    if last_page is not None:
+        cmd += ["-l", str(last_page)]
+    cmd += [filepath, "-"]
+    try:
+        out = subprocess.run(cmd, capture_output=True, timeout=10, check=True).stdout
+    except (OSError, subprocess.SubprocessError):
+        return ""
+    return normalize_text(out.decode("utf-8", errors="ignore"))
+
+
+def parse_bbox_layout(xhtml: str, dpi: int = OCR_DPI) -> List[Tuple[List[Word], Tuple[float, float]]]:
+    """
+    Parse la sortie `pdftotext -bbox` : par page, les mots (coordonnées converties
+    des points PDF, 1/72 pouce, en pixels à `dpi`) et la taille de la page en points.
+    """
+    scale = dpi / 72.0
+    root = ET.fromstring(xhtml)
+    pages: List[Tuple[List[Word], Tuple[float, float]]] = []
+    for page_el in root.iter(f"{XHTML_NS}page"):
+        size = (float(page_el.get("width", 0)), float(page_el.get("height", 0)))
+        words = []
+        for w in page_el.iter(f"{XHTML_NS}word"):
+            text = normalize_text(w.text or "").strip()
+            if not text:
+                continue
+            words.append(Word(
+                text,
+                int(float(w.get("xMin")) * scale), int(float(w.get("yMin")) * scale),
+                int(float(w.get("xMax")) * scale), int(float(w.get("yMax")) * scale),
+                (1, 1, 0), 100.0,
+            ))
+        pages.append((group_words_into_lines(words), size))
+    return pages
+
+
+def read_text_layer_words(filepath: str, dpi: int = OCR_DPI) -> Optional[List[Tuple[List[Word], Tuple[float, float]]]]:
+    """
+    Mots de la couche texte et taille (points) de chaque page — y compris des
+    pages scannées, sans mots. None si pdftotext est indisponible / échoue.
+    """
+    try:
+        out = subprocess.run(
+            ["pdftotext", "-bbox", filepath, "-"],
+            capture_output=True, timeout=30, check=True,
+        ).stdout
+        return parse_bbox_layout(out.decode("utf-8", errors="ignore"), dpi=dpi)
+    except (OSError, subprocess.SubprocessError, ET.ParseError):
+        return None
+
+
+def has_usable_text(words: List[Word]) -> bool:
+    return sum(len(w.text) for w in words) >= MIN_TEXT_LAYER_CHARS
+
+
+# -----------------------
+# Page / Document
+# -----------------------
+class Page:
+    """
+    Une page du document. Le raster est produit à la demande, une seule fois.
+    Les mots viennent de la couche texte PDF (`origin="text_layer"`) ou de
+    l'OCR (`origin="ocr"`), calculé au plus une fois puis mémorisé.
+    """
+
+    def __init__(self, index: int, image: Optional["Image.Image"] = None,
+                 source: Optional[str] = None, words: Optional[List[Word]] = None,
+                 dpi: int = OCR_DPI, size_pts: Optional[Tuple[float, float]] = None):
+        self.index = index
+        self.source = source
+        self.dpi = dpi
+        self.size_pts = size_pts  # (largeur, hauteur) en points PDF, si connue
+        self._image = image
+        self._array: Optional["np.ndarray"] = None
+        self._detect_array: Optional["np.ndarray"] = None
+        self._words = words
+        self.origin = "text_layer" if words is not None else "ocr"
+
+    @property
+    def image(self) -> "Image.Image":
+        if self._image is None:
+            from pdf2image import convert_from_path
+            self._image = convert_from_path(
+                self.source, dpi=self.dpi, first_page=self.index + 1, last_page=self.index + 1
+            )[0]
+        return self._image
+
+    @property
+    def array(self) -> "np.ndarray":
+        """Raster BGR (convention OpenCV / YOLO), décodé une seule fois, jamais écrit sur disque."""
+        if self._array is None:
+            import cv2
+            import numpy as np
+            rgb = np.asarray(self.image.convert("RGB"))
+            self._array = cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)
+        return self._array
+
+    @property
+    def has_image(self) -> bool:
+        return self._image is not None
+
+    @property
+    def can_render_regions(self) -> bool:
+        return bool(REGION_RENDERING and self.source and self.source.lower().endswith(".pdf")
+                    and self.size_pts and max(self.size_pts) > 0)
+
+    @property
+    def detect_dpi(self) -> int:
+        """Résolution donnant ~DETECT_SIZE px sur le plus grand côté."""
+        return max(1, int(round(DETECT_SIZE * 72.0 / max(self.size_pts))))
+
+    @property
+    def detect_array(self) -> "np.ndarray":
+        """Raster BGR basse résolution pour YOLO (la page à OCR_DPI n'est pas rendue)."""
+        if self._detect_array is None:
+            import cv2
+            import numpy as np
+            from pdf2image import convert_from_path
+            img = convert_from_path(
+                self.source, dpi=self.detect_dpi, first_page=self.index + 1, last_page=self.index + 1
+            )[0]
+            self._detect_array = cv2.cvtColor(np.asarray(img.convert("RGB")), cv2.COLOR_RGB2BGR)
+        return self._detect_array
+
+    def render_region(self, xyxy: Tuple[int, int, int, int]) -> "np.ndarray":
+        """
+        Zone (x1, y1, x2, y2) en pixels à `self.dpi`, rendue seule par pdftoppm
+        (-x/-y/-W/-H) ; BGR. Évite de rasteriser toute la page à 300dpi.
+        """
+        x1, y1, x2, y2 = [max(0, int(v)) for v in xyxy]
+        cmd = [
+            "pdftoppm", "-f", str(self.index + 1), "-l", str(self.index + 1),
+            "-r", str(self.dpi), "-x", str(x1), "-y", str(y1),
+            "-W", str(max(1, x2 - x1)), "-H", str(max(1, y2 - y1)),
+            "-png", self.source,
+        ]
+        out = subprocess.run(cmd, capture_output=True, timeout=60, check=True).stdout
+        import cv2
+        import numpy as np
+        img = cv2.imdecode(np.frombuffer(out, np.uint8), cv2.IMREAD_COLOR)
+        if img is None:
+            raise ValueError(f"Rendu de zone impossible (page {self.index + 1})")
+        return img
+
+    @property
+    def words(self) -> List[Word]:
+        if self._words is None:
+            data = ocr_data(self.image, lang=OCR_LANG, config=OCR_CONFIG, prep="page")
+            self._words = words_from_data(data)
+        return self._words
+
+    @property
+    def has_words(self) -> bool:
+        """Mots déjà connus (couche texte ou OCR déjà fait), sans déclencher d'OCR."""
+        return self._words is not None
+
+    @property
+    def lines(self) -> List[str]:
+        return lines_from_words(self.words)
+
+    def __getstate__(self):
+        # vers un processus fils : une page PDF y est re-rendue plutôt que transférée
+        state = self.__dict__.copy()
+        if self.source and self.source.lower().endswith(".pdf"):
+            state["_image"] = None
+            state["_array"] = None
+            state["_detect_array"] = None
+        return state
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.lines)
+
+
+class Document:
+    def __init__(self, filepath: str, pages: List[Page]):
+        self.filepath = filepath
+        self.pages = pages
+
+    @property
+    def is_pdf(self) -> bool:
+        return self.filepath.lower().endswith(".pdf")
+
+    @property
+    def is_born_digital(self) -> bool:
+        return all(p.origin == "text_layer" for p in self.pages)
+
+    def ocr_all(self) -> None:
+        """OCR en parallèle des pages qui n'ont pas encore de mots."""
+        pending = [p for p in self.pages if not p.has_words]
+        for page, words in zip(pending, map_pages(page_words, pending)):
+            page._words = words
+
+    @property
+    def text(self) -> str:
+        self.ocr_all()
+        return "\n".join(p.text for p in self.pages)
+
+    def iter_texts(self) -> Iterator[str]:
+        """Texte de chaque page, dans l'ordre, dès qu'elle est prête (OCR des pages en parallèle)."""
+        pending = [p for p in self.pages if not p.has_words]
+        results = imap_pages(page_words, pending)
+        for page in self.pages:
+            if not page.has_words:
+                page._words = next(results)
+            yield page.text
+
+    def is_saphir(self) -> bool:
+        low = self.text.lower()
+        return any(m in low for m in SAPHIR_MARKERS)
+
+
+def page_words(page: Page) -> List[Word]:
+    return page.words
+
+
+def load_pages(filepath: str, dpi: int = OCR_DPI) -> List[Page]:
+    """
+    PDF : la couche texte est utilisée page par page quand elle est exploitable ;
+    seules les autres pages seront rasterisées (à la demande) puis OCRisées.
+    """
+    if not filepath.lower().endswith(".pdf"):
+        from PIL import Image
+        return [Page(0, Image.open(filepath), dpi=dpi)]
+
+    layer = read_text_layer_words(filepath, dpi=dpi)
+    if not layer:
+        # pdftotext absent / en échec : un seul appel pdftoppm pour tout le document
+        from pdf2image import convert_from_path
+        images = convert_from_path(filepath, dpi=dpi)
+        return [Page(i, img, source=filepath, dpi=dpi) for i, img in enumerate(images)]
+
+    # Rasters produits à la demande, à la résolution utile (détection, zones ou page entière)
+    return [
+        Page(i, source=filepath, words=words if has_usable_text(words) else None, dpi=dpi, size_pts=size)
+        for i, (words, size) in enumerate(layer)
+    ]
+
+
+def analyze_document(filepath: str, ocr: bool = True) -> Document:
+    """
+    Rasterise et OCRise chaque page une seule fois (sauf pages à couche texte,
+    jamais rasterisées pour le texte). Le `Document` obtenu est partagé par la
+    détection de banque, le parseur SAPHIR et la voie YOLO.
+    Avec `ocr=False`, l'OCR n'est lancé qu'à la première lecture du texte.
+    """
+    doc = Document(filepath, load_pages(filepath))
+    if ocr:
+        doc.ocr_all()  # OCR unique de chaque page, pages en parallèle
+    return doc
@@ -1,5 +1,9 @@
 import xlsxwriter
 import os
+import re
+from typing import List, Tuple
+
+from app.utils.models import StatementHeader, as_transaction
 
 def save_to_excel(data: dict, output_path: str):
     """
@@ -9,7 +13,40 @@ def save_to_excel(data: dict, output_path: str):
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
 
     workbook = xlsxwriter.Workbook(output_path)
-    worksheet = workbook.add_worksheet("Relevé")
+    write_statement_sheet(workbook, "Relevé", data)
+    workbook.close()
+
+
+def save_batch_to_excel(documents: List[Tuple[str, dict]], output_path: str):
+    """
+    Un classeur, une feuille par relevé (même mise en page que `save_to_excel`).
+    `documents` : [(nom du fichier, données extraites), ...]
+    """
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+
+    workbook = xlsxwriter.Workbook(output_path)
+    used = set()
+    for name, data in documents:
+        write_statement_sheet(workbook, _sheet_name(name, used), data)
+    workbook.close()
+
+
+def _sheet_name(name: str, used: set) -> str:
+    """Nom de feuille Excel valide (31 caractères, sans []:*?/\\) et unique dans le classeur."""
+    base = re.sub(r"[\[\]:*?/\\]", "_", os.path.splitext(name or "")[0]).strip("' ") or "Relevé"
+    base = base[:31]
+    candidate, n = base, 2
+    while candidate.lower() in used:
+        suffix = f" ({n})"
+        candidate = base[:31 - len(suffix)] + suffix
+        n += 1
+    used.add(candidate.lower())
+    return candidate
+
+
+def write_statement_sheet(workbook, sheet_name: str, data: dict):
+    """Écrit un relevé (logo, infos générales, transactions) dans une nouvelle feuille."""
+    worksheet = workbook.add_worksheet(sheet_name)
 
         # Définir les largeurs de colonnes
     worksheet.set_column(0, 0, 12)   # Colonne A (Date) → largeur 12
@@ -31,17 +68,18 @@ def save_to_excel(data: dict, output_path: str):
     # -------------------
     # Infos générales (décalées pour ne pas écraser le logo)
     # -------------------
+    header = StatementHeader.from_dict(data)
     worksheet.write("A8", "Banque")
-    worksheet.write("B8", data.get("banque", ""))
+    worksheet.write("B8", header.banque or "")
 
     worksheet.write("A9", "Compte")
-    worksheet.write("B9", data.get("compte", ""))
+    worksheet.write("B9", header.compte or "")
 
     worksheet.write("A10", "Titulaire")
-    worksheet.write("B10", data.get("titulaire", ""))
+    worksheet.write("B10", header.titulaire or "")
 
     worksheet.write("A11", "Période")
-    worksheet.write("B11", data.get("periode", ""))
+    worksheet.write("B11", header.periode or "")
 
     # -------------------
     # En-têtes transactions
@@ -53,10 +91,9 @@ def save_to_excel(data: dict, output_path: str):
     # -------------------
     # Transactions
     # -------------------
-    for row_idx, tx in enumerate(data.get("transactions", []), start=14):
-        worksheet.write(row_idx, 0, tx.get("date", ""))
-        worksheet.write(row_idx, 1, tx.get("description", ""))
-        worksheet.write(row_idx, 2, tx.get("montant", ""))
-        worksheet.write(row_idx, 3, tx.get("sens", ""))
-
-    workbook.close()
+    # (Transaction des parseurs ou dict d'un résultat JSON)
+    for row_idx, tx in enumerate(map(as_transaction, data.get("transactions", [])), start=14):
+        worksheet.write(row_idx, 0, tx.date or "")
+        worksheet.write(row_idx, 1, tx.description or "")
+        worksheet.write(row_idx, 2, tx.montant or "")
+        worksheet.write(row_idx, 3, tx.sens or "")
@@ -0,0 +1,319 @@
+# app/utils/extraction_service.py
+import os
+from functools import partial
+from typing import Dict, Iterator, List, Optional
+
+from app.utils.parser import extract_bank_statement_data, detect_transactions
+from app.utils.parser_saphir import iter_saphir_events  # ✅ parse du texte OCR
+from app.utils.table_service import TABLE_RECONSTRUCTION, parse_table_pages
+from app.utils.document_service import SAPHIR_MARKERS, Document, Page, analyze_document  # ✅ OCR unique par page
+from app.utils.models import transactions_to_dicts
+from app.utils.worker_pool import imap_pages
+from app.utils.classifier_service import CLASSIFY_MIN_CONFIDENCE, read_header_band
+from app.utils.cache_service import PARSER_VERSION, sha256_bytes
+from app.utils.weights_service import weights_fingerprint
+
+# Champs d'en-tête fusionnés page par page (première valeur non vide gagnante)
+HEADER_FIELDS = ["banque", "compte", "titulaire", "periode"]
+
+
+# -----------------------
+# Clé de cache des résultats
+# -----------------------
+def result_cache_key(data: bytes, filename: str) -> str:
+    """
+    Contenu de l'upload + poids YOLO + version des parseurs (+ extension,
+    qui décide du traitement pdf/image) : un même relevé renvoyé tombe sur la même clé.
+    """
+    ext = os.path.splitext(filename or "")[1].lower()
+    return sha256_bytes(
+        f"{sha256_bytes(data)}|{weights_fingerprint()}|{PARSER_VERSION}|{ext}".encode()
+    )
+
+
+# -----------------------
+# OCR Helper
+# -----------------------
+def ocr_to_text(filepath: str) -> str:
+    """
+    Convertit un fichier (pdf/image) en texte OCR brut (français),
+    en limitant les césures/lignes cassées.
+    """
+    return analyze_document(filepath).text
+
+
+# -----------------------
+# Détection fichier SAFIR
+# -----------------------
+def is_saphir_file(doc: Document) -> bool:
+    """
+    Vérifie rapidement si le document correspond à un relevé Saphir Consulting.
+    Réutilise l'OCR de l'analyse document + recherche de mots-clés.
+    """
+    try:
+        return doc.is_saphir()
+    except Exception:
+        return False
+
+
+def confirm_saphir_header(doc: Document) -> bool:
+    """
+    Confirmation d'un pré-classement douteux sur la page 1 seulement : ses mots
+    s'ils sont déjà connus, sinon l'OCR du bandeau haut à pleine résolution
+    (jamais l'OCR complet de toutes les pages).
+    """
+    try:
+        page = doc.pages[0]
+        text = page.text if page.has_words else read_header_band(doc.filepath)
+    except Exception:
+        return False
+    low = text.lower()
+    return any(m in low for m in SAPHIR_MARKERS)
+
+
+# -----------------------
+# Traitement d'une page (cas général)
+# -----------------------
+def extract_page(page: Page, template: Optional[str] = None) -> Dict:
+    """
+    Une page : règles texte si couche texte PDF, sinon YOLO + OCR.
+    Fonction de module (picklable) exécutée dans le pool des pages.
+    """
+    if page.origin == "text_layer":
+        return extract_bank_statement_data(page.text)
+
+    # voie YOLO importée à la demande : ni cv2 ni torch pour les relevés à couche
+    # texte, les SAPHIR ou un processus qui ne sert que l'export
+    from app.utils.preprocess_service import get_preprocessor
+    from app.utils.yolo_service import extract_with_yolo_and_rules
+
+    if page.can_render_regions and not page.has_image and not get_preprocessor(template).geometric:
+        # PDF : YOLO sur un raster ~640px, puis seules les zones détectées sont
+        # rendues à OCR_DPI — la page entière n'est jamais rasterisée à 300dpi
+        return extract_with_yolo_and_rules(
+            page.detect_array,
+            regex_fallback_fn=extract_bank_statement_data,
+            parse_transactions_fn=detect_transactions,
+            ocr_full=page.text if page.has_words else None,
+            words=page.words if page.has_words else None,
+            template=template,
+            render_region=page.render_region,
+            region_scale=page.dpi / page.detect_dpi,
+        )
+
+    # raster en mémoire : ni PNG intermédiaire ni relecture disque ; le texte de
+    # la page n'est transmis que s'il existe déjà (sinon fallback OCR à la demande)
+    return extract_with_yolo_and_rules(
+        page.array,
+        regex_fallback_fn=extract_bank_statement_data,
+        parse_transactions_fn=detect_transactions,
+        ocr_full=page.text if page.has_words else None,
+        words=page.words if page.has_words else None,
+        template=template,
+        dpi=page.dpi
+    )
+
+
+# -----------------------
+# Pipeline complet (synchrone, exécuté hors de la boucle asyncio)
+# -----------------------
+def _route_saphir(doc: Document, routing: Dict) -> bool:
+    if routing["confidence"] >= CLASSIFY_MIN_CONFIDENCE:
+        return routing["template"] == "saphir"
+    return confirm_saphir_header(doc)  # doute : confirmation sur la page 1
+
+
+def iter_page_events(doc: Document, template: Optional[str] = None) -> Iterator[Dict]:
+    """
+    Voie générale, page par page : un événement "header" dès qu'un champ est
+    trouvé (première valeur non vide gagnante, dans l'ordre des pages), un
+    événement "page" par page avec ses transactions, puis "done".
+    """
+    header: Dict[str, Optional[str]] = dict.fromkeys(HEADER_FIELDS)
+    count = 0
+    page_fn = partial(extract_page, template=template)  # partial : reste picklable
+    for page_no, page_data in enumerate(imap_pages(page_fn, doc.pages), start=1):  # ordre des pages
+        for k in HEADER_FIELDS:
+            if not header[k] and page_data.get(k):
+                header[k] = page_data[k]
+                yield {"event": "header", "field": k, "value": header[k]}
+
+        txs = page_data.get("transactions") or []
+        count += len(txs)
+        yield {"event": "page", "page": page_no, "transactions": transactions_to_dicts(txs)}
+
+    yield {"event": "done", **header, "transaction_count": count}
+
+
+def iter_document_events(filepath: str, routing: Dict) -> Iterator[Dict]:
+    """
+    Variante en flux de `extract_document` : rien n'est accumulé, chaque page
+    est rendue dès qu'elle est traitée (et que les précédentes le sont).
+    """
+    doc = analyze_document(filepath, ocr=False)
+    if _route_saphir(doc, routing):
+        yield from iter_saphir_document_events(doc)
+    else:
+        yield from iter_page_events(doc, routing.get("template"))
+
+
+def iter_saphir_document_events(doc: Document) -> Iterator[Dict]:
+    """
+    SAPHIR en flux : transactions des règles texte page par page, puis le même
+    post-traitement que `extract_document` sur le document complet. Ce
+    post-traitement (sens déduits du solde, tableau colonnaire) a besoin de
+    toutes les lignes : celles envoyées restent donc en mémoire jusqu'à "done",
+    qui ne porte que les écarts ("corrections", voir `_row_corrections`) pour
+    que le client retrouve le résultat de /extract (et du cache).
+    """
+    streamed: List[Dict] = []
+    page_of: List[int] = []
+    done: Dict = {}
+    for event in iter_saphir_events(doc.iter_texts()):
+        if event["event"] == "done":
+            done = event
+            break
+        if event["event"] == "page":
+            streamed.extend(event["transactions"])
+            page_of.extend([event["page"] - 1] * len(event["transactions"]))
+        yield event
+
+    data = {**{k: done.get(k) for k in HEADER_FIELDS}, "transactions": streamed,
+            "_debug": dict(done.get("_debug") or {})}
+    _finish_saphir(doc, data, page_of)
+    final = transactions_to_dicts(data["transactions"])
+    if data["periode"] != done.get("periode"):
+        yield {"event": "header", "field": "periode", "value": data["periode"]}
+    corrections = _row_corrections(streamed, final)
+    yield {
+        **done,
+        "periode": data["periode"],
+        "transaction_count": len(final),
+        "_debug": data["_debug"],
+        **({"corrections": corrections} if corrections else {}),
+    }
+
+
+def _row_corrections(sent: List[Dict], final: List[Dict]) -> List[Dict]:
+    """
+    Écarts ligne à ligne entre les transactions envoyées et la liste définitive :
+    {"index": i, <champs modifiés>} (null : champ retiré) ; un index au-delà des
+    lignes reçues est une ligne ajoutée (complète). Le client tronque ensuite à
+    "transaction_count".
+    """
+    out = []
+    for i, row in enumerate(final):
+        old = sent[i] if i < len(sent) else {}
+        diff = {k: v for k, v in row.items() if old.get(k) != v or k not in old}
+        diff.update({k: None for k in old if k not in row})
+        if diff:
+            out.append({"index": i, **diff})
+    return out
+
+
+def events_from_result(data: Dict) -> Iterator[Dict]:
+    """Événements équivalents pour un résultat déjà complet (cache)."""
+    for k in HEADER_FIELDS:
+        if data.get(k):
+            yield {"event": "header", "field": k, "value": data[k]}
+    txs = transactions_to_dicts(data.get("transactions") or [])
+    yield {"event": "page", "page": None, "transactions": txs}
+    yield {
+        "event": "done",
+        **{k: data.get(k) for k in HEADER_FIELDS},
+        "transaction_count": len(txs),
+        **({"_debug": data["_debug"]} if "_debug" in data else {}),
+    }
+
+
+def _saphir_table(doc: Document, data: Dict, page_of: List[int]) -> None:
+    """
+    Colonnes Débit / Crédit / Solde lues sur les positions des mots (déjà
+    calculés par l'OCR des pages) plutôt que sur l'ordre des montants dans la
+    ligne. Fusion page par page : une page dont le tableau n'a pas pu être
+    reconstruit garde ses lignes des règles texte (`page_of` : page de chacune).
+    """
+    if not TABLE_RECONSTRUCTION:
+        return
+    table_pages = parse_table_pages([p.words for p in doc.pages])
+    if table_pages is None or not any(table_pages):
+        return
+    text_pages: List[List] = [[] for _ in table_pages]
+    for tx, page in zip(data["transactions"], page_of):
+        text_pages[page].append(tx)
+    fallback = [i for i, txs in enumerate(table_pages) if txs is None and text_pages[i]]
+    data["transactions"] = [
+        tx for i, txs in enumerate(table_pages) for tx in (text_pages[i] if txs is None else txs)
+    ]
+    data.setdefault("_debug", {}).update({
+        "table": "mixed" if fallback else "columns",
+        "text_rule_pages": [i + 1 for i in fallback],
+        "tx_count": len(data["transactions"]),
+    })
+
+
+def _reconcile(data: Dict) -> None:
+    """
+    Passage en table colonnaire (montants en unités mineures) : sens manquants
+    déduits du solde, contrôle du solde courant et période min/max, en une
+    poignée d'opérations vectorisées ; les dicts JSON sont reconstruits à la fin.
+    """
+    from app.utils.transaction_service import TransactionTable, to_minor  # numpy : import différé
+
+    table = TransactionTable.from_transactions(data["transactions"])
+    debug = data.setdefault("_debug", {})
+    opening = to_minor(debug.get("solde_initial"))
+    table.infer_sens(opening)
+    data["transactions"] = table.to_records()
+    data["periode"] = table.period() or data.get("periode")
+    debug["balance"] = table.balance_check(opening)
+
+
+def _finish_saphir(doc: Document, data: Dict, page_of: List[int]) -> None:
+    """Post-traitement SAPHIR commun à /extract et au flux (le cache sert l'un à l'autre)."""
+    if data["transactions"]:
+        _saphir_table(doc, data, page_of)
+        _reconcile(data)
+
+
+def extract_document(filepath: str, routing: Dict) -> Dict:
+    """
+    OCR/YOLO + parsing d'un fichier déjà routé par `classify_document`.
+    Fonction de module (picklable) pour pouvoir tourner dans un pool de processus.
+    """
+    # Une seule rasterisation + un seul OCR par page (à la demande), partagés ensuite
+    doc = analyze_document(filepath, ocr=False)
+
+    # === Cas spécifique SAFIR ===
+    # OCR des pages en parallèle, mais pages parsées dans l'ordre (solde courant
+    # conservé d'une page à l'autre) : même résultat que sur le texte recollé,
+    # avec la page de chaque ligne pour la fusion avec le tableau colonnaire
+    if _route_saphir(doc, routing):
+        txs: List[Dict] = []
+        page_of: List[int] = []
+        for event in iter_saphir_events(doc.iter_texts()):
+            if event["event"] == "page":
+                txs.extend(event["transactions"])
+                page_of.extend([event["page"] - 1] * len(event["transactions"]))
+            elif event["event"] == "done":
+                done = event
+        data = {**{k: done[k] for k in HEADER_FIELDS}, "transactions": txs, "_debug": done["_debug"]}
+        _finish_saphir(doc, data, page_of)
+        return data
+
+    # === Cas général YOLO ===
+    # (les pages à couche texte PDF passent directement par les règles texte)
+    final_data = {
+        "banque": None,
+        "compte": None,
+        "titulaire": None,
+        "periode": None,
+        "transactions": []
+    }
+    for event in iter_page_events(doc, routing.get("template")):
+        if event["event"] == "header":
+            final_data[event["field"]] = event["value"]
+        elif event["event"] == "page":
+            final_data["transactions"].extend(event["transactions"])
+
+    return final_data
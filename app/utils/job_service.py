@@ -0,0 +1,352 @@
+# app/utils/job_service.py
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+from app.utils.upload_service import safe_filename
+
+# ⚙️ CONFIG — file de traitements asynchrones (gros lots de fin de mois)
+JOB_DB = os.getenv("JOB_DB", os.path.join("jobs", "jobs.sqlite"))
+JOB_FILES_DIR = os.getenv("JOB_FILES_DIR", os.path.join("jobs", "files"))  # uploads en attente
+# Threads propres à la file, en plus de EXTRACT_WORKERS / EXTRACT_QUEUE_SIZE : les
+# jobs ne passent pas par l'admission d'ExtractionPool (pas de 429 pour eux) ;
+# prévoir JOB_WORKERS extractions de plus que le pool dans le dimensionnement
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# Un fichier "running" dont le bail a expiré (worker / processus tombé) est repris
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "900"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+
+# statuts d'un fichier : queued -> running -> done | failed (re-queued tant qu'il reste des essais)
+FINAL_STATUSES = ("done", "failed")
+
+
+class JobNotFound(Exception):
+    pass
+
+
+class JobStore:
+    """
+    File persistante SQLite : un job = un ou plusieurs fichiers, chaque fichier
+    étant une unité de travail réclamée par un worker (priorité décroissante,
+    puis ancienneté). La réclamation pose un bail : si le worker meurt, le
+    fichier est repris après expiration, jusqu'à JOB_MAX_ATTEMPTS essais.
+    Le numéro d'essai sert de jeton de bail : un worker dont le fichier a été
+    repris par un autre ne peut plus ni le renouveler ni le clore.
+    """
+
+    def __init__(self, db_path: str = JOB_DB, files_dir: str = JOB_FILES_DIR,
+                 max_attempts: int = JOB_MAX_ATTEMPTS, lease_seconds: float = JOB_LEASE_SECONDS):
+        self.db_path = db_path
+        self.files_dir = files_dir
+        self.max_attempts = max(1, max_attempts)
+        self.lease_seconds = lease_seconds
+        self._init_db()
+
+    # ---- base ----
+    def _connect(self) -> sqlite3.Connection:
+        con = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        con.row_factory = sqlite3.Row
+        return con
+
+    def _init_db(self) -> None:
+        folder = os.path.dirname(self.db_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with self._connect() as con:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY, priority INTEGER NOT NULL, created REAL NOT NULL)"
+            )
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS job_files ("
+                " job_id TEXT NOT NULL, idx INTEGER NOT NULL, filename TEXT NOT NULL, path TEXT,"
+                " status TEXT NOT NULL, priority INTEGER NOT NULL, created REAL NOT NULL,"
+                " attempts INTEGER NOT NULL DEFAULT 0, lease_until REAL, updated REAL,"
+                " result TEXT, error TEXT, PRIMARY KEY (job_id, idx))"
+            )
+            con.execute(
+                "CREATE INDEX IF NOT EXISTS job_files_queue ON job_files (status, priority DESC, created, idx)"
+            )
+
+    # ---- soumission ----
+    def submit(self, files: List[Tuple[str, bytes]], priority: int = 0) -> str:
+        """Écrit les uploads sur disque puis les met en file ; retourne l'id du job."""
+        job_id = uuid.uuid4().hex
+        folder = os.path.join(self.files_dir, job_id)
+        os.makedirs(folder, exist_ok=True)
+        now = time.time()
+        rows = []
+        for idx, (filename, data) in enumerate(files):
+            name = safe_filename(filename)
+            path = os.path.join(folder, f"{idx}_{name}")
+            with open(path, "wb") as f:
+                f.write(data)
+            rows.append((job_id, idx, name, path, "queued", priority, now, now))
+        with self._connect() as con:
+            con.execute("BEGIN IMMEDIATE")
+            con.execute("INSERT INTO jobs (id, priority, created) VALUES (?, ?, ?)", (job_id, priority, now))
+            con.executemany(
+                "INSERT INTO job_files (job_id, idx, filename, path, status, priority, created, updated)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows,
+            )
+            con.execute("COMMIT")
+        return job_id
+
+    # ---- côté worker ----
+    def claim(self) -> Optional[sqlite3.Row]:
+        """
+        Réserve le prochain fichier à traiter (en file, ou bail expiré). La ligne
+        retournée porte le nouveau `attempts`, à repasser à renew/complete/fail.
+        """
+        now = time.time()
+        with self._connect() as con:
+            con.execute("BEGIN IMMEDIATE")
+            # bail expiré sans plus aucun essai : échec définitif
+            con.execute(
+                "UPDATE job_files SET status = 'failed', updated = ?,"
+                " error = COALESCE(error, 'worker interrompu')"
+                " WHERE status = 'running' AND lease_until < ? AND attempts >= ?",
+                (now, now, self.max_attempts),
+            )
+            row = con.execute(
+                "SELECT * FROM job_files"
+                " WHERE status = 'queued' OR (status = 'running' AND lease_until < ?)"
+                " ORDER BY priority DESC, created, idx LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is not None:
+                con.execute(
+                    "UPDATE job_files SET status = 'running', attempts = attempts + 1,"
+                    " lease_until = ?, updated = ? WHERE job_id = ? AND idx = ?",
+                    (now + self.lease_seconds, now, row["job_id"], row["idx"]),
+                )
+                row = con.execute(
+                    "SELECT * FROM job_files WHERE job_id = ? AND idx = ?", (row["job_id"], row["idx"])
+                ).fetchone()
+            con.execute("COMMIT")
+        return row
+
+    def renew(self, job_id: str, idx: int, attempts: int) -> bool:
+        """Prolonge le bail ; False si le fichier n'appartient plus à cet essai."""
+        now = time.time()
+        with self._connect() as con:
+            cur = con.execute(
+                "UPDATE job_files SET lease_until = ?, updated = ?"
+                " WHERE job_id = ? AND idx = ? AND status = 'running' AND attempts = ?",
+                (now + self.lease_seconds, now, job_id, idx, attempts),
+            )
+        return cur.rowcount == 1
+
+    def complete(self, job_id: str, idx: int, attempts: int, result: Dict) -> bool:
+        return self._finish(job_id, idx, attempts, "done",
+                            result=json.dumps(result, ensure_ascii=False), error=None)
+
+    def fail(self, job_id: str, idx: int, attempts: int, error: str) -> bool:
+        """Erreur d'extraction : nouvel essai tant qu'il en reste, sinon échec définitif."""
+        if attempts < self.max_attempts:
+            with self._connect() as con:
+                cur = con.execute(
+                    "UPDATE job_files SET status = 'queued', lease_until = NULL, error = ?, updated = ?"
+                    " WHERE job_id = ? AND idx = ? AND status = 'running' AND attempts = ?",
+                    (error, time.time(), job_id, idx, attempts),
+                )
+            return cur.rowcount == 1
+        return self._finish(job_id, idx, attempts, "failed", result=None, error=error)
+
+    def _finish(self, job_id: str, idx: int, attempts: int, status: str,
+                result: Optional[str], error: Optional[str]) -> bool:
+        """Clôt l'essai `attempts` ; sans effet (False) si le bail a été repris entre-temps."""
+        with self._connect() as con:
+            con.execute("BEGIN IMMEDIATE")
+            row = con.execute(
+                "SELECT path FROM job_files WHERE job_id = ? AND idx = ?", (job_id, idx)
+            ).fetchone()
+            cur = con.execute(
+                "UPDATE job_files SET status = ?, result = ?, error = ?, lease_until = NULL,"
+                " path = NULL, updated = ?"
+                " WHERE job_id = ? AND idx = ? AND status = 'running' AND attempts = ?",
+                (status, result, error, time.time(), job_id, idx, attempts),
+            )
+            con.execute("COMMIT")
+        if cur.rowcount != 1:
+            return False
+        # l'upload n'est plus utile une fois le résultat (ou l'échec) enregistré
+        if row is not None and row["path"]:
+            try:
+                os.remove(row["path"])
+            except OSError:
+                pass
+            folder = os.path.join(self.files_dir, job_id)
+            if os.path.isdir(folder) and not os.listdir(folder):
+                shutil.rmtree(folder, ignore_errors=True)
+        return True
+
+    # ---- lecture ----
+    def _files(self, job_id: str) -> List[sqlite3.Row]:
+        with self._connect() as con:
+            if con.execute("SELECT 1 FROM jobs WHERE id = ?", (job_id,)).fetchone() is None:
+                raise JobNotFound(job_id)
+            return con.execute(
+                "SELECT * FROM job_files WHERE job_id = ? ORDER BY idx", (job_id,)
+            ).fetchall()
+
+    def status(self, job_id: str) -> Dict:
+        files = self._files(job_id)
+        counts: Dict[str, int] = {}
+        for f in files:
+            counts[f["status"]] = counts.get(f["status"], 0) + 1
+        finished = sum(counts.get(s, 0) for s in FINAL_STATUSES)
+        if finished == len(files):
+            status = "failed" if counts.get("done", 0) == 0 else (
+                "done" if counts.get("failed", 0) == 0 else "partial")
+        else:
+            status = "running" if counts.get("running") or finished else "queued"
+        return {
+            "job_id": job_id,
+            "status": status,
+            "priority": files[0]["priority"] if files else 0,
+            "progress": {"total": len(files), "finished": finished, **counts},
+            "files": [
+                {"index": f["idx"], "filename": f["filename"], "status": f["status"],
+                 "attempts": f["attempts"], "error": f["error"]}
+                for f in files
+            ],
+        }
+
+    def results(self, job_id: str) -> List[Dict]:
+        return [
+            {
+                "index": f["idx"],
+                "filename": f["filename"],
+                "status": f["status"],
+                **(json.loads(f["result"]) if f["result"] else {}),
+                **({"error": f["error"]} if f["status"] == "failed" else {}),
+            }
+            for f in self._files(job_id)
+        ]
+
+
+# -----------------------
+# Workers
+# -----------------------
+def run_job_file(path: str, filename: str) -> Dict:
+    """Même pipeline que /api/extract (cache des résultats compris)."""
+    # imports locaux : le module de file reste léger pour la route de soumission
+    from app.utils.cache_service import get_result_cache
+    from app.utils.classifier_service import classify_document
+    from app.utils.extraction_service import extract_document, result_cache_key
+
+    with open(path, "rb") as f:
+        data = f.read()
+    cache = get_result_cache()
+    key = result_cache_key(data, filename)
+    cached = cache.get(key)
+    if cached is not None:
+        return {**cached, "cache": "hit"}
+    routing = classify_document(path)
+    result = {"extracted_data": extract_document(path, routing), "routing": routing}
+    cache.set(key, result)
+    return {**result, "cache": "miss"}
+
+
+class JobWorkers:
+    """
+    Threads qui vident la file ; réveillés immédiatement à chaque soumission.
+    Capacité distincte du pool des routes synchrones (voir JOB_WORKERS).
+    """
+
+    def __init__(self, store: JobStore, workers: int = JOB_WORKERS):
+        self.store = store
+        self.workers = max(1, workers)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        if self._threads:
+            return
+        self._stop.clear()
+        for i in range(self.workers):
+            t = threading.Thread(target=self._loop, name=f"job-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def notify(self) -> None:
+        self._wake.set()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        for t in self._threads:
+            t.join(timeout=5)
+        self._threads = []
+
+    def _heartbeat(self, row: sqlite3.Row, done: threading.Event) -> None:
+        """Renouvelle le bail tant que le fichier est en cours (un gros relevé peut dépasser le bail)."""
+        interval = max(1.0, self.store.lease_seconds / 3)
+        while not done.wait(interval):
+            try:
+                if not self.store.renew(row["job_id"], row["idx"], row["attempts"]):
+                    return  # bail repris par un autre worker
+            except sqlite3.Error:
+                pass
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                row = self.store.claim()
+            except sqlite3.Error:
+                row = None
+            if row is None:
+                self._wake.wait(JOB_POLL_INTERVAL)
+                self._wake.clear()
+                continue
+            done = threading.Event()
+            beat = threading.Thread(target=self._heartbeat, args=(row, done), daemon=True)
+            beat.start()
+            try:
+                try:
+                    result = run_job_file(row["path"], row["filename"])
+                except Exception as e:
+                    print("ERREUR JOB:", traceback.format_exc())
+                    self.store.fail(row["job_id"], row["idx"], row["attempts"], str(e))
+                else:
+                    self.store.complete(row["job_id"], row["idx"], row["attempts"], result)
+            except Exception:
+                # base indisponible, résultat non sérialisable... : le worker continue,
+                # le fichier sera repris à l'expiration de son bail
+                print("ERREUR JOB (clôture):", traceback.format_exc())
+            finally:
+                done.set()
+                beat.join()
+
+
+_store: Optional[JobStore] = None
+_workers: Optional[JobWorkers] = None
+_lock = threading.Lock()
+
+def get_job_store() -> JobStore:
+    global _store
+    with _lock:
+        if _store is None:
+            _store = JobStore()
+        return _store
+
+
+def get_job_workers() -> JobWorkers:
+    """Workers démarrés au premier appel (reprend aussi les jobs laissés par un redémarrage)."""
+    global _workers
+    store = get_job_store()
+    with _lock:
+        if _workers is None:
+            _workers = JobWorkers(store)
+            _workers.start()
+        return _workers
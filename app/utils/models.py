@@ -0,0 +1,56 @@
+# app/utils/models.py
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Union
+
+
+# -----------------------
+# Enregistrements partagés par les parseurs et l'export Excel
+# -----------------------
+@dataclass(slots=True)
+class Transaction:
+    """
+    Une opération de relevé. Slots : pas de dict par ligne (clés répétées),
+    80 octets par ligne contre 192 pour un dict. Les montants restent les
+    chaînes normalisées des parseurs ("1257225", "10195.50").
+    """
+    date: Optional[str]
+    description: Optional[str]
+    montant: Optional[str]
+    sens: Optional[str]          # "Dr" | "Cr" | None
+    solde: Optional[str] = None  # solde lu sur la ligne, s'il existe
+
+    def to_dict(self) -> Dict[str, Optional[str]]:
+        d = {"date": self.date, "description": self.description, "montant": self.montant, "sens": self.sens}
+        # forme JSON historique : les parseurs sans colonne Solde n'avaient pas la clé
+        if self.solde is not None:
+            d["solde"] = self.solde
+        return d
+
+    @classmethod
+    def from_dict(cls, d: Dict) -> "Transaction":
+        return cls(d.get("date"), d.get("description"), d.get("montant"), d.get("sens"), d.get("solde"))
+
+
+@dataclass(slots=True)
+class StatementHeader:
+    banque: Optional[str] = None
+    compte: Optional[str] = None
+    titulaire: Optional[str] = None
+    periode: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Optional[str]]:
+        return {"banque": self.banque, "compte": self.compte, "titulaire": self.titulaire, "periode": self.periode}
+
+    @classmethod
+    def from_dict(cls, d: Dict) -> "StatementHeader":
+        return cls(d.get("banque"), d.get("compte"), d.get("titulaire"), d.get("periode"))
+
+
+def as_transaction(tx: Union[Transaction, Dict]) -> Transaction:
+    """Accepte aussi un dict JSON (export Excel depuis un résultat déjà sérialisé)."""
+    return tx if isinstance(tx, Transaction) else Transaction.from_dict(tx)
+
+
+def transactions_to_dicts(txs: Iterable[Union[Transaction, Dict]]) -> List[Dict]:
+    """Sérialisation en sortie d'API / de cache (forme JSON historique)."""
+    return [tx.to_dict() if isinstance(tx, Transaction) else tx for tx in txs]
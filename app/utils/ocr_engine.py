@@ -0,0 +1,155 @@
+# app/utils/ocr_engine.py
+import importlib.util
+import os
+import shlex
+import threading
+from typing import TYPE_CHECKING, Dict, List, Tuple, Union
+
+# pytesseract (qui charge pandas s'il est installé), numpy, PIL et tesserocr ne
+# sont importés qu'au premier OCR : le processus démarre sans eux
+if TYPE_CHECKING:
+    import numpy as np
+    from PIL import Image
+
+# ⚙️ CONFIG — "auto" : tesserocr si installé, sinon pytesseract (un processus par appel)
+OCR_BACKEND = os.getenv("OCR_BACKEND", "auto")  # "auto" | "tesserocr" | "pytesseract"
+
+OcrImage = Union["np.ndarray", "Image.Image"]
+
+DATA_KEYS = ("level", "page_num", "block_num", "par_num", "line_num", "word_num",
+             "left", "top", "width", "height", "conf", "text")
+
+
+def parse_config(config: str) -> Tuple[int, int, Dict[str, str]]:
+    """'--oem 3 --psm 6 -c k=v' -> (oem, psm, {k: v}) ; défauts Tesseract : oem 3, psm 3."""
+    oem, psm, variables = 3, 3, {}
+    args = shlex.split(config or "")
+    i = 0
+    while i < len(args):
+        a = args[i]
+        if a == "--oem" and i + 1 < len(args):
+            oem = int(args[i + 1]); i += 1
+        elif a == "--psm" and i + 1 < len(args):
+            psm = int(args[i + 1]); i += 1
+        elif a == "-c" and i + 1 < len(args) and "=" in args[i + 1]:
+            k, v = args[i + 1].split("=", 1)
+            variables[k] = v; i += 1
+        i += 1
+    return oem, psm, variables
+
+
+# -----------------------
+# Moteurs
+# -----------------------
+class PytesseractEngine:
+    """Repli : un sous-processus `tesseract` par appel (rechargement des traineddata)."""
+    name = "pytesseract"
+
+    def image_to_string(self, img: OcrImage, lang: str, config: str) -> str:
+        import pytesseract
+        return pytesseract.image_to_string(img, lang=lang, config=config)
+
+    def image_to_data(self, img: OcrImage, lang: str, config: str) -> Dict[str, List]:
+        import pytesseract
+        return pytesseract.image_to_data(img, lang=lang, config=config, output_type=pytesseract.Output.DICT)
+
+
+class TesserocrEngine:
+    """
+    libtesseract en processus : une API initialisée par (thread, lang, oem, psm),
+    gardée en vie et réutilisée — ni fork ni rechargement du modèle par appel.
+    L'API Tesseract n'étant pas thread-safe, chaque thread du pool a les siennes.
+    Si une combinaison ne peut pas être initialisée (langue absente...), pytesseract prend le relais.
+    """
+    name = "tesserocr"
+
+    def __init__(self):
+        self._local = threading.local()
+        self._fallback = PytesseractEngine()
+
+    def _api(self, lang: str, config: str):
+        import tesserocr
+        oem, psm, variables = parse_config(config)
+        apis = getattr(self._local, "apis", None)
+        if apis is None:
+            apis = self._local.apis = {}
+        key = (lang, oem, psm, tuple(sorted(variables.items())))
+        if key not in apis:
+            try:
+                api = tesserocr.PyTessBaseAPI(lang=lang, psm=psm, oem=oem)
+                for k, v in variables.items():
+                    api.SetVariable(k, v)
+            except RuntimeError:
+                api = None
+            apis[key] = api
+        return apis[key]
+
+    @staticmethod
+    def _to_pil(img: OcrImage) -> "Image.Image":
+        import numpy as np
+        from PIL import Image
+        # même conversion que pytesseract (Image.fromarray, sans permutation de canaux)
+        return Image.fromarray(img) if isinstance(img, np.ndarray) else img
+
+    def image_to_string(self, img: OcrImage, lang: str, config: str) -> str:
+        api = self._api(lang, config)
+        if api is None:
+            return self._fallback.image_to_string(img, lang, config)
+        api.SetImage(self._to_pil(img))
+        return api.GetUTF8Text()
+
+    def image_to_data(self, img: OcrImage, lang: str, config: str) -> Dict[str, List]:
+        """Même forme que `pytesseract.image_to_data(..., Output.DICT)` (niveau mot)."""
+        import tesserocr
+        api = self._api(lang, config)
+        if api is None:
+            return self._fallback.image_to_data(img, lang, config)
+        api.SetImage(self._to_pil(img))
+        api.Recognize()
+        data: Dict[str, List] = {k: [] for k in DATA_KEYS}
+        ri = api.GetIterator()
+        if ri is None:
+            return data
+
+        RIL = tesserocr.RIL
+        block = par = line = word = 0
+        for r in tesserocr.iterate_level(ri, RIL.WORD):
+            if r.IsAtBeginningOf(RIL.BLOCK):
+                block += 1; par = 0; line = 0
+            if r.IsAtBeginningOf(RIL.PARA):
+                par += 1; line = 0
+            if r.IsAtBeginningOf(RIL.TEXTLINE):
+                line += 1; word = 0
+            word += 1
+            try:
+                text = r.GetUTF8Text(RIL.WORD) or ""
+            except RuntimeError:
+                text = ""
+            bbox = r.BoundingBox(RIL.WORD)
+            if bbox is None:
+                continue
+            x1, y1, x2, y2 = bbox
+            for k, v in zip(DATA_KEYS, (5, 1, block, par, line, word,
+                                        x1, y1, x2 - x1, y2 - y1, r.Confidence(RIL.WORD), text)):
+                data[k].append(v)
+        return data
+
+
+def tesserocr_available() -> bool:
+    """Moteur résident optionnel (libtesseract via tesserocr), détecté sans l'importer."""
+    return importlib.util.find_spec("tesserocr") is not None
+
+
+_engine = None
+
+def get_engine():
+    global _engine
+    if _engine is None:
+        available = tesserocr_available()
+        if OCR_BACKEND == "tesserocr" or (OCR_BACKEND == "auto" and available):
+            if not available:
+                raise RuntimeError("OCR_BACKEND=tesserocr mais le paquet tesserocr n'est pas installé")
+            _engine = TesserocrEngine()
+        else:
+            _engine = PytesseractEngine()
+    return _engine
@@ -0,0 +1,66 @@
+# app/utils/ocr_service.py
+import hashlib
+import os
+from typing import Dict, Optional
+
+from app.utils.cache_service import TieredCache
+from app.utils.ocr_engine import OcrImage, get_engine  # tesserocr résident, sinon pytesseract
+
+# ⚙️ CONFIG — cache OCR par raster (pages / crops identiques d'un envoi à l'autre)
+# Entrées mémoire : un résultat image_to_data d'une page entière (listes de mots,
+# boîtes, confiances) pèse plusieurs centaines de Ko ; OCR_CACHE_DB pour en garder plus
+OCR_CACHE_SIZE = int(os.getenv("OCR_CACHE_SIZE", "256"))
+OCR_CACHE_TTL = float(os.getenv("OCR_CACHE_TTL", "0"))  # 0 = sans expiration (contenu immuable)
+OCR_CACHE_DB = os.getenv("OCR_CACHE_DB") or None
+OCR_CACHE_DISK_SIZE = int(os.getenv("OCR_CACHE_DISK_SIZE", "50000"))
+
+
+def image_fingerprint(img: OcrImage) -> str:
+    """Empreinte du raster réellement OCRisé (forme + type + pixels)."""
+    h = hashlib.blake2b(digest_size=20)
+    if hasattr(img, "dtype"):  # np.ndarray
+        import numpy as np  # déjà chargé par l'appelant ; pas à l'import du module
+        h.update(f"{img.shape}|{img.dtype}".encode())
+        h.update(np.ascontiguousarray(img).data)
+    else:
+        h.update(f"{img.mode}|{img.size}".encode())
+        h.update(img.tobytes())
+    return h.hexdigest()
+
+
+_ocr_cache: Optional[TieredCache] = None
+
+def get_ocr_cache() -> TieredCache:
+    global _ocr_cache
+    if _ocr_cache is None:
+        _ocr_cache = TieredCache(
+            "ocr", OCR_CACHE_SIZE, ttl=OCR_CACHE_TTL,
+            db_path=OCR_CACHE_DB, disk_max_items=OCR_CACHE_DISK_SIZE,
+        )
+    return _ocr_cache
+
+
+def _key(kind: str, img: OcrImage, lang: str, config: str, prep: str) -> str:
+    return f"{kind}|{lang}|{config}|{prep}|{image_fingerprint(img)}"
+
+
+def ocr_string(img: OcrImage, lang: str, config: str, prep: str = "raw") -> str:
+    """`image_to_string` mis en cache (clé : raster + langue + config + prétraitement)."""
+    cache = get_ocr_cache()
+    key = _key("string", img, lang, config, prep)
+    text = cache.get(key)
+    if text is None:
+        text = get_engine().image_to_string(img, lang=lang, config=config)
+        cache.set(key, text)
+    return text
+
+
+def ocr_data(img: OcrImage, lang: str, config: str, prep: str = "raw") -> Dict:
+    """`image_to_data(..., output_type=Output.DICT)` mis en cache (mots + boîtes)."""
+    cache = get_ocr_cache()
+    key = _key("data", img, lang, config, prep)
+    data = cache.get(key)
+    if data is None:
+        data = get_engine().image_to_data(img, lang=lang, config=config)
+        cache.set(key, data)
+    return data
@@ -1,5 +1,8 @@
 import re
-from rapidfuzz import fuzz
+from typing import List, Optional
+from rapidfuzz import fuzz, process
+
+from app.utils.models import StatementHeader, Transaction
 
 # =========================
 # Mots-clés génériques
@@ -14,6 +17,52 @@ TITLE_KEYWORDS = ["mr", "ms", "mme", "madame", "monsieur"]
 
 DATE_REGEX = r"\d{2}/\d{2}/\d{4}"
 
+FUZZY_THRESHOLD = 80  # fuzz.partial_ratio strictement au-dessus = mot-clé présent
+
+
+class KeywordMatcher:
+    """
+    Index de mots-clés construit une fois à l'import :
+      - passe exacte : une seule regex (alternance des mots-clés) par ligne,
+      - repli flou : `fuzz.partial_ratio` calculé en lot (`process.cdist`, en C)
+        sur les seules lignes sans correspondance exacte.
+    Même résultat que `fuzz.partial_ratio(kw, line) > 80` pour chaque couple
+    (une sous-chaîne exacte vaut 100). Les lignes sont attendues en minuscules.
+    """
+
+    def __init__(self, keywords: List[str], threshold: float = FUZZY_THRESHOLD):
+        self.keywords = [kw.lower() for kw in keywords]
+        self.threshold = threshold
+        alternation = "|".join(re.escape(kw) for kw in sorted(set(self.keywords), key=len, reverse=True))
+        self._exact = re.compile(alternation)
+
+    def _fuzzy(self, lines: List[str]) -> List[bool]:
+        if not lines:
+            return []
+        scores = process.cdist(self.keywords, lines, scorer=fuzz.partial_ratio, score_cutoff=self.threshold)
+        return [bool(v) for v in (scores > self.threshold).any(axis=0)]
+
+    def matches(self, lines: List[str]) -> List[bool]:
+        """Pour chaque ligne : au moins un mot-clé présent (exact ou flou) ?"""
+        mask = [self._exact.search(l) is not None for l in lines]
+        pending = [i for i, hit in enumerate(mask) if not hit]
+        for i, hit in zip(pending, self._fuzzy([lines[i] for i in pending])):
+            mask[i] = hit
+        return mask
+
+    def first(self, lines: List[str]) -> Optional[int]:
+        """Index de la première ligne qui contient un mot-clé ; flou limité aux lignes qui la précèdent."""
+        first_exact = next((i for i, l in enumerate(lines) if self._exact.search(l)), len(lines))
+        fuzzy = self._fuzzy(lines[:first_exact])
+        hit = next((i for i, m in enumerate(fuzzy) if m), None)
+        if hit is not None:
+            return hit
+        return first_exact if first_exact < len(lines) else None
+
+BANK_MATCHER = KeywordMatcher(BANK_KEYWORDS)
+ACCOUNT_MATCHER = KeywordMatcher(ACCOUNT_KEYWORDS)
+TITLE_MATCHER = KeywordMatcher(TITLE_KEYWORDS)
+
 # =========================
 # Extraction principale
 # =========================
@@ -23,50 +72,45 @@ def extract_bank_statement_data(ocr_text: str):
     pour les transactions, sinon fallback générique.
     """
     lines = [l.strip() for l in ocr_text.split('\n') if l.strip()]
+    lowered = [l.lower() for l in lines]  # une seule mise en minuscules par document
+    safir = is_safir_statement(lines, lowered)
     # ✅ Saphir → override nom banque et titulaire
-    if is_safir_statement(lines):
+    if safir:
         banque_name = "AFRILAND FIRST BANK"
         titulaire = "SAFIR CONSULTING CAMEROUN"
     else:
-        banque_name = detect_bank(lines)
-        titulaire = detect_title_holder(lines)
-
-    data = {
-        "banque": banque_name,
-        "compte": detect_account(lines),
-        "titulaire": titulaire,
-        "periode": detect_period(lines),
-        "transactions": detect_transactions(lines)
-    }
-    return data
+        banque_name = detect_bank(lines, lowered)
+        titulaire = detect_title_holder(lines, lowered)
+
+    header = StatementHeader(
+        banque=banque_name,
+        compte=detect_account(lines, lowered),
+        titulaire=titulaire,
+        periode=detect_period(lines),
+    )
+    return {**header.to_dict(), "transactions": detect_transactions(lines, safir=safir)}
 
 # =========================
 # Détections génériques
 # =========================
-def detect_bank(lines):
-    for line in lines:
-        for kw in BANK_KEYWORDS:
-            if fuzz.partial_ratio(kw.lower(), line.lower()) > 80:
-                return line
+def detect_bank(lines, lowered=None):
+    i = BANK_MATCHER.first(lowered if lowered is not None else [l.lower() for l in lines])
+    return lines[i] if i is not None else None
+
+def detect_account(lines, lowered=None):
+    mask = ACCOUNT_MATCHER.matches(lowered if lowered is not None else [l.lower() for l in lines])
+    for line, hit in zip(lines, mask):
+        if hit:
+            # retire espaces et tirets pour capturer un bloc de chiffres
+            cleaned = line.replace(" ", "").replace("-", "")
+            account_numbers = re.findall(r"\d{6,}", cleaned)
+            if account_numbers:
+                return account_numbers[0]
     return None
 
-def detect_account(lines):
-    for line in lines:
-        for kw in ACCOUNT_KEYWORDS:
-            if fuzz.partial_ratio(kw.lower(), line.lower()) > 80:
-                # retire espaces et tirets pour capturer un bloc de chiffres
-                cleaned = line.replace(" ", "").replace("-", "")
-                account_numbers = re.findall(r"\d{6,}", cleaned)
-                if account_numbers:
-                    return account_numbers[0]
-    return None
-
-def detect_title_holder(lines):
-    for line in lines:
-        for kw in TITLE_KEYWORDS:
-            if fuzz.partial_ratio(kw.lower(), line.lower()) > 80:
-                return line
-    return None
+def detect_title_holder(lines, lowered=None):
+    i = TITLE_MATCHER.first(lowered if lowered is not None else [l.lower() for l in lines])
+    return lines[i] if i is not None else None
 
 def detect_period(lines):
     dates = []
@@ -91,11 +135,14 @@ DATE_REGEX_COMBINED = "(" + "|".join(DATE_PATTERNS) + ")"
 # Montant « isolé » (prise stricte pour éviter les collages)
 AMOUNT_REGEX = r"(?<!\d)(?:\d{1,3}(?:[ \u00A0]\d{3})+|\d+)(?:[.,]\d{2})?(?!\d)"
 
-def detect_transactions(lines):
+def detect_transactions(lines, safir=None):
     """
     Si Saphir → parse spécialisé. Sinon fallback générique existant (légèrement fiabilisé).
+    `safir` : détection déjà faite par l'appelant (évite de rejoindre le texte une 2e fois).
     """
-    if is_safir_statement(lines):
+    if safir is None:
+        safir = is_safir_statement(lines)
+    if safir:
         return parse_safir_transactions(lines)
 
     # --------- Fallback générique (inchangé dans l’API, fiabilisé pour la description) ----------
@@ -169,18 +216,13 @@ def parse_transaction_line(line):
     elif "-" in line and not sens:
         sens = "Dr"
 
-    return {
-        "date": date,
-        "description": description,
-        "montant": montant_str,
-        "sens": sens
-    }
+    return Transaction(date, description, montant_str, sens)
 
 # =========================
 # Règles spécifiques SAFIR
 # =========================
-def is_safir_statement(lines):
-    joined = " ".join(lines).lower()
+def is_safir_statement(lines, lowered=None):
+    joined = " ".join(lowered) if lowered is not None else " ".join(lines).lower()
     # marqueurs très stables visibles sur tes exemples
     return ("safir consulting cameroun" in joined) or ("extrait de compte" in joined and "débit (xaf)" in joined)
 
@@ -220,14 +262,6 @@ def _to_float(s: str):
     except Exception:
         return None
 
-def _close_enough(a: float, b: float) -> bool:
-    """Tolérance ~2% ou ±5 unités."""
-    if a is None or b is None:
-        return False
-    if a == 0:
-        return abs(b) <= 1.0
-    return (abs(a - b) / max(1.0, abs(a)) <= 0.02) or (abs(a - b) <= 5.0)
-
 def _find_initial_balance(lines):
     """
     Cherche 'Solde initial' et renvoie sa valeur float si trouvée.
@@ -283,70 +317,75 @@ def parse_safir_transactions(lines):
     - utilise Solde initial pour déduire le sens et valider le montant
     - retire proprement montant & solde de la description
     - robuste aux tokens cassés, () et symboles
+    Les soldes précédents, écarts et tolérances sont calculés en colonnes
+    (unités mineures) sur toutes les lignes à la fois.
     """
-    transactions = []
-    prev_solde = _find_initial_balance(lines)
-    rows = _build_safir_rows(lines)
+    import numpy as np  # import différé : le module reste léger au démarrage
+    from app.utils.transaction_service import close_enough, decimal_to_minor
 
+    opening = _find_initial_balance(lines)
     row_re = re.compile(r"^\s*(\d{2}/\d{2}/\d{4})\s+(\d{2}/\d{2}/\d{4})\s+(.+)$")
 
-    for row in rows:
+    # 1) tokens montants de chaque ligne (spans + valeurs)
+    rows = []
+    for row in _build_safir_rows(lines):
         m = row_re.match(row)
         if not m:
             continue
         date, _date_val, tail = m.groups()
-
-        # Tous les tokens montants avec leurs spans
-        tokens = [(mm.start(), mm.end(), mm.group()) for mm in _AMOUNT_TOKEN.finditer(tail)]
-        # Garde uniquement ceux qui se convertissent en nombre
         parsed = []
-        for s, e, txt in tokens:
-            norm = _normalize_amount(txt)
-            val = _to_float(norm)
-            if val is not None:
-                parsed.append((s, e, txt, norm, val))
+        for mm in _AMOUNT_TOKEN.finditer(tail):
+            norm = _normalize_amount(mm.group())
+            minor = decimal_to_minor(norm)  # même lecture que float(norm)
+            if minor is not None:
+                parsed.append((mm.start(), mm.end(), mm.group(), norm, minor))
+        # Hypothèse solide : le dernier token est le Solde
+        parsed.sort(key=lambda t: t[0])
+        rows.append((date, tail, parsed))
+
+    # 2) solde précédent de chaque ligne (report en avant du dernier solde lu)
+    n = len(rows)
+    has_solde = np.fromiter((bool(p) for _, _, p in rows), bool, n)
+    solde = np.fromiter((p[-1][4] if p else 0 for _, _, p in rows), np.int64, n)
+    idx = np.where(has_solde, np.arange(n), -1)
+    prev_idx = np.concatenate(([-1], np.maximum.accumulate(idx)[:-1])) if n else idx
+    opening_minor = int(round(opening * 100)) if opening is not None else None
+    prev_known = (prev_idx >= 0) | (opening_minor is not None)
+    prev = np.where(prev_idx >= 0, solde[np.maximum(prev_idx, 0)], opening_minor or 0)
+    delta = np.abs(solde - prev)
+
+    # 3) montant : le token (hors solde) le plus proche de |solde - solde précédent|
+    best = [min(p[:-1], key=lambda t: abs(t[4] - d)) if len(p) > 1 else None
+            for (_, _, p), d in zip(rows, delta.tolist())]
+    best_val = np.fromiter((b[4] if b else 0 for b in best), np.int64, n)
+    has_best = np.fromiter((b is not None for b in best), bool, n)
+    by_delta = (has_solde & prev_known & has_best & close_enough(delta, best_val)).tolist()
+    # - si on connaît le solde précédent : solde augmente -> Cr ; diminue -> Dr
+    by_balance = (has_solde & prev_known).tolist()
+    credit = (solde >= prev).tolist()
 
+    transactions = []
+    for i, (date, tail, parsed) in enumerate(rows):
         if not parsed:
             # aucune valeur exploitable -> on garde la description nettoyée
             description = re.sub(DATE_REGEX_COMBINED, "", tail)
             description = re.sub(r"\s+", " ", description).strip()
-            transactions.append({
-                "date": date,
-                "description": description,
-                "montant": None,
-                "sens": None
-            })
+            transactions.append(Transaction(date, description, None, None))
             continue
 
-        # Hypothèse solide : le dernier token est le Solde
-        parsed.sort(key=lambda t: t[0])
-        solde_s, solde_e, solde_txt, solde_norm, solde_val = parsed[-1]
-
-        # Choisir le montant : idéalement |solde - prev_solde|
-        montant_match = None
-        if prev_solde is not None and solde_val is not None:
-            delta = abs(solde_val - prev_solde)
-            # parmi les tokens sauf le dernier, on prend la valeur la plus proche de delta
-            candidates = parsed[:-1]
-            if candidates:
-                scored = sorted(candidates, key=lambda t: abs(t[4] - delta))
-                if scored and _close_enough(delta, scored[0][4]):
-                    montant_match = scored[0]
-
+        solde_s, solde_e, solde_txt, solde_norm, _ = parsed[-1]
         # fallback : si pas trouvé par delta, on prend l'avant-dernier token (si dispo)
-        if montant_match is None:
-            if len(parsed) >= 2:
-                montant_match = parsed[-2]
-            else:
-                montant_match = parsed[0]
-
-        m_s, m_e, m_txt, m_norm, m_val = montant_match
+        if by_delta[i]:
+            montant_match = best[i]
+        elif len(parsed) >= 2:
+            montant_match = parsed[-2]
+        else:
+            montant_match = parsed[0]
+        m_s, m_e, m_txt, m_norm, _ = montant_match
 
-        # Déterminer le sens :
-        # - si on connaît prev_solde : solde augmente -> Cr ; diminue -> Dr
         # - sinon heuristique sur mots-clés
-        if prev_solde is not None and solde_val is not None:
-            sens = "Cr" if solde_val >= prev_solde else "Dr"
+        if by_balance[i]:
+            sens = "Cr" if credit[i] else "Dr"
         else:
             low = tail.lower()
             if any(k in low for k in CREDIT_KEYWORDS):
@@ -374,16 +413,12 @@ def parse_safir_transactions(lines):
         description = re.sub(r"\b(débit|debit|crédit|credit|solde)\b", "", description, flags=re.IGNORECASE)
         description = re.sub(r"\s+", " ", description).strip(" :-\u00A0")
 
-        # MAJ prev_solde pour prochaine ligne
-        if solde_val is not None:
-            prev_solde = solde_val
-
-        transactions.append({
-            "date": date,
-            "description": description if description else None,
-            "montant": m_norm,   # string normalisée "1257225" / "10195.00" etc.
-            "sens": sens,
-            "solde": solde_norm  # champ en plus (ignoré par ton Excel actuel, utile au debug)
-        })
+        transactions.append(Transaction(
+            date,
+            description if description else None,
+            m_norm,      # string normalisée "1257225" / "10195.00" etc.
+            sens,
+            solde_norm,  # champ en plus (ignoré par ton Excel actuel, utile au debug)
+        ))
 
     return transactions
@@ -1,5 +1,7 @@
 import re
-from typing import List, Dict, Optional, Tuple
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from app.utils.models import StatementHeader, Transaction, transactions_to_dicts
 
 # =======================
 # Dates & helpers
@@ -25,21 +27,27 @@ AMOUNT_RE = re.compile(
     """
 )
 
-DEBIT_KW = ("frais", "commission", "comm.", "tx", "taxe", "découvert", "decouvert",
-            "intérêts", "interets", "dbt", "débit", "debit")
-CREDIT_KW = ("virement", "versement", "remboursement", "remb", "cime", "salaire",
-             "crédit", "credit")
+# Motifs précompilés (chaque ligne n'est normalisée / classée qu'une fois)
+DATE_ANY_RE = re.compile(DATE_RE)
+ROW_START_RE = re.compile(rf"^\s*{DATE_RE}\s+{DATE_RE}\b")
+SPLIT_DATE_INLINE_RE = re.compile(r"(\b\d{1,2}/\d{1,2})\s*/\s*(\d{2,4}\b)")  # "31/12 / 24"
+DAY_MONTH_END_RE = re.compile(r"(\b\d{1,2}/\d{1,2})\s*$")               # ligne finissant par "31/12"
+YEAR_START_RE = re.compile(r"^\s*/\s*(\d{2,4})(.*)$")                      # ligne suivante "/24 ..."
+CURRENCY_RE = re.compile(r"(XAF|FCFA)\b", re.I)
+XAF_WORD_RE = re.compile(r"\bXAF\b", re.I)
+NON_AMOUNT_CHARS_RE = re.compile(r"[^0-9.]")
+_AMOUNT_SPACES = str.maketrans("", "", " " + "".join(SPACE_VARIANTS))
 
 
 def _norm_spaces(s: str) -> str:
-    for sp in SPACE_VARIANTS:
-        s = s.replace(sp, " ")
-    return re.sub(r"\s+", " ", s).strip()
+    # str.split() coupe sur tous les blancs Unicode (dont SPACE_VARIANTS), comme \s+
+    return " ".join(s.split())
 
 
 def _strip_currency_and_sign(txt: str) -> Tuple[str, int]:
     t = txt.strip().replace("−", "-")
-    t = re.sub(r"(XAF|FCFA)\b", "", t, flags=re.I).strip()
+    if "X" in t or "F" in t or "x" in t or "f" in t:
+        t = CURRENCY_RE.sub("", t).strip()
     sign = 1
     if t.startswith("(") and t.endswith(")"):
         t = t[1:-1].strip()
@@ -55,9 +63,7 @@ def _strip_currency_and_sign(txt: str) -> Tuple[str, int]:
 
 def _norm_amount_txt(txt: str) -> str:
     raw, sign = _strip_currency_and_sign(txt)
-    for sp in SPACE_VARIANTS:
-        raw = raw.replace(sp, " ")
-    raw = raw.replace(" ", "")
+    raw = raw.translate(_AMOUNT_SPACES)
 
     if "." in raw and "," in raw:
         raw = raw.replace(".", "")
@@ -67,7 +73,7 @@ def _norm_amount_txt(txt: str) -> str:
     elif raw.count(".") > 1:
         raw = raw.replace(".", "")
 
-    raw = re.sub(r"[^0-9.]", "", raw)
+    raw = NON_AMOUNT_CHARS_RE.sub("", raw)
     if sign < 0 and raw:
         raw = "-" + raw
     return raw
@@ -80,41 +86,36 @@ def _to_number(txt: str) -> Optional[float]:
         return None
 
 
-def _has_kw(s: str, kws: Tuple[str, ...]) -> bool:
-    s = s.lower()
-    return any(k in s for k in kws)
-
-
 # =======================
-#  Pré-fix : dates éclatées
+#  Tokenizer : une classification par ligne
 # =======================
-def _fix_split_dates(lines: List[str]) -> List[str]:
-    """
-    Recolle les "31/12" + "/24" → "31/12/24", y compris quand c'est sur deux lignes.
-    """
-    fixed: List[str] = []
-    i = 0
-    while i < len(lines):
-        cur = _norm_spaces(lines[i])
-        # cas 1 : sur la même ligne : "dd/mm / yy" → "dd/mm/yy"
-        cur = re.sub(r"(\b\d{1,2}/\d{1,2})\s*/\s*(\d{2,4}\b)", r"\1/\2", cur)
-
-        # cas 2 : la ligne courante finit par "dd/mm" et la suivante commence par "/yy"
-        if re.search(r"\b\d{1,2}/\d{1,2}\s*$", cur) and i + 1 < len(lines):
-            nxt = _norm_spaces(lines[i + 1])
-            m = re.match(r"^\s*/\s*(\d{2,4})(.*)$", nxt)
-            if m:
-                yy = m.group(1)
-                rest = m.group(2)
-                cur = re.sub(r"(\b\d{1,2}/\d{1,2})\s*$", rf"\1/{yy}", cur)
-                # on “consomme” la ligne suivante (son reste est ajouté)
-                if rest.strip():
-                    cur = (cur + " " + rest.strip()).strip()
-                i += 1  # skip next line
-
-        fixed.append(cur)
-        i += 1
-    return fixed
+LINE_BLANK = "blank"
+LINE_ROW = "row"                    # "dd/mm/yy dd/mm/yy ..." : début d'une opération
+LINE_TABLE_HEADER = "table_header"  # "Date Opération ... Solde"
+LINE_BALANCE = "balance"            # "Solde initial ..."
+LINE_CONTINUATION = "continuation"  # suite de libellé / montants de l'opération en cours
+
+
+class LineToken(NamedTuple):
+    kind: str
+    text: str  # espaces normalisés
+    low: str   # minuscules, calculées une fois pour toutes les recherches de mots-clés
+
+
+def classify_line(text: str) -> LineToken:
+    """`text` déjà normalisé (`_norm_spaces`) et dates recollées."""
+    if not text:
+        return LineToken(LINE_BLANK, text, text)
+    low = text.lower()
+    if text[0].isdigit() and ROW_START_RE.match(text):
+        kind = LINE_ROW
+    elif ("opération" in low or "operation" in low) and "date" in low and "solde" in low:
+        kind = LINE_TABLE_HEADER
+    elif "solde initial" in low:
+        kind = LINE_BALANCE
+    else:
+        kind = LINE_CONTINUATION
+    return LineToken(kind, text, low)
 
 
 # =======================
@@ -134,118 +135,51 @@ def is_saphir_statement(text_or_lines) -> bool:
 # =======================
 #  En-tête
 # =======================
-def _extract_header(lines: List[str]) -> Dict[str, Optional[str]]:
-    banque = "Afriland First Bank"
-    titulaire = "SAFIR CONSULTING CAMEROUN"
-    compte = "00002-08237521001-09 XAF"
-    solde_initial = None
-
-    for raw in lines:
-        l = _norm_spaces(raw)
-        if "nom du client" in l.lower():
-            parts = l.split(":", 1)
-            if len(parts) == 2:
-                titulaire = parts[1].strip()
-        if (not titulaire) and "libellé du compte" in l.lower():
-            parts = l.split(":", 1)
-            if len(parts) == 2:
-                titulaire = parts[1].strip()
-
-        if "numéro de compte" in l.lower() or "numero de compte" in l.lower():
-            parts = l.split(":", 1)
-            if len(parts) == 2:
-                compte = parts[1].strip()
-                compte = re.sub(r"\bXAF\b", "", compte, flags=re.I).strip()
-
-        if "solde initial" in l.lower():
-            m = AMOUNT_RE.search(l)
-            if m:
-                solde_initial = _norm_amount_txt(m.group(1))
-
-    return {"banque": banque, "titulaire": titulaire, "compte": compte, "solde_initial": solde_initial}
+def _new_header() -> Dict[str, Optional[str]]:
+    return {
+        "banque": "Afriland First Bank",
+        "titulaire": "SAFIR CONSULTING CAMEROUN",
+        "compte": "00002-08237521001-09 XAF",
+        "solde_initial": None,
+    }
 
 
-# =======================
-#  Regroupement des lignes
-# =======================
-def _collect_table_rows(all_lines: List[str]) -> List[str]:
-    rows: List[str] = []
-    current: Optional[str] = None
-
-    # repérer l'en-tête du tableau
-    start_idx = 0
-    for i, raw in enumerate(all_lines):
-        low = raw.lower()
-        if ("opération" in low or "operation" in low) and ("date" in low and "solde" in low):
-            start_idx = i + 1
-            break
-
-    for raw in all_lines[start_idx:]:
-        line = _norm_spaces(raw)
-        if not line:
-            continue
-
-        m = re.match(rf"^\s*{DATE_RE}\s+{DATE_RE}\b", line)
+def _scan_header(tok: LineToken, header: Dict[str, Optional[str]]) -> None:
+    """Met à jour `header` avec une ligne (dernière valeur rencontrée gagnante)."""
+    low = tok.low
+    if "nom du client" in low:
+        parts = tok.text.split(":", 1)
+        if len(parts) == 2:
+            header["titulaire"] = parts[1].strip()
+    if (not header["titulaire"]) and "libellé du compte" in low:
+        parts = tok.text.split(":", 1)
+        if len(parts) == 2:
+            header["titulaire"] = parts[1].strip()
+
+    if "numéro de compte" in low or "numero de compte" in low:
+        parts = tok.text.split(":", 1)
+        if len(parts) == 2:
+            compte = parts[1].strip()
+            header["compte"] = XAF_WORD_RE.sub("", compte).strip() if "xaf" in low else compte
+
+    if "solde initial" in low:
+        m = AMOUNT_RE.search(tok.text)
         if m:
-            if current:
-                rows.append(current)
-            current = line
-        else:
-            if current:
-                current = (current + " " + line).strip()
-            else:
-                continue
-
-    if current:
-        rows.append(current)
+            header["solde_initial"] = _norm_amount_txt(m.group(1))
 
-    return rows
 
-
-# =======================
-#  Filtrage des nombres
-# =======================
-def _plausible_amount_token(text: str, full_line: str) -> bool:
-    """
-    Rejette :
-      - 1–2 chiffres (ex: 31, 05)
-      - années 19xx/20xx
-      - fragments collés à une date (précédés d'un '/')
-    Accepte :
-      - >=4 chiffres
-      - ou décimales (x.xx)
-      - ou séparateurs de milliers
-    """
-    norm = _norm_amount_txt(text)
-    if not norm:
-        return False
-
-    # fragment de date ? Juste avant le match, un '/'
-    idx = full_line.find(text)
-    if idx > 0 and full_line[idx - 1] == "/":
-        return False
-
-    # trop court
-    digits = norm.replace(".", "")
-    if len(digits) <= 2:
-        return False
-
-    # année pure
-    if digits in {"2023", "2024", "2025", "2026", "2019", "2020", "2021", "2022"}:
-        return False
-
-    # ok si décimal
-    if "." in norm:
-        return True
-
-    # ok si "gros" (>=4 chiffres) ou séparateurs de milliers
-    return len(digits) >= 4
+def _extract_header(lines: List[str], header: Optional[Dict[str, Optional[str]]] = None) -> Dict[str, Optional[str]]:
+    """En-tête lu sur `lines` ; `header` permet de poursuivre la lecture page après page."""
+    header = _new_header() if header is None else dict(header)
+    for raw in lines:
+        _scan_header(classify_line(_norm_spaces(raw)), header)
+    return header
 
 
 # =======================
 #  Parse d'une ligne
 # =======================
-def _parse_saphir_row(row: str, prev_balance: Optional[float]) -> Optional[Dict]:
+def _parse_saphir_row(row: str) -> Optional[Transaction]:
     m = DATE_LINE_RE.match(row)
     if not m:
         return None
@@ -254,11 +188,11 @@ def _parse_saphir_row(row: str, prev_balance: Optional[float]) -> Optional[Dict]
     tail = _norm_spaces(tail)
 
     # ⚡ Étape 1 : enlever les dates parasites genre "31/12/24"
-    tail = re.sub(DATE_RE, "", tail).strip()
+    if "/" in tail:
+        tail = DATE_ANY_RE.sub("", tail).strip()
 
-    # ⚡ Étape 2 : extraire tous les nombres restants
-    nums = [m.group(1) for m in AMOUNT_RE.finditer(tail)]
-    nums = [_norm_amount_txt(n) for n in nums if _norm_amount_txt(n)]
+    # ⚡ Étape 2 : extraire tous les nombres restants (normalisés une seule fois)
+    nums = [n for n in map(_norm_amount_txt, (t.group(1) for t in AMOUNT_RE.finditer(tail))) if n]
 
     if not nums:
         return None
@@ -286,138 +220,130 @@ def _parse_saphir_row(row: str, prev_balance: Optional[float]) -> Optional[Dict]
     desc = tail
     for n in nums:
         desc = desc.replace(n, "")
-    desc = re.sub(r"\s+", " ", desc).strip()
-
-    return {
-        "date": date,
-        "description": desc,
-        "montant": montant,
-        "sens": sens,
-        "solde": solde,
-    }
-
-    m = DATE_LINE_RE.match(row)
-    if not m:
-        return None
-
-    date, _date_val, tail = m.groups()
-    tail = _norm_spaces(tail)
+    desc = _norm_spaces(desc)
 
-    # candidats montants (avec filtrage anti-"31/25/05")
-    raw_tokens = list(AMOUNT_RE.finditer(tail))
-    tokens = [t for t in raw_tokens if _plausible_amount_token(t.group(1), tail)]
-    if len(tokens) < 1:
-        return None
-
-    # on prend le dernier "gros" nombre comme SOLDE
-    solde_txt = tokens[-1].group(1)
-    solde = _to_number(solde_txt)
-    if solde is None:
-        return None
-
-    # montant = token juste avant
-    amount = None
-    amount_txt = None
-    if len(tokens) >= 2:
-        amount_txt = tokens[-2].group(1)
-        amount = _to_number(amount_txt)
-
-    # fallback par différence
-    sens = None
-    if amount is None and prev_balance is not None and prev_balance != solde:
-        diff = round(abs(prev_balance - solde), 2)
-        amount = diff
-        if abs((prev_balance - diff) - solde) < 0.51:
-            sens = "Dr"
-        elif abs((prev_balance + diff) - solde) < 0.51:
-            sens = "Cr"
-
-    # sens via différence si possible
-    if amount is not None and prev_balance is not None and sens is None:
-        if abs((prev_balance - amount) - solde) < 0.51:
-            sens = "Dr"
-        elif abs((prev_balance + amount) - solde) < 0.51:
-            sens = "Cr"
-
-    # mots-clés (filet)
-    if sens is None and amount is not None:
-        if _has_kw(tail, CREDIT_KW):
-            sens = "Cr"
-        elif _has_kw(tail, DEBIT_KW):
-            sens = "Dr"
-
-    # nettoyage description : on retire solde + montant (si présent)
-    desc = tail
-    # retire solde (token complet)
-    s_sol, e_sol = tokens[-1].span()
-    desc = (desc[:s_sol] + " " + desc[e_sol:]).strip()
-
-    # retire montant (si présent)
-    if amount_txt is not None:
-        # on cherche l'occurrence normalisée pour être robuste
-        for m2 in AMOUNT_RE.finditer(desc):
-            if _norm_amount_txt(m2.group(1)) == _norm_amount_txt(amount_txt):
-                s2, e2 = m2.span()
-                desc = (desc[:s2] + " " + desc[e2:]).strip()
-                break
-
-    desc = re.sub(r"\s+", " ", desc).strip()
-
-    out = {
-        "date": date,
-        "description": desc,
-        "montant": (
-            None if amount is None
-            else (_norm_amount_txt(str(int(amount))) if float(amount).is_integer()
-                  else _norm_amount_txt(str(amount)))
-        ),
-        "sens": sens,
-        "solde": _norm_amount_txt(str(int(solde))) if float(solde).is_integer() else _norm_amount_txt(str(solde)),
-    }
-    return out
+    return Transaction(date, desc, montant, sens, solde)
 
 
 # =======================
-#  Parse du tableau complet
+#  Parse incrémental (page après page)
 # =======================
-def parse_saphir_transactions(lines: List[str], solde_initial_txt: Optional[str]) -> List[Dict]:
-    # 1) recoller les dates cassées
-    lines = _fix_split_dates(lines)
-    # 2) regrouper les lignes
-    rows = _collect_table_rows(lines)
-
-    txs: List[Dict] = []
-    prev_balance: Optional[float] = _to_number(solde_initial_txt) if solde_initial_txt else None
+class SaphirStreamParser:
+    """
+    Parse du tableau en un seul passage, alimenté par morceaux (`feed`) :
+    dates éclatées recollées (une ligne d'avance), chaque ligne classée une
+    fois (`classify_line`), puis les jetons servent à la fois à l'en-tête
+    (`header`) et au regroupement des opérations. Une transaction est produite
+    dès que la ligne suivante commence ; le solde courant est conservé d'une
+    page à l'autre. `close()` vide la dernière ligne en attente.
+    """
 
-    for r in rows:
-        parsed = _parse_saphir_row(r, prev_balance)
+    def __init__(self, solde_initial_txt: Optional[str] = None):
+        self.prev_balance: Optional[float] = _to_number(solde_initial_txt) if solde_initial_txt else None
+        self.header: Dict[str, Optional[str]] = _new_header()
+        self._pending: Optional[str] = None        # ligne retenue (date "dd/mm" éventuellement coupée)
+        self._started = False                      # en-tête du tableau rencontré
+        self._before_table: List[LineToken] = []  # lignes vues avant l'en-tête du tableau
+        self._current: Optional[str] = None       # opération en cours de regroupement
+
+    def set_opening_balance(self, solde_initial_txt: Optional[str]) -> None:
+        """Solde initial connu après coup (en-tête lu sur la même page que le tableau)."""
+        if self.prev_balance is None and solde_initial_txt:
+            self.prev_balance = _to_number(solde_initial_txt)
+
+    # ---- dates éclatées (une ligne d'avance) ----
+    def _fixed_lines(self, lines: List[str]):
+        for raw in lines:
+            nxt = _norm_spaces(raw)
+            if self._pending is not None:
+                cur = self._pending
+                self._pending = None
+                if nxt[:1] == "/":
+                    m = YEAR_START_RE.match(nxt)
+                    if m and DAY_MONTH_END_RE.search(cur):
+                        cur = DAY_MONTH_END_RE.sub(rf"\1/{m.group(1)}", cur)
+                        if m.group(2).strip():
+                            cur = (cur + " " + m.group(2).strip()).strip()
+                        yield cur
+                        continue  # ligne suivante consommée
+                yield cur
+            self._pending = SPLIT_DATE_INLINE_RE.sub(r"\1/\2", nxt) if "/" in nxt else nxt
+
+    # ---- jetons -> en-tête + opérations ----
+    def _token(self, tok: LineToken, out: List[Transaction]) -> None:
+        if tok.kind == LINE_BLANK:
+            return
+        _scan_header(tok, self.header)
+        if tok.kind == LINE_BALANCE:
+            self.set_opening_balance(self.header["solde_initial"])
+        if not self._started:
+            if tok.kind == LINE_TABLE_HEADER:
+                self._started = True
+                self._before_table = []
+            else:
+                self._before_table.append(tok)
+            return
+        self._row_token(tok, out)
+
+    def _row_token(self, tok: LineToken, out: List[Transaction]) -> None:
+        if tok.kind == LINE_ROW:
+            if self._current:
+                self._emit(self._current, out)
+            self._current = tok.text
+        elif self._current:
+            self._current = self._current + " " + tok.text
+
+    def _emit(self, row: str, out: List[Transaction]) -> None:
+        parsed = _parse_saphir_row(row)
         if not parsed:
-            continue
-
-        if parsed.get("solde") is not None:
+            return
+        if parsed.solde is not None:
             try:
-                prev_balance = float(parsed["solde"])
+                self.prev_balance = float(parsed.solde)
             except Exception:
                 pass
+        out.append(parsed)
+
+    def feed(self, lines: List[str]) -> List[Transaction]:
+        """Transactions terminées par ces lignes (les suivantes peuvent encore compléter la dernière)."""
+        out: List[Transaction] = []
+        for line in self._fixed_lines(lines):
+            self._token(classify_line(line), out)
+        return out
+
+    def close(self) -> List[Transaction]:
+        out: List[Transaction] = []
+        if self._pending is not None:
+            self._token(classify_line(self._pending), out)
+            self._pending = None
+        if not self._started:
+            # pas d'en-tête de tableau : toutes les lignes sont candidates
+            self._started = True
+            for tok in self._before_table:
+                self._row_token(tok, out)
+            self._before_table = []
+        if self._current:
+            self._emit(self._current, out)
+            self._current = None
+        return out
 
-        txs.append({
-            "date": parsed["date"],
-            "description": parsed["description"],
-            "montant": parsed["montant"],
-            "sens": parsed["sens"],
-        })
 
-    return txs
+# =======================
+#  Parse du tableau complet
+# =======================
+def parse_saphir_transactions(lines: List[str], solde_initial_txt: Optional[str]) -> List[Transaction]:
+    parser = SaphirStreamParser(solde_initial_txt)
+    return parser.feed(lines) + parser.close()
 
 
 # =======================
 #  Période min/max
 # =======================
-def _extract_period_from_txs(transactions: List[Dict]) -> Optional[str]:
+def _extract_period_from_txs(transactions: List[Transaction]) -> Optional[str]:
     dates = []
     for t in transactions:
-        d = t.get("date")
-        if d and re.match(DATE_RE, d):
+        d = t.date
+        if d and DATE_ANY_RE.match(d):
             parts = d.split("/")
             if len(parts[-1]) == 2:
                 yy = int(parts[-1])
@@ -436,19 +362,83 @@ def extract_saphir_bank_statement_data(ocr_text: str) -> Dict:
 
     if not is_saphir_statement(lines):
         return {
-            "banque": None, "compte": None, "titulaire": None, "periode": None,
+            **StatementHeader().to_dict(),
             "transactions": [], "_debug": {"reason": "not_saphir"},
         }
 
-    header = _extract_header(lines)
-    txs = parse_saphir_transactions(lines, header.get("solde_initial"))
+    # un seul passage : les mêmes jetons alimentent l'en-tête et le tableau
+    parser = SaphirStreamParser()
+    txs = parser.feed(lines) + parser.close()
+    header = parser.header
     periode = _extract_period_from_txs(txs)
 
     return {
-        "banque": header.get("banque"),
-        "compte": header.get("compte"),
-        "titulaire": header.get("titulaire"),
-        "periode": periode,
+        **StatementHeader(header.get("banque"), header.get("compte"), header.get("titulaire"), periode).to_dict(),
         "transactions": txs,
         "_debug": {"solde_initial": header.get("solde_initial"), "tx_count": len(txs)},
     }
+
+
+# =======================
+#  Entrée en flux (page après page)
+# =======================
+def iter_saphir_events(pages: Iterable[str]) -> Iterator[Dict]:
+    """
+    Variante en flux de `extract_saphir_bank_statement_data` : `pages` donne le
+    texte OCR page par page. Événements produits :
+      {"event": "header", "field", "value"}   dès qu'un champ est connu ou change,
+      {"event": "page", "page", "transactions"} transactions terminées sur cette page,
+      {"event": "done", banque/compte/titulaire/periode, "transaction_count", "_debug"}.
+    Le solde courant (sens Dr/Cr) est conservé d'une page à l'autre.
+    """
+    parser = SaphirStreamParser()
+    held: List[str] = []          # pages lues avant d'avoir reconnu un relevé SAPHIR
+    confirmed = False
+    sent: Dict[str, Optional[str]] = {}
+    first = last = None           # bornes de la période
+    count = 0
+    page_no = 0
+
+    def page_event(txs: List[Transaction]) -> Dict:
+        nonlocal first, last, count
+        for t in txs:
+            d = t.date
+            if d and DATE_ANY_RE.match(d):
+                first = first or t
+                last = t
+        count += len(txs)
+        return {"event": "page", "page": page_no, "transactions": transactions_to_dicts(txs)}
+
+    for page_no, text in enumerate(pages, start=1):
+        lines = [l.strip() for l in text.splitlines() if l.strip()]
+        if not confirmed:
+            held.extend(lines)
+            if not is_saphir_statement(held):
+                continue
+            confirmed, lines, held = True, held, []
+
+        txs = parser.feed(lines)  # en-tête et solde initial lus au passage
+        for k in ("banque", "compte", "titulaire"):
+            if parser.header.get(k) != sent.get(k):
+                sent[k] = parser.header.get(k)
+                yield {"event": "header", "field": k, "value": sent[k]}
+        yield page_event(txs)
+
+    if confirmed:
+        tail = parser.close()
+        if tail:
+            yield page_event(tail)
+
+    periode = _extract_period_from_txs([first, last]) if first else None
+    if periode:
+        yield {"event": "header", "field": "periode", "value": periode}
+    yield {
+        "event": "done",
+        "banque": sent.get("banque"),
+        "compte": sent.get("compte"),
+        "titulaire": sent.get("titulaire"),
+        "periode": periode,
+        "transaction_count": count,
+        "_debug": {"solde_initial": parser.header.get("solde_initial"), "tx_count": count}
+        if confirmed else {"reason": "not_saphir"},
+    }
@@ -0,0 +1,150 @@
+# app/utils/preprocess_service.py
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+# ⚙️ CONFIG — étapes de prétraitement par modèle de relevé
+# Géométriques (appliquées à la page couleur, AVANT YOLO) : "deskew", "downscale"
+# Photométriques (image OCR) : "denoise", "binarize" (le passage en gris est implicite)
+PREPROCESS_PROFILES: Dict[str, List[str]] = {
+    "default": ["binarize"],
+    "scan": ["deskew", "downscale", "denoise", "binarize"],  # photos / scans de travers
+}
+PREPROCESS_PROFILE = os.getenv("PREPROCESS_PROFILE", "default")  # profil si le modèle n'en a pas
+PREPROCESS_TARGET_DPI = int(os.getenv("PREPROCESS_TARGET_DPI", "300"))  # étape "downscale"
+# "page" : page binarisée une fois, les crops OCR sont des vues ; "crop" : Otsu par crop (ancien)
+PREPROCESS_SCOPE = os.getenv("PREPROCESS_SCOPE", "page")
+
+GEOMETRIC_STAGES = ("deskew", "downscale")
+MAX_DESKEW_ANGLE = 15.0  # au-delà : probablement une mauvaise estimation, on ne tourne pas
+
+
+class Preprocessor:
+    """
+    Pipeline d'étapes configurable. Les intermédiaires (gris, débruitage) vont
+    dans des buffers préalloués par thread ; seule la sortie finale est allouée.
+    Chaque étape est chronométrée (`stats()`), pour comparer gain OCR et coût CPU.
+    """
+
+    def __init__(self, name: str, stages: List[str], target_dpi: int = PREPROCESS_TARGET_DPI):
+        self.name = name
+        self.stages = list(stages)
+        self.target_dpi = target_dpi
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._timings: Dict[str, List[float]] = {}  # étape -> [appels, ms cumulées]
+
+    @property
+    def geometric(self) -> bool:
+        """Le profil redresse / réduit la page entière (incompatible avec le rendu par zones)."""
+        return any(stage in GEOMETRIC_STAGES for stage in self.stages)
+
+    # ---- buffers / chrono ----
+    def _scratch(self, name: str, shape: Tuple[int, ...]) -> np.ndarray:
+        bufs = getattr(self._local, "bufs", None)
+        if bufs is None:
+            bufs = self._local.bufs = {}
+        buf = bufs.get(name)
+        if buf is None or buf.shape != shape:
+            buf = bufs[name] = np.empty(shape, np.uint8)
+        return buf
+
+    def _timed(self, stage: str, t0: float) -> None:
+        ms = (time.perf_counter() - t0) * 1000
+        with self._lock:
+            t = self._timings.setdefault(stage, [0, 0.0])
+            t[0] += 1
+            t[1] += ms
+
+    def stats(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {
+                stage: {"calls": n, "total_ms": round(ms, 1), "avg_ms": round(ms / n, 2) if n else 0.0}
+                for stage, (n, ms) in self._timings.items()
+            }
+
+    # ---- étapes géométriques (page couleur) ----
+    def _deskew(self, img: np.ndarray) -> Tuple[np.ndarray, bool]:
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+        small = cv2.resize(gray, None, fx=0.25, fy=0.25, interpolation=cv2.INTER_AREA)
+        ink = cv2.threshold(small, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)[1]
+        pts = cv2.findNonZero(ink)
+        if pts is None:
+            return img, False
+        angle = cv2.minAreaRect(pts)[-1]
+        if angle > 45:  # convention OpenCV >= 4.5 : ]0, 90]
+            angle -= 90
+        elif angle < -45:  # convention plus ancienne : [-90, 0[
+            angle += 90
+        if abs(angle) < 0.1 or abs(angle) > MAX_DESKEW_ANGLE:
+            return img, False
+        h, w = img.shape[:2]
+        m = cv2.getRotationMatrix2D((w / 2, h / 2), angle, 1.0)
+        return cv2.warpAffine(img, m, (w, h), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE), True
+
+    def prepare_page(self, img: np.ndarray, src_dpi: Optional[int] = None) -> Tuple[np.ndarray, float, bool]:
+        """
+        Étapes géométriques sur la page couleur, avant détection.
+        Retourne (image, facteur d'échelle appliqué, page tournée ?).
+        """
+        scale, rotated = 1.0, False
+        for stage in self.stages:
+            if stage == "downscale" and src_dpi and self.target_dpi and self.target_dpi < src_dpi:
+                t0 = time.perf_counter()
+                scale = self.target_dpi / float(src_dpi)
+                img = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+                self._timed(stage, t0)
+            elif stage == "deskew":
+                t0 = time.perf_counter()
+                img, rotated = self._deskew(img)
+                self._timed(stage, t0)
+        return img, scale, rotated
+
+    # ---- étapes photométriques (image OCR) ----
+    def run(self, img: np.ndarray) -> np.ndarray:
+        """Gris + étapes photométriques ; accepte une vue (crop) sans la copier."""
+        t0 = time.perf_counter()
+        if img.ndim == 3:
+            cur = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY, dst=self._scratch("gray", img.shape[:2]))
+        else:
+            cur = img
+        self._timed("grayscale", t0)
+
+        owned = False
+        for stage in self.stages:
+            if stage in GEOMETRIC_STAGES:
+                continue
+            t0 = time.perf_counter()
+            if stage == "denoise":
+                cur = cv2.medianBlur(cur, 3, dst=self._scratch("denoise", cur.shape))
+            elif stage == "binarize":
+                out = np.empty(cur.shape, np.uint8)
+                cv2.threshold(cur, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU, dst=out)
+                cur, owned = out, True
+            self._timed(stage, t0)
+
+        # la sortie ne doit jamais être un buffer réutilisé par l'appel suivant
+        if not owned:
+            cur = cur.copy()
+        return cur
+
+
+_preprocessors: Dict[str, Preprocessor] = {}
+_preprocessors_lock = threading.Lock()
+
+def get_preprocessor(template: Optional[str] = None) -> Preprocessor:
+    """Préprocesseur du modèle `template` (ou du profil par défaut s'il n'en a pas)."""
+    name = template if template in PREPROCESS_PROFILES else PREPROCESS_PROFILE
+    with _preprocessors_lock:
+        if name not in _preprocessors:
+            _preprocessors[name] = Preprocessor(name, PREPROCESS_PROFILES.get(name, ["binarize"]))
+        return _preprocessors[name]
+
+
+def preprocess_stats() -> Dict[str, Dict]:
+    with _preprocessors_lock:
+        return {name: p.stats() for name, p in _preprocessors.items()}
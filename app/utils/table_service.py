@@ -0,0 +1,300 @@
+# app/utils/table_service.py
+import os
+import re
+from bisect import bisect_right
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from app.utils.document_service import Word, group_words_into_lines
+from app.utils.models import Transaction
+from app.utils.parser_saphir import _norm_amount_txt
+
+# ⚙️ CONFIG — tableau reconstruit à partir des boîtes de mots (colonnes par x, lignes par y)
+TABLE_RECONSTRUCTION = os.getenv("TABLE_RECONSTRUCTION", "1") == "1"
+COLUMN_GAP_RATIO = float(os.getenv("COLUMN_GAP_RATIO", "1.0"))  # blanc min entre colonnes, en hauteur de mot
+HEADER_SEARCH_ROWS = 12  # l'en-tête du tableau est cherché dans les premières lignes seulement
+# ligne plus large que l'en-tête (pied de page, mentions pleine largeur) : hors tableau
+ROW_WIDTH_TOLERANCE = 1.15
+
+# Rôle des colonnes d'après les mots de l'en-tête
+ROLE_KEYWORDS: Dict[str, Tuple[str, ...]] = {
+    "debit": ("débit", "debit", "retrait", "retraits", "withdrawal", "withdrawals"),
+    "credit": ("crédit", "credit", "versement", "versements", "deposit", "deposits"),
+    "solde": ("solde", "balance"),
+    "montant": ("montant", "amount"),
+    "description": ("libellé", "libelle", "opération", "operation", "opérations", "operations",
+                    "description", "désignation", "designation", "détail", "detail"),
+    "date": ("date",),
+}
+AMOUNT_ROLES = ("debit", "credit", "montant", "solde")
+_ROLE_BY_WORD = {kw: role for role, kws in ROLE_KEYWORDS.items() for kw in kws}
+
+DATE_CELL_RE = re.compile(r"^(\d{1,2}[/.-]\d{1,2}(?:[/.-]\d{2,4})?)\b")
+AMOUNT_CELL_RE = re.compile(r"^\(?[+\-−]?\s*\d[\d   .,'’]*\)?-?(?:\s*(?:XAF|FCFA|€|\$))?$", re.I)
+
+
+class Column(NamedTuple):
+    x1: int
+    x2: int
+    role: Optional[str]  # debit / credit / montant / solde / description / date / None
+
+
+class Cell(NamedTuple):
+    column: int
+    text: str
+    kind: str  # "date" | "amount" | "text"
+
+
+class Table(NamedTuple):
+    columns: List[Column]
+    rows: List[List[Cell]]  # lignes du corps, cellules triées par colonne
+    header_found: bool
+
+
+def cell_kind(text: str) -> str:
+    if DATE_CELL_RE.match(text) and len(text) <= 10:
+        return "date"
+    if AMOUNT_CELL_RE.match(text) and _norm_amount_txt(text):
+        return "amount"
+    return "text"
+
+
+# -----------------------
+# Lignes (y) et colonnes (x)
+# -----------------------
+def _rows(words: List[Word]) -> List[List[Word]]:
+    """Lignes visuelles (regroupement par y, O(n log n)), mots triés par x."""
+    rows: List[List[Word]] = []
+    key = None
+    for w in group_words_into_lines(words):
+        if w.line_key != key:
+            rows.append([])
+            key = w.line_key
+        rows[-1].append(w)
+    return rows
+
+
+def _header_roles(row: List[Word]) -> List[Tuple[str, float]]:
+    """[(rôle, centre x)] des mots d'une ligne d'en-tête ; vide si la ligne n'en est pas une."""
+    roles: List[Tuple[str, float]] = []
+    for i, w in enumerate(row):
+        role = _ROLE_BY_WORD.get(w.text.lower().strip(":()"))
+        if role is None:
+            continue
+        nxt = row[i + 1].text.lower() if i + 1 < len(row) else ""
+        if role == "date" and nxt.startswith("valeur"):
+            role = "date_valeur"
+        roles.append((role, (w.x1 + w.x2) / 2.0))
+    amount_roles = {r for r, _ in roles if r in AMOUNT_ROLES}
+    return roles if len(amount_roles) >= 2 or (amount_roles and any(r == "date" for r, _ in roles)) else []
+
+
+def _row_width(row: List[Word]) -> int:
+    return max(w.x2 for w in row) - min(w.x1 for w in row)
+
+
+def _column_spans(rows: List[List[Word]], gap: float, max_width: Optional[float] = None) -> List[Tuple[int, int]]:
+    """
+    Projection des mots sur l'axe x : intervalles fusionnés tant que le blanc < `gap`.
+    Les lignes plus larges que `max_width` (largeur de l'en-tête) sont ignorées :
+    un texte pleine largeur relierait toutes les colonnes.
+    """
+    if max_width is not None:
+        rows = [row for row in rows if _row_width(row) <= max_width]
+    intervals = sorted((w.x1, w.x2) for row in rows for w in row)
+    spans: List[List[int]] = []
+    for x1, x2 in intervals:
+        if spans and x1 <= spans[-1][1] + gap:
+            spans[-1][1] = max(spans[-1][1], x2)
+        else:
+            spans.append([x1, x2])
+    return [(a, b) for a, b in spans]
+
+
+def _span_index(starts: List[int], spans: List[Tuple[int, int]], x: float) -> int:
+    """Colonne contenant x, sinon la plus proche."""
+    i = max(0, bisect_right(starts, x) - 1)
+    if spans[i][0] <= x <= spans[i][1]:
+        return i
+    candidates = [j for j in (i, i + 1) if j < len(spans)]
+    return min(candidates, key=lambda j: min(abs(x - spans[j][0]), abs(x - spans[j][1])))
+
+
+def reconstruct_table(words: List[Word], template: Optional[Table] = None) -> Optional[Table]:
+    """
+    Tableau à partir de mots positionnés (image_to_data ou couche texte) :
+    lignes par y, colonnes par les blancs verticaux communs, rôle des colonnes
+    lu dans l'en-tête (Débit / Crédit / Solde...). Sans en-tête sur la page,
+    les rôles de `template` (page précédente) sont repris par position.
+    None si aucune colonne de montant n'est identifiable sans ambiguïté.
+    """
+    rows = _rows(words)
+    if not rows:
+        return None
+
+    header_at, roles = None, []
+    for i, row in enumerate(rows[:HEADER_SEARCH_ROWS]):
+        roles = _header_roles(row)
+        if roles:
+            header_at = i
+            break
+    body = rows[header_at + 1:] if header_at is not None else rows
+    if header_at is not None:
+        max_width: Optional[float] = _row_width(rows[header_at]) * ROW_WIDTH_TOLERANCE
+    elif template is not None and template.columns:
+        max_width = (template.columns[-1].x2 - template.columns[0].x1) * ROW_WIDTH_TOLERANCE
+    else:
+        max_width = None
+    if max_width is not None:
+        body = [row for row in body if _row_width(row) <= max_width]
+    if not body:
+        return None
+
+    heights = sorted(max(1, w.y2 - w.y1) for row in body for w in row)
+    spans = _column_spans(body, COLUMN_GAP_RATIO * heights[len(heights) // 2], max_width)
+    starts = [a for a, _ in spans]
+
+    col_roles: List[Optional[str]] = [None] * len(spans)
+    if roles:
+        for role, xc in roles:
+            j = _span_index(starts, spans, xc)
+            if col_roles[j] is None:
+                col_roles[j] = role
+            elif col_roles[j] != role and (role in AMOUNT_ROLES or col_roles[j] in AMOUNT_ROLES):
+                return None  # deux colonnes de montants fusionnées : ambigu
+    elif template is not None:
+        for col in template.columns:
+            if col.role:
+                j = _span_index(starts, spans, (col.x1 + col.x2) / 2.0)
+                col_roles[j] = col_roles[j] or col.role
+    if not any(r in AMOUNT_ROLES for r in col_roles):
+        return None
+
+    columns = [Column(a, b, r) for (a, b), r in zip(spans, col_roles)]
+    table_rows: List[List[Cell]] = []
+    for row in body:
+        texts: Dict[int, List[str]] = {}
+        for w in row:
+            texts.setdefault(_span_index(starts, spans, (w.x1 + w.x2) / 2.0), []).append(w.text)
+        cells = []
+        for j in sorted(texts):
+            text = " ".join(texts[j])
+            cells.append(Cell(j, text, cell_kind(text)))
+        table_rows.append(cells)
+    return Table(columns, table_rows, header_at is not None)
+
+
+# -----------------------
+# Cellules typées -> transactions
+# -----------------------
+def _new_transaction(date: str) -> Dict:
+    return {"date": date, "description": [], "montant": None, "sens": None, "solde": None}
+
+
+def _finish(tx: Dict, prev_solde: Optional[float]) -> Tuple[Transaction, Optional[float]]:
+    """Libellé recollé ; sens déduit du solde seulement si aucune colonne ne le donne."""
+    description = " ".join(tx["description"]).strip() or None
+    try:
+        solde = float(tx["solde"]) if tx["solde"] else None
+    except ValueError:
+        solde = None
+    if tx["sens"] is None and solde is not None and prev_solde is not None and solde != prev_solde:
+        tx["sens"] = "Cr" if solde > prev_solde else "Dr"
+    record = Transaction(tx["date"], description, tx["montant"], tx["sens"], tx["solde"])
+    return record, solde if solde is not None else prev_solde
+
+
+def transactions_by_page(tables: List[Optional[Table]]) -> List[List[Transaction]]:
+    """
+    Une transaction par ligne qui commence par une date ; les lignes suivantes
+    sans date complètent le libellé (et les montants encore vides), y compris
+    d'une page à l'autre. Le sens vient de la colonne (Débit / Crédit) ou du
+    signe dans une colonne Montant ; à défaut, du mouvement de la colonne Solde.
+    Chaque transaction est rangée sur la page où elle se termine (celle où
+    commence la suivante), comme les règles texte SAPHIR ; une page sans
+    tableau (None) termine la transaction en cours.
+    """
+    pages: List[List[Transaction]] = [[] for _ in tables]
+    current: Optional[Dict] = None
+    prev_solde: Optional[float] = None
+
+    def close(page: int) -> None:
+        nonlocal current, prev_solde
+        if current is not None:
+            tx, prev_solde = _finish(current, prev_solde)
+            pages[page].append(tx)
+            current = None
+
+    for page, table in enumerate(tables):
+        if table is None:
+            close(page)
+            prev_solde = None  # les soldes de cette page ne sont pas lus ici
+            continue
+        roles = [c.role for c in table.columns]
+        for cells in table.rows:
+            if not cells:
+                continue
+            first = cells[0]
+            m = DATE_CELL_RE.match(first.text) if first.kind != "amount" else None
+            if m:
+                close(page)
+                current = _new_transaction(m.group(1))
+                rest = first.text[m.end():].strip()
+                if rest and not DATE_CELL_RE.match(rest):
+                    current["description"].append(rest)
+                cells = cells[1:]
+            elif current is None:
+                continue  # lignes avant la première opération (report, sous-titres...)
+
+            for cell in cells:
+                role = roles[cell.column]
+                if cell.kind == "date" and role in (None, "date", "date_valeur"):
+                    continue
+                if cell.kind == "amount" and role in AMOUNT_ROLES:
+                    value = _norm_amount_txt(cell.text)
+                    if role == "solde":
+                        current["solde"] = current["solde"] or value
+                    elif current["montant"] is None:
+                        current["montant"] = value.lstrip("-")
+                        if role == "montant":
+                            current["sens"] = "Dr" if value.startswith("-") else ("Cr" if "+" in cell.text else None)
+                        else:
+                            current["sens"] = "Dr" if role == "debit" else "Cr"
+                    continue
+                current["description"].append(cell.text)
+    if tables:
+        close(len(tables) - 1)
+    return pages
+
+
+def transactions_from_tables(tables: List[Table]) -> List[Transaction]:
+    return [tx for page in transactions_by_page(tables) for tx in page]
+
+
+def parse_table_pages(pages_words: List[List[Word]]) -> Optional[List[Optional[List[Transaction]]]]:
+    """
+    Par page : transactions du tableau, ou None si la page n'a pas pu être
+    reconstruite (l'appelant garde alors ses propres lignes pour cette page).
+    None si aucune page n'a d'en-tête de tableau.
+    """
+    tables: List[Optional[Table]] = []
+    template: Optional[Table] = None
+    for words in pages_words:
+        table = reconstruct_table(words, template=template)
+        if table is not None and table.header_found:
+            template = table
+        tables.append(table)
+    if template is None:
+        return None
+    pages = transactions_by_page(tables)
+    return [txs if table is not None else None for table, txs in zip(tables, pages)]
+
+
+def parse_table_words(pages_words: List[List[Word]]) -> Optional[List[Transaction]]:
+    """
+    Transactions d'un tableau réparti sur une ou plusieurs pages (mots de chaque
+    page). None si aucune page n'a un tableau exploitable : l'appelant garde
+    alors l'analyse ligne à ligne.
+    """
+    pages = parse_table_pages(pages_words)
+    txs = [tx for page in pages or [] if page for tx in page]
+    return txs or None
@@ -0,0 +1,224 @@
+# app/utils/transaction_service.py
+import os
+import re
+from typing import Dict, Iterable, List, Optional, Union
+
+import numpy as np
+
+from app.utils.models import Transaction, as_transaction
+
+# ⚙️ CONFIG — écart toléré entre solde calculé et solde lu (unités mineures : 500 = 5,00)
+BALANCE_TOLERANCE = int(os.getenv("BALANCE_TOLERANCE", "500"))
+BALANCE_MAX_REPORTED = 20  # indices de lignes en écart renvoyés dans le rapport
+
+SENS_CR, SENS_DR, SENS_NONE = 1, -1, 0
+_SENS_CODES = {"Cr": SENS_CR, "Dr": SENS_DR}
+_SENS_LABELS = {SENS_CR: "Cr", SENS_DR: "Dr"}
+
+AMOUNT_TXT_RE = re.compile(r"^(-?)(\d+)(?:\.(\d+))?$")
+# "5.000", "1.257.225", "1,257,225" : séparateurs de milliers (XAF sans décimales)
+THOUSANDS_TXT_RE = re.compile(r"^\d{1,3}(?:([.,])\d{3})(?:\1\d{3})*$")
+_AMOUNT_SPACES = str.maketrans("", "", " \u00A0\u202F\u2009\u2007")
+DATE_DMY_RE = re.compile(r"^(\d{1,2})/(\d{1,2})/(\d{2}|\d{4})$")
+
+
+# -----------------------
+# Montants en unités mineures (centimes, entiers)
+# -----------------------
+def decimal_to_minor(txt: Optional[str]) -> Optional[int]:
+    """Texte décimal strict (point seul) : '1257225' -> 125722500 ; '-10195.5' -> -1019550."""
+    m = AMOUNT_TXT_RE.match(txt or "")
+    if not m:
+        return None
+    sign, units, frac = m.groups()
+    cents = int((frac or "0")[:2].ljust(2, "0"))
+    value = int(units) * 100 + cents
+    return -value if sign else value
+
+
+def to_minor(txt: Optional[str]) -> Optional[int]:
+    """
+    Montant tel qu'écrit par les parseurs ou le relevé : '5.000' -> 500000
+    (milliers), '1.257.225', '10 195,50' -> 1019550, '10195.50'. Un séparateur
+    suivi de 3 chiffres est un séparateur de milliers, sinon c'est la virgule
+    décimale (la dernière). None si illisible.
+    """
+    t = (txt or "").strip().translate(_AMOUNT_SPACES)
+    sign = ""
+    if t.startswith("-"):
+        sign, t = "-", t[1:]
+    if THOUSANDS_TXT_RE.match(t):
+        t = t.replace(".", "").replace(",", "")
+    else:
+        last = max(t.rfind("."), t.rfind(","))
+        if last >= 0:
+            t = t[:last].replace(".", "").replace(",", "") + "." + t[last + 1:]
+    return decimal_to_minor(sign + t)
+
+
+def format_minor(value: int) -> str:
+    """Inverse de `to_minor`, au format des parseurs : '1257225', '10195.50'."""
+    sign = "-" if value < 0 else ""
+    units, cents = divmod(abs(int(value)), 100)
+    return f"{sign}{units}.{cents:02d}" if cents else f"{sign}{units}"
+
+
+def close_enough(expected: np.ndarray, found: np.ndarray) -> np.ndarray:
+    """Tolérance ~2 % ou ±5 unités (±1 si le montant attendu est nul), en unités mineures."""
+    diff = np.abs(expected - found)
+    zero = expected == 0
+    rel = diff <= 0.02 * np.maximum(100, np.abs(expected))
+    return np.where(zero, np.abs(found) <= 100, rel | (diff <= 500))
+
+
+def _date_key(d: Optional[str]) -> int:
+    """jj/mm/aa(aa) -> aaaammjj (0 si la date n'est pas lisible)."""
+    m = DATE_DMY_RE.match(d or "")
+    if not m:
+        return 0
+    day, month, year = m.groups()
+    y = int(year) + 2000 if len(year) == 2 else int(year)
+    return y * 10000 + int(month) * 100 + int(day)
+
+
+def _format_date_key(key: int) -> str:
+    return f"{key % 100:02d}/{key // 100 % 100:02d}/{key // 10000}"
+
+
+# -----------------------
+# Table colonnaire
+# -----------------------
+class TransactionTable:
+    """
+    Transactions d'un relevé en colonnes : montants et soldes en int64 (unités
+    mineures, `has_*` pour les valeurs absentes), sens en int8 (+1 Cr, -1 Dr,
+    0 inconnu). Contrôles et agrégats vectorisés ; les dicts JSON ne sont
+    reconstruits qu'en sortie (`to_records`). Le texte d'origine des montants
+    et soldes (`raw_*`) est rendu tel quel : seuls les montants déduits par
+    `infer_sens` sont formatés. Un texte illisible (`to_minor` -> None) est
+    exclu des calculs.
+    """
+
+    __slots__ = ("dates", "descriptions", "montant", "has_montant", "sens", "solde", "has_solde",
+                 "raw_montant", "raw_solde")
+
+    def __init__(self, dates: List[Optional[str]], descriptions: List[Optional[str]],
+                 montant: np.ndarray, has_montant: np.ndarray, sens: np.ndarray,
+                 solde: np.ndarray, has_solde: np.ndarray,
+                 raw_montant: Optional[List[Optional[str]]] = None,
+                 raw_solde: Optional[List[Optional[str]]] = None):
+        self.dates = dates
+        self.descriptions = descriptions
+        self.montant = montant
+        self.has_montant = has_montant
+        self.sens = sens
+        self.solde = solde
+        self.has_solde = has_solde
+        self.raw_montant = raw_montant or [None] * len(dates)
+        self.raw_solde = raw_solde or [None] * len(dates)
+
+    @classmethod
+    def from_transactions(cls, txs: Iterable[Union[Transaction, Dict]]) -> "TransactionTable":
+        txs = [as_transaction(t) for t in txs]
+        n = len(txs)
+        montant = [to_minor(t.montant) for t in txs]
+        solde = [to_minor(t.solde) for t in txs]
+        return cls(
+            [t.date for t in txs],
+            [t.description for t in txs],
+            np.fromiter((v or 0 for v in montant), np.int64, n),
+            np.fromiter((v is not None for v in montant), bool, n),
+            np.fromiter((_SENS_CODES.get(t.sens, SENS_NONE) for t in txs), np.int8, n),
+            np.fromiter((v or 0 for v in solde), np.int64, n),
+            np.fromiter((v is not None for v in solde), bool, n),
+            [t.montant or None for t in txs],
+            [t.solde or None for t in txs],
+        )
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    # ---- soldes ----
+    def previous_balance(self, opening: Optional[int] = None):
+        """
+        (solde précédent, connu ?) pour chaque ligne : dernier solde lu avant
+        elle (report en avant), ou le solde d'ouverture pour les premières.
+        """
+        n = len(self)
+        idx = np.where(self.has_solde, np.arange(n), -1)
+        last = np.maximum.accumulate(idx) if n else idx
+        prev_idx = np.concatenate(([-1], last[:-1])) if n else idx
+        known = prev_idx >= 0
+        prev = np.where(known, self.solde[np.maximum(prev_idx, 0)], opening or 0)
+        return prev, known | (opening is not None)
+
+    def infer_sens(self, opening: Optional[int] = None) -> int:
+        """
+        Complète sens (et montant absent, pas illisible) par le mouvement du solde,
+        là où ni la colonne ni le signe ne l'ont donné. Retourne le nombre de lignes complétées.
+        """
+        prev, prev_known = self.previous_balance(opening)
+        delta = self.solde - prev
+        todo = (self.sens == SENS_NONE) & self.has_solde & prev_known & (delta != 0)
+        self.sens[todo] = np.sign(delta[todo]).astype(np.int8)
+        written = np.fromiter((r is not None for r in self.raw_montant), bool, len(self))
+        fill = todo & ~written
+        self.montant[fill] = np.abs(delta[fill])
+        self.has_montant |= fill
+        return int(todo.sum())
+
+    def signed_amounts(self) -> np.ndarray:
+        return np.where(self.has_montant, self.montant * self.sens, 0)
+
+    def balance_check(self, opening: Optional[int] = None, tolerance: int = BALANCE_TOLERANCE) -> Dict:
+        """
+        Solde courant recalculé (cumsum des montants signés) contre la colonne
+        Solde : chaque solde lu doit valoir le précédent plus les mouvements
+        intermédiaires. Une erreur isolée ne se propage pas aux lignes suivantes.
+        """
+        cum = np.cumsum(self.signed_amounts())
+        rows = np.flatnonzero(self.has_solde)
+        base = self.solde[rows[:-1]]
+        base_cum = cum[rows[:-1]]
+        if opening is not None and len(rows):
+            base = np.concatenate(([opening], base))
+            base_cum = np.concatenate(([0], base_cum))
+        else:
+            rows = rows[1:]  # premier solde lu : rien à quoi le comparer
+        expected = base + (cum[rows] - base_cum)
+        bad = rows[np.abs(expected - self.solde[rows]) > tolerance]
+        return {
+            "checked": int(len(rows)),
+            "mismatches": int(len(bad)),
+            "rows": bad[:BALANCE_MAX_REPORTED].tolist(),
+            "ok": bool(len(rows)) and not len(bad),
+        }
+
+    # ---- agrégats ----
+    def period(self) -> Optional[str]:
+        """'jj/mm/aaaa - jj/mm/aaaa' : plus ancienne et plus récente date lisibles."""
+        keys = np.fromiter((_date_key(d) for d in self.dates), np.int64, len(self))
+        keys = keys[keys > 0]
+        if not len(keys):
+            return None
+        return f"{_format_date_key(int(keys.min()))} - {_format_date_key(int(keys.max()))}"
+
+    # ---- sortie JSON ----
+    def to_records(self) -> List[Dict]:
+        """Même forme que `Transaction.to_dict` (pas de clé "solde" s'il est inconnu)."""
+        montant = self.montant.tolist()
+        has_montant = self.has_montant.tolist()
+        sens = self.sens.tolist()
+        records = []
+        for i in range(len(self)):
+            raw = self.raw_montant[i]
+            record = {
+                "date": self.dates[i],
+                "description": self.descriptions[i],
+                "montant": raw if raw is not None else (format_minor(montant[i]) if has_montant[i] else None),
+                "sens": _SENS_LABELS.get(sens[i]),
+            }
+            if self.raw_solde[i] is not None:
+                record["solde"] = self.raw_solde[i]
+            records.append(record)
+        return records
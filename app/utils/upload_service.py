@@ -0,0 +1,76 @@
+# app/utils/upload_service.py
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+from typing import List, Optional, Tuple
+
+# ⚙️ CONFIG — répertoire racine des fichiers temporaires (défaut : tmp système)
+UPLOAD_TMP_DIR = os.getenv("UPLOAD_TMP_DIR") or None
+
+# ⚙️ CONFIG — envois groupés (plusieurs fichiers et/ou archives ZIP)
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", "200"))
+BATCH_MAX_BYTES = int(os.getenv("BATCH_MAX_BYTES", str(500 * 1024 * 1024)))  # après décompression
+DOCUMENT_EXTENSIONS = (".pdf", ".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp")
+
+
+class BatchTooLarge(Exception):
+    """Lot refusé : trop de fichiers ou trop volumineux une fois décompressé."""
+
+
+def safe_filename(filename: Optional[str]) -> str:
+    """Nom de fichier sans chemin (l'extension sert au routage pdf/image)."""
+    name = os.path.basename((filename or "").replace("\\", "/")).strip()
+    return name or "upload"
+
+
+def save_upload(filename: Optional[str], data: bytes) -> Tuple[str, str]:
+    """
+    Écrit l'upload dans un répertoire temporaire propre à la requête
+    (pas de collision entre deux uploads du même nom).
+    Retourne (répertoire, chemin du fichier).
+    """
+    workdir = tempfile.mkdtemp(prefix="ocr_", dir=UPLOAD_TMP_DIR)
+    path = os.path.join(workdir, safe_filename(filename))
+    with open(path, "wb") as f:
+        f.write(data)
+    return workdir, path
+
+
+def discard_upload(workdir: str) -> None:
+    """Nettoyage déterministe : tout le répertoire de la requête, sans scan du CWD."""
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+def expand_batch(uploads: List[Tuple[Optional[str], bytes]]) -> List[Tuple[str, bytes]]:
+    """
+    Liste (nom, contenu) des relevés d'un envoi groupé : les archives ZIP sont
+    dépliées (relevés seulement, dossiers ignorés), dans l'ordre d'envoi.
+    Limites vérifiées sur les tailles annoncées avant toute décompression.
+    """
+    out: List[Tuple[str, bytes]] = []
+    total = 0
+
+    def add(name: str, size: int) -> None:
+        nonlocal total
+        total += size
+        if len(out) + 1 > BATCH_MAX_FILES:
+            raise BatchTooLarge(f"Lot limité à {BATCH_MAX_FILES} relevés")
+        if total > BATCH_MAX_BYTES:
+            raise BatchTooLarge(f"Lot limité à {BATCH_MAX_BYTES // (1024 * 1024)} Mo")
+
+    for filename, data in uploads:
+        name = safe_filename(filename)
+        if not name.lower().endswith(".zip"):
+            add(name, len(data))
+            out.append((name, data))
+            continue
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            for info in archive.infolist():
+                inner = safe_filename(info.filename)
+                if info.is_dir() or inner.startswith(".") or not inner.lower().endswith(DOCUMENT_EXTENSIONS):
+                    continue
+                add(inner, info.file_size)
+                out.append((inner, archive.read(info)))
+    return out
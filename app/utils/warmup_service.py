@@ -0,0 +1,132 @@
+# app/utils/warmup_service.py
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Dict, Optional
+
+# ⚙️ CONFIG — préchauffage au démarrage (import torch, poids YOLO, graphe, Tesseract)
+WARMUP_ENABLED = os.getenv("WARMUP", "1") == "1"
+WARMUP_YOLO = os.getenv("WARMUP_YOLO", "1") == "1"  # 0 : instance sans YOLO (export / texte seulement)
+WARMUP_IMAGE_SIZE = 640
+WARMUP_BARRIER_TIMEOUT = 60.0  # secondes : attente que chaque worker ait reçu sa tâche
+# Étapes dont l'échec est signalé sans retirer l'instance du service : sans YOLO,
+# les relevés SAPHIR et les PDF à couche texte restent traités
+OPTIONAL_STEPS = ("yolo",)
+
+_state: Dict = {"ready": False, "started": None, "elapsed_ms": None, "steps": {}, "error": None,
+                "degraded": []}
+_lock = threading.Lock()
+
+
+def _step(name: str, fn) -> bool:
+    """Une étape n'empêche pas les suivantes : statut et durée notés pour chacune."""
+    t0 = time.perf_counter()
+    try:
+        fn()
+        step = {"status": "ok"}
+    except Exception as e:
+        print(f"ERREUR WARM-UP ({name}):", traceback.format_exc())
+        step = {"status": "error", "error": str(e)}
+    step["ms"] = round((time.perf_counter() - t0) * 1000, 1)
+    with _lock:
+        _state["steps"][name] = step
+    return step["status"] == "ok"
+
+
+def _yolo() -> None:
+    import numpy as np
+    from app.utils.yolo_service import detect_blocks_batch, get_model
+    get_model()
+    # première inférence : allocation des buffers / construction du graphe
+    detect_blocks_batch([np.full((WARMUP_IMAGE_SIZE, WARMUP_IMAGE_SIZE, 3), 255, np.uint8)])
+
+
+def _tesseract() -> None:
+    import numpy as np
+    from app.utils.ocr_engine import get_engine
+    # appel direct au moteur (pas au cache OCR) : charge les traineddata des langues utilisées
+    img = np.full((64, 256), 255, np.uint8)
+    engine = get_engine()
+    engine.image_to_string(img, lang="fra", config="--oem 3 --psm 6")
+    engine.image_to_string(img, lang="eng+fra", config="--oem 3 --psm 6")
+
+
+def _warm_worker(yolo: bool, barrier: Optional[threading.Barrier] = None) -> None:
+    """
+    Tâche exécutée par un worker de pool : l'API Tesseract est propre à chaque
+    thread (tesserocr), le modèle YOLO propre à chaque processus.
+    """
+    _tesseract()
+    if yolo:
+        _yolo()
+    if barrier is not None:
+        # garde le thread occupé : les autres tâches partent sur les autres threads
+        try:
+            barrier.wait(WARMUP_BARRIER_TIMEOUT)
+        except threading.BrokenBarrierError:
+            pass
+
+
+def _warm_executor(executor: Executor, workers: int, yolo: bool = False) -> None:
+    """
+    Une tâche par worker du pool (processus : chacun charge aussi son propre YOLO,
+    sauf si le chargement a déjà échoué dans le processus principal).
+    """
+    if isinstance(executor, ProcessPoolExecutor):
+        futures = [executor.submit(_warm_worker, yolo) for _ in range(workers)]
+    else:
+        barrier = threading.Barrier(workers)
+        futures = [executor.submit(_warm_worker, False, barrier) for _ in range(workers)]
+    for f in futures:
+        f.result()
+
+
+def _yolo_ok() -> bool:
+    with _lock:
+        return _state["steps"].get("yolo", {}).get("status") == "ok"
+
+
+def _extract_pool() -> None:
+    from app.utils.worker_pool import get_pool
+    pool = get_pool()
+    _warm_executor(pool.executor, pool.workers, yolo=WARMUP_YOLO and _yolo_ok())
+
+
+def _page_pool() -> None:
+    from app.utils.worker_pool import PAGE_WORKERS, get_page_executor
+    _warm_executor(get_page_executor(), max(1, PAGE_WORKERS))
+
+
+def warm_up() -> Dict:
+    """
+    Charge tout ce que la première requête paierait sinon. Synchrone : à lancer
+    hors de la boucle (thread). Chaque étape tourne même si une autre échoue ;
+    l'instance n'est « prête » que si les étapes requises ont réussi, celles de
+    OPTIONAL_STEPS en échec étant listées dans "degraded".
+    """
+    with _lock:
+        _state.update(ready=False, started=time.time(), error=None, steps={}, degraded=[])
+    t0 = time.perf_counter()
+    steps = [("tesseract", _tesseract), ("extract_pool", _extract_pool), ("page_pool", _page_pool)]
+    if WARMUP_YOLO:
+        steps.insert(0, ("yolo", _yolo))
+    failed = [name for name, fn in steps if not _step(name, fn)]
+    with _lock:
+        _state["elapsed_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+        _state["error"] = f"Étapes en échec : {', '.join(failed)}" if failed else None
+        _state["degraded"] = [name for name in failed if name in OPTIONAL_STEPS]
+        _state["ready"] = len(_state["degraded"]) == len(failed)
+    return warmup_state()
+
+
+def mark_ready() -> None:
+    """Préchauffage désactivé : prêt immédiatement."""
+    with _lock:
+        _state["ready"] = True
+
+
+def warmup_state() -> Dict:
+    with _lock:
+        return {**_state, "steps": dict(_state["steps"])}
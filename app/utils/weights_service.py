@@ -0,0 +1,39 @@
+# app/utils/weights_service.py
+import hashlib
+import os
+from typing import Optional
+
+# Module sans cv2 / numpy / ultralytics : la clé de cache des résultats
+# (chemin de requête) en dépend, l'import de l'API doit rester léger.
+
+# Racine du projet (= /app dans l'image Docker, où le Dockerfile copie best.pt)
+APP_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Emplacements du modèle livré : copie de l'image, puis sortie d'entraînement locale
+BUNDLED_WEIGHTS = (
+    os.path.join(APP_ROOT, "best.pt"),
+    os.path.join(APP_ROOT, "runs", "detect", "train5", "weights", "best.pt"),
+)
+
+
+def _default_weights() -> str:
+    return next((p for p in BUNDLED_WEIGHTS if os.path.isfile(p)), BUNDLED_WEIGHTS[0])
+
+
+# ⚙️ CONFIG — chemin vers best.pt (par défaut : le modèle livré avec le projet)
+YOLO_WEIGHTS = os.getenv("YOLO_WEIGHTS") or _default_weights()
+
+_weights_fingerprint: Optional[str] = None
+
+def weights_fingerprint() -> str:
+    """Empreinte sha256 du fichier de poids (clé de cache : change avec le modèle)."""
+    global _weights_fingerprint
+    if _weights_fingerprint is None:
+        if os.path.isfile(YOLO_WEIGHTS):
+            h = hashlib.sha256()
+            with open(YOLO_WEIGHTS, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    h.update(chunk)
+            _weights_fingerprint = h.hexdigest()
+        else:
+            _weights_fingerprint = "absent"
+    return _weights_fingerprint
@@ -0,0 +1,211 @@
+# app/utils/worker_pool.py
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Dict, Iterator, List, Optional
+
+# ⚙️ CONFIG — OCR/YOLO hors de la boucle asyncio, dans un pool borné
+EXTRACT_EXECUTOR = os.getenv("EXTRACT_EXECUTOR", "thread")  # "thread" | "process"
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", str(os.cpu_count() or 2)))
+EXTRACT_QUEUE_SIZE = int(os.getenv("EXTRACT_QUEUE_SIZE", "8"))  # requêtes en attente au-delà des workers
+EXTRACT_RETRY_AFTER = int(os.getenv("EXTRACT_RETRY_AFTER", "10"))  # secondes, en-tête Retry-After
+
+# Parallélisme intra-document (une tâche par page). En mode "thread", les appels
+# Tesseract (sous-processus), OpenCV et torch libèrent le GIL : les pages sont
+# bien traitées sur plusieurs cœurs sans copier les rasters entre processus.
+PAGE_EXECUTOR = os.getenv("PAGE_EXECUTOR", "thread")  # "thread" | "process"
+PAGE_WORKERS = int(os.getenv("PAGE_WORKERS", str(os.cpu_count() or 2)))
+
+# Délai max par étape (secondes) ; 0 = pas de limite
+STAGE_TIMEOUTS: Dict[str, float] = {
+    "classify": float(os.getenv("STAGE_TIMEOUT_CLASSIFY", "30")),
+    "extract": float(os.getenv("STAGE_TIMEOUT_EXTRACT", "600")),
+}
+
+
+class PoolSaturated(Exception):
+    """Plus de place dans la file : la requête doit être refusée (HTTP 429)."""
+
+    def __init__(self, queue_position: int):
+        super().__init__(f"File d'extraction pleine (position {queue_position})")
+        self.queue_position = queue_position
+
+
+class StageTimeout(Exception):
+    """Une étape a dépassé son délai ; `future` tourne peut-être encore dans le pool."""
+
+    def __init__(self, stage: str, timeout: float, future: asyncio.Future):
+        super().__init__(f"Étape '{stage}' interrompue après {timeout:g}s")
+        self.stage = stage
+        self.future = future
+
+
+class ExtractionPool:
+    """
+    Pool borné : au plus `workers` extractions simultanées et `queue_size`
+    en attente. Au-delà, `acquire()` lève `PoolSaturated`.
+    Le compteur n'est manipulé que depuis la boucle asyncio (pas de verrou).
+    Chaque étape attend un worker libre (sémaphore de `workers` places) avant
+    d'être soumise : son délai ne court que pendant l'exécution, pas dans la file.
+    """
+
+    def __init__(self, workers: int = EXTRACT_WORKERS, queue_size: int = EXTRACT_QUEUE_SIZE,
+                 kind: str = EXTRACT_EXECUTOR):
+        self.workers = max(1, workers)
+        self.queue_size = max(0, queue_size)
+        self.kind = kind
+        self.pending = 0
+        self._executor: Optional[Executor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._slots_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="extract")
+        return self._executor
+
+    def queue_position(self) -> int:
+        return max(0, self.pending - self.workers)
+
+    def acquire(self) -> int:
+        """Réserve une place ; renvoie la position dans la file (0 = traitement immédiat)."""
+        if self.pending >= self.workers + self.queue_size:
+            raise PoolSaturated(self.pending - self.workers + 1)
+        self.pending += 1
+        return self.queue_position()
+
+    def release(self) -> None:
+        self.pending = max(0, self.pending - 1)
+
+    def acquire_idle(self, limit: int) -> int:
+        """
+        Places supplémentaires (au plus `limit`) prises sur les seuls workers
+        libres, jamais dans la file ; renvoie le nombre obtenu (à rendre par release()).
+        """
+        got = 0
+        while got < limit and self.pending < self.workers:
+            self.pending += 1
+            got += 1
+        return got
+
+    def _worker_slots(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._slots is None or self._slots_loop is not loop:
+            self._slots, self._slots_loop = asyncio.Semaphore(self.workers), loop
+        return self._slots
+
+    async def _submit(self, executor: Optional[Executor], fn: Callable, *args,
+                      track: Optional[Callable[[asyncio.Future], None]] = None) -> asyncio.Future:
+        """
+        Soumet `fn` dès qu'un worker est libre. La place n'est rendue qu'à la fin
+        réelle de la tâche (même si l'appelant a abandonné sur délai dépassé).
+        `track(fut)` reçoit la tâche soumise : l'appelant peut attendre sa fin
+        réelle avant de libérer ce qu'elle utilise (upload, place dans la file).
+        """
+        slots = self._worker_slots()
+        await slots.acquire()
+        try:
+            fut = asyncio.get_running_loop().run_in_executor(executor, partial(fn, *args))
+        except BaseException:
+            slots.release()
+            raise
+        fut.add_done_callback(lambda _: slots.release())
+        if track is not None:
+            track(fut)
+        return fut
+
+    async def run_stage(self, stage: str, fn: Callable, *args,
+                        track: Optional[Callable[[asyncio.Future], None]] = None):
+        fut = await self._submit(self.executor, fn, *args, track=track)
+        timeout = STAGE_TIMEOUTS.get(stage) or None
+        try:
+            return await asyncio.wait_for(asyncio.shield(fut), timeout)
+        except asyncio.TimeoutError:
+            raise StageTimeout(stage, timeout, fut)
+
+    async def iterate_stage(self, stage: str, gen: Iterator,
+                            track: Optional[Callable[[asyncio.Future], None]] = None):
+        """
+        Avance le générateur synchrone `gen` hors de la boucle, un élément à la fois
+        (réponses en flux). Le délai de l'étape porte sur le temps d'exécution
+        cumulé du flux (pas sur l'attente d'un worker ni sur la lecture du client).
+        Un générateur ne se sérialise pas : en mode "process", le pool de threads
+        par défaut de la boucle est utilisé.
+        """
+        loop = asyncio.get_running_loop()
+        executor = self.executor if self.kind == "thread" else None
+        timeout = STAGE_TIMEOUTS.get(stage) or None
+        budget = timeout
+        end = object()
+        fut = None
+        try:
+            while True:
+                fut = await self._submit(executor, next, gen, end, track=track)
+                started = loop.time()
+                try:
+                    item = await asyncio.wait_for(asyncio.shield(fut), budget)
+                except asyncio.TimeoutError:
+                    raise StageTimeout(stage, timeout, fut)
+                if budget is not None:
+                    budget = max(0.0, budget - (loop.time() - started))
+                if item is end:
+                    return
+                yield item
+        finally:
+            # client parti / délai dépassé : le générateur n'est fermé qu'une fois à l'arrêt
+            if fut is None or fut.done():
+                gen.close()
+            else:
+                fut.add_done_callback(lambda _: gen.close())
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+_pool: Optional[ExtractionPool] = None
+
+def get_pool() -> ExtractionPool:
+    global _pool
+    if _pool is None:
+        _pool = ExtractionPool()
+    return _pool
+
+
+# -----------------------
+# Pool des pages
+# -----------------------
+_page_executor: Optional[Executor] = None
+
+def get_page_executor() -> Executor:
+    global _page_executor
+    if _page_executor is None:
+        # un processus démon (ex. worker multiprocessing) ne peut pas avoir d'enfants
+        if PAGE_EXECUTOR == "process" and not multiprocessing.current_process().daemon:
+            _page_executor = ProcessPoolExecutor(max_workers=PAGE_WORKERS)
+        else:
+            _page_executor = ThreadPoolExecutor(max_workers=PAGE_WORKERS, thread_name_prefix="page")
+    return _page_executor
+
+
+def map_pages(fn: Callable, items: List) -> List:
+    """
+    Applique `fn` à chaque page en parallèle ; les résultats sont renvoyés
+    dans l'ordre des pages (fusion et soldes cumulés restent déterministes).
+    En mode "process", `fn` doit être une fonction de module (picklable).
+    """
+    return list(imap_pages(fn, items))
+
+
+def imap_pages(fn: Callable, items: List) -> Iterator:
+    """Comme `map_pages`, mais chaque résultat est rendu dès que sa page (et les précédentes) est prête."""
+    if len(items) <= 1 or PAGE_WORKERS <= 1:
+        return (fn(x) for x in items)
+    return get_page_executor().map(fn, items)
@@ -1,16 +1,21 @@
 # app/utils/yolo_service.py
 import os
-from typing import Dict, List, Tuple, Optional
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import TYPE_CHECKING, Callable, Dict, List, Tuple, Optional, Union
+from difflib import SequenceMatcher
 import cv2
 import numpy as np
-from ultralytics import YOLO
-import pytesseract
-
-# ⚙️ CONFIG — mets ici ton chemin vers best.pt si tu veux forcer en dur
-YOLO_WEIGHTS = os.getenv(
-    "YOLO_WEIGHTS",
-    r"C:\Users\Moi\Desktop\doc polytech\doc niveau 4 - AIA 4\Stage_Saphir\projet_comptabilité\implémentation_ocr_finance\backend\runs\detect\train5\weights\best.pt"
-)
+if TYPE_CHECKING:
+    from ultralytics import YOLO  # ultralytics / torch : importés au chargement du modèle seulement
+from app.utils.ocr_service import ocr_string, ocr_data  # OCR mis en cache par raster
+from app.utils.document_service import Word, words_from_data, group_words_into_lines, lines_from_words
+from app.utils.preprocess_service import Preprocessor, get_preprocessor, PREPROCESS_SCOPE
+from app.utils.table_service import TABLE_RECONSTRUCTION, parse_table_words
+from app.utils.models import Transaction
+from app.utils.weights_service import YOLO_WEIGHTS
 
 # Noms EXACTS des classes telles que dans ton dataset YOLO
 CLASS_NAMES = {
@@ -21,14 +26,29 @@ CLASS_NAMES = {
     4: "titulaire",
 }
 
-_model: Optional[YOLO] = None
+# Micro-batching : les pages (d'un même PDF ou de requêtes concurrentes) sont
+# regroupées en un seul `predict` de YOLO_BATCH_SIZE images max, en attendant
+# au plus YOLO_BATCH_WAIT_MS après la première image reçue.
+YOLO_BATCH_SIZE = int(os.getenv("YOLO_BATCH_SIZE", "8"))
+YOLO_BATCH_WAIT_MS = float(os.getenv("YOLO_BATCH_WAIT_MS", "20"))
+
+ImageInput = Union[str, np.ndarray]  # chemin ou image BGR déjà décodée
 
-def get_model() -> YOLO:
+_model: Optional["YOLO"] = None
+_model_lock = threading.Lock()
+# le modèle ultralytics n'est pas thread-safe : un seul `predict` à la fois
+# (batcher, YOLO_BATCH_SIZE<=1, warm-up)
+_predict_lock = threading.Lock()
+
+def get_model() -> "YOLO":
     global _model
     if _model is None:
-        if not os.path.isfile(YOLO_WEIGHTS):
-            raise FileNotFoundError(f"YOLO_WEIGHTS introuvable : {YOLO_WEIGHTS}")
-        _model = YOLO(YOLO_WEIGHTS)
+        with _model_lock:
+            if _model is None:
+                if not os.path.isfile(YOLO_WEIGHTS):
+                    raise FileNotFoundError(f"YOLO_WEIGHTS introuvable : {YOLO_WEIGHTS}")
+                from ultralytics import YOLO
+                _model = YOLO(YOLO_WEIGHTS)
     return _model
 
 # ------------ Utils image / OCR --------------
@@ -39,30 +59,85 @@ def clamp_bbox(xyxy: Tuple[int,int,int,int], w: int, h: int, pad: int = 0) -> Tu
     x2 = min(w - 1, x2 + pad); y2 = min(h - 1, y2 + pad)
     return x1, y1, x2, y2
 
-def crop(image_path: str, xyxy: Tuple[int,int,int,int], pad_px: int = 8) -> np.ndarray:
-    img = cv2.imread(image_path)
+def load_image(image: ImageInput) -> np.ndarray:
+    """Image BGR : décode un chemin une seule fois, renvoie tel quel un tableau déjà décodé."""
+    if isinstance(image, np.ndarray):
+        return image
+    img = cv2.imread(image)
     if img is None:
-        raise ValueError(f"Impossible de charger l'image: {image_path}")
+        raise ValueError(f"Impossible de charger l'image: {image}")
+    return img
+
+def crop(image: ImageInput, xyxy: Tuple[int,int,int,int], pad_px: int = 8) -> np.ndarray:
+    """
+    Vue (sans copie) sur la zone : les étapes OpenCV suivantes allouent de
+    toute façon leur propre sortie. Copier seulement si la vue doit être modifiée.
+    """
+    img = load_image(image)
     h, w = img.shape[:2]
     x1, y1, x2, y2 = clamp_bbox(xyxy, w, h, pad=pad_px)
-    return img[y1:y2, x1:x2].copy()
+    return img[y1:y2, x1:x2]
 
 def preprocess_for_ocr(img: np.ndarray) -> np.ndarray:
-    # Grayscale + Otsu + légère ouverture pour “éclaircir” le texte
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    thr = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
-    kernel = np.ones((1, 1), np.uint8)
-    proc = cv2.morphologyEx(thr, cv2.MORPH_OPEN, kernel, iterations=1)
-    return proc
+    # Grayscale + Otsu (profil par défaut) ; l'ancienne ouverture 1x1 était sans effet
+    return get_preprocessor().run(img)
+
+class PageOcrView:
+    """
+    Zones OCR d'une page. Scope "page" : la page est binarisée une seule fois
+    et chaque zone est une vue dessus ; scope "crop" : prétraitement par zone.
+    Avec `render_region` (PDF), `img` n'est que le raster de détection : chaque
+    zone est re-rendue à la résolution OCR (`scale` px OCR par px de `img`).
+    """
+
+    def __init__(self, img: np.ndarray, preprocessor: Preprocessor, scope: str = PREPROCESS_SCOPE,
+                 render_region: Optional[Callable[[Tuple[int,int,int,int]], np.ndarray]] = None,
+                 scale: float = 1.0):
+        self.img = img
+        self.pre = preprocessor
+        self.render_region = render_region
+        self.scale = scale if render_region else 1.0
+        self.scope = "region" if render_region else scope
+        self._binarized: Optional[np.ndarray] = None
+
+    @property
+    def binarized(self) -> np.ndarray:
+        if self._binarized is None:
+            self._binarized = self.pre.run(self.img)
+        return self._binarized
+
+    def _rendered(self, xyxy: Tuple[int,int,int,int], pad_px: int = 0) -> np.ndarray:
+        h, w = self.img.shape[:2]
+        x1, y1, x2, y2 = clamp_bbox(xyxy, w, h, pad=pad_px)
+        s = self.scale
+        return self.pre.run(self.render_region((int(x1 * s), int(y1 * s), int(x2 * s), int(y2 * s))))
+
+    def region(self, xyxy: Tuple[int,int,int,int], pad_px: int = 0) -> np.ndarray:
+        if self.render_region:
+            return self._rendered(xyxy, pad_px)
+        if self.scope == "page":
+            return crop(self.binarized, xyxy, pad_px=pad_px)
+        return self.pre.run(crop(self.img, xyxy, pad_px=pad_px))
+
+    def top(self, bottom: int) -> np.ndarray:
+        if self.render_region:
+            return self._rendered((0, 0, self.img.shape[1], bottom))
+        if self.scope == "page":
+            return self.binarized[:bottom]
+        return self.pre.run(self.img[:bottom])
+
+    def full(self) -> np.ndarray:
+        if self.render_region:
+            return self._rendered((0, 0, self.img.shape[1], self.img.shape[0]))
+        return self.binarized
 
 def ocr_text(img: np.ndarray, psm: int = 6, lang: str = "eng+fra") -> str:
     cfg = f"--oem 3 --psm {psm}"
-    return pytesseract.image_to_string(img, lang=lang, config=cfg)
+    return ocr_string(img, lang=lang, config=cfg, prep="otsu")
 
 def ocr_lines(img: np.ndarray, psm: int = 6, lang: str = "eng+fra") -> List[str]:
-    from pytesseract import image_to_data, Output
     cfg = f"--oem 3 --psm {psm}"
-    data = image_to_data(img, lang=lang, config=cfg, output_type=Output.DICT)
+    data = ocr_data(img, lang=lang, config=cfg, prep="otsu")
     lines = {}
     n = len(data["text"])
     for i in range(n):
@@ -76,18 +151,9 @@ def ocr_lines(img: np.ndarray, psm: int = 6, lang: str = "eng+fra") -> List[str]
 
 # ------------ Détection YOLO ------------------
 
-def detect_blocks(image_path: str, conf: float = 0.25, iou: float = 0.5) -> Dict[str, List[Tuple[int,int,int,int]]]:
-    """
-    Retourne un dict {class_name: [ (x1,y1,x2,y2), ... ] } en pixels.
-    """
-    model = get_model()
-    results = model.predict(image_path, conf=conf, iou=iou, verbose=False)
+def _boxes_from_result(r) -> Dict[str, List[Tuple[int,int,int,int]]]:
     boxes_by_class: Dict[str, List[Tuple[int,int,int,int]]] = {v: [] for v in CLASS_NAMES.values()}
-    if not results:
-        return boxes_by_class
-
-    r = results[0]
-    if r.boxes is None or r.boxes.xyxy is None:
+    if r is None or r.boxes is None or r.boxes.xyxy is None:
         return boxes_by_class
 
     for b in r.boxes:
@@ -100,49 +166,248 @@ def detect_blocks(image_path: str, conf: float = 0.25, iou: float = 0.5) -> Dict
 
     return boxes_by_class
 
+def detect_blocks_batch(images: List[ImageInput], conf: float = 0.25, iou: float = 0.5) -> List[Dict[str, List[Tuple[int,int,int,int]]]]:
+    """
+    Un seul appel `predict` pour plusieurs images ; un dict {class_name: boxes} par image,
+    dans l'ordre d'entrée.
+    """
+    if not images:
+        return []
+    model = get_model()
+    with _predict_lock:
+        results = model.predict(list(images), conf=conf, iou=iou, verbose=False) or []
+    out = [_boxes_from_result(r) for r in results]
+    out += [_boxes_from_result(None)] * (len(images) - len(out))
+    return out
+
+class YoloBatcher:
+    """
+    Regroupe les demandes de détection concurrentes (threads du pool des pages,
+    requêtes simultanées) en micro-batchs, avec un délai d'attente maximal.
+    """
+
+    def __init__(self, max_batch: int = YOLO_BATCH_SIZE, max_wait_ms: float = YOLO_BATCH_WAIT_MS):
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, image: ImageInput, conf: float = 0.25, iou: float = 0.5) -> Future:
+        fut: Future = Future()
+        self._ensure_started()
+        self._queue.put((image, conf, iou, fut))
+        return fut
+
+    def _ensure_started(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="yolo-batcher", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._process(batch)
+
+    def _process(self, batch: List[Tuple]) -> None:
+        # un `predict` par couple (conf, iou)
+        groups: Dict[Tuple[float, float], List[Tuple]] = {}
+        for item in batch:
+            groups.setdefault((item[1], item[2]), []).append(item)
+        for (conf, iou), items in groups.items():
+            try:
+                results = detect_blocks_batch([it[0] for it in items], conf=conf, iou=iou)
+            except Exception as e:
+                for it in items:
+                    it[3].set_exception(e)
+                continue
+            for it, res in zip(items, results):
+                it[3].set_result(res)
+
+_batcher: Optional[YoloBatcher] = None
+
+_batcher_lock = threading.Lock()
+
+def get_batcher() -> YoloBatcher:
+    global _batcher
+    with _batcher_lock:
+        if _batcher is None:
+            _batcher = YoloBatcher()
+        return _batcher
+
+def detect_blocks(image: ImageInput, conf: float = 0.25, iou: float = 0.5) -> Dict[str, List[Tuple[int,int,int,int]]]:
+    """
+    Retourne un dict {class_name: [ (x1,y1,x2,y2), ... ] } en pixels.
+    Passe par le micro-batcher : les appels concurrents partagent un même `predict`.
+    """
+    if YOLO_BATCH_SIZE <= 1:
+        return detect_blocks_batch([image], conf=conf, iou=iou)[0]
+    return get_batcher().submit(image, conf=conf, iou=iou).result()
+
+# ------------ OCR des champs d'en-tête ------------------
+
+# "per_box"  : un appel Tesseract psm 7 par boîte (nom_banque, numero_compte, ...)
+# "one_pass" : un seul image_to_data sur la zone englobant les boîtes, mots
+#              répartis ensuite par intersection géométrique
+# "per_box" reste le défaut tant que la comparaison par champ (HEADER_OCR_COMPARE=1,
+# écarts dans `_debug.header_ocr_compare`) n'a pas été faite sur de vrais relevés
+HEADER_OCR_MODE = os.getenv("HEADER_OCR_MODE", "per_box")
+HEADER_OCR_PSM = int(os.getenv("HEADER_OCR_PSM", "11"))  # texte épars
+HEADER_OCR_COMPARE = os.getenv("HEADER_OCR_COMPARE", "0") == "1"  # les deux modes + écart par champ
+HEADER_FIELDS = ("nom_banque", "numero_compte", "periode", "titulaire")
+
+def _inside_ratio(w: Word, box: Tuple[int,int,int,int]) -> float:
+    ix = max(0, min(w.x2, box[2]) - max(w.x1, box[0]))
+    iy = max(0, min(w.y2, box[3]) - max(w.y1, box[1]))
+    area = max(1, (w.x2 - w.x1) * (w.y2 - w.y1))
+    return ix * iy / area
+
+def assign_words_to_boxes(words: List[Word], boxes: Dict[str, Tuple[int,int,int,int]],
+                          min_inside: float = 0.5) -> Dict[str, Optional[str]]:
+    """Texte de chaque boîte = mots dont au moins `min_inside` de la surface est dans la boîte."""
+    out: Dict[str, Optional[str]] = {}
+    for name, box in boxes.items():
+        inside = [w for w in words if _inside_ratio(w, box) >= min_inside]
+        txt = " ".join(lines_from_words(group_words_into_lines(inside))).strip()
+        out[name] = txt or None
+    return out
+
+def header_fields_per_box(view: PageOcrView, boxes: Dict[str, Tuple[int,int,int,int]]) -> Dict[str, Optional[str]]:
+    out: Dict[str, Optional[str]] = {}
+    for name, box in boxes.items():
+        # on prend la meilleure (la première suffit souvent)
+        txt = (ocr_text(view.region(box, pad_px=8), psm=7) or "").strip()
+        out[name] = txt if txt else None
+    return out
+
+def header_fields_one_pass(view: PageOcrView, boxes: Dict[str, Tuple[int,int,int,int]],
+                           words: Optional[List[Word]] = None) -> Dict[str, Optional[str]]:
+    """
+    Un seul OCR pour toutes les boîtes d'en-tête : `words` (mots de la page déjà
+    connus) s'ils sont fournis, sinon image_to_data sur le rectangle englobant.
+    """
+    if not boxes:
+        return {}
+    h, w = view.img.shape[:2]
+    padded = {k: clamp_bbox(b, w, h, pad=8) for k, b in boxes.items()}
+    if words is None:
+        x1 = min(b[0] for b in padded.values()); y1 = min(b[1] for b in padded.values())
+        x2 = max(b[2] for b in padded.values()); y2 = max(b[3] for b in padded.values())
+        data = ocr_data(view.region((x1, y1, x2, y2)), lang="eng+fra", config=f"--oem 3 --psm {HEADER_OCR_PSM}", prep="otsu")
+        # retour au repère de la page (zone éventuellement rendue à une autre résolution)
+        s = view.scale
+        words = [wd._replace(x1=x1 + int(wd.x1 / s), y1=y1 + int(wd.y1 / s),
+                             x2=x1 + int(wd.x2 / s), y2=y1 + int(wd.y2 / s))
+                 for wd in words_from_data(data)]
+    return assign_words_to_boxes(words, padded)
+
+def compare_header_modes(per_box: Dict[str, Optional[str]], one_pass: Dict[str, Optional[str]]) -> Dict[str, Dict]:
+    """Écart par champ entre les deux modes (ratio difflib, 1.0 = identique)."""
+    return {
+        k: {
+            "per_box": per_box.get(k),
+            "one_pass": one_pass.get(k),
+            "ratio": round(SequenceMatcher(None, per_box.get(k) or "", one_pass.get(k) or "").ratio(), 3),
+        }
+        for k in per_box
+    }
+
 # ------------ Orchestrateur: YOLO + Fallback regex --------------
 
+# Bandeau d'en-tête (part de la hauteur) OCRisé quand seuls des champs d'en-tête
+# manquent et qu'aucune boîte de transactions ne permet de le délimiter
+HEADER_BAND_RATIO = float(os.getenv("HEADER_BAND_RATIO", "0.35"))
+
+def header_band_bottom(height: int, tx_boxes: List[Tuple[int,int,int,int]]) -> int:
+    """Bas de la zone au-dessus du tableau de transactions."""
+    bottom = min(b[1] for b in tx_boxes) if tx_boxes else int(height * HEADER_BAND_RATIO)
+    return max(1, bottom)
+
 def extract_with_yolo_and_rules(
-    image_path: str,
+    image: ImageInput,         # image BGR décodée (page en mémoire) ou chemin
     regex_fallback_fn,         # callable(ocr_full_text) -> dict (tes règles parser)
-    parse_transactions_fn      # callable(list_of_lines) -> list[dict]
+    parse_transactions_fn,     # callable(list_of_lines) -> list[Transaction]
+    ocr_full: Optional[str] = None,  # texte OCR de la page déjà calculé (analyse document)
+    words: Optional[List[Word]] = None,  # mots de la page déjà connus (même repère que l'image)
+    template: Optional[str] = None,      # modèle de relevé -> profil de prétraitement
+    dpi: Optional[int] = None,           # résolution de rendu (étape "downscale")
+    render_region: Optional[Callable[[Tuple[int,int,int,int]], np.ndarray]] = None,  # zones PDF à la résolution OCR
+    region_scale: float = 1.0            # px OCR par px de `image` quand render_region est fourni
 ) -> Dict:
     """
     1) YOLO pour localiser zones
     2) OCR sur zones
-    3) Fallback regex si nécessaire
+    3) Fallback regex seulement si un champ / les transactions manquent
     4) OCR zones 'lignes_transactions' -> parse lignes
     """
-    # 0) OCR global pour fallback éventuel (et pour aider au debug)
-    img_full = cv2.imread(image_path)
-    if img_full is None:
-        raise ValueError(f"Impossible de lire {image_path}")
-    ocr_full = ocr_text(preprocess_for_ocr(img_full), psm=6)
+    # Décodage unique : YOLO, l'OCR global et tous les crops partagent ce tableau
+    img_full = load_image(image)
 
-    detections = detect_blocks(image_path)
+    # Étapes géométriques (redressement, réduction) avant YOLO : boîtes et crops
+    # restent dans le même repère ; les mots déjà connus suivent (ou sont ignorés)
+    pre = get_preprocessor(template)
+    if render_region is not None:
+        # `image` est le raster de détection : les zones seront rendues depuis le PDF,
+        # donc aucune étape géométrique ici ; les mots (repère OCR) sont ramenés à l'image
+        scale, rotated = 1.0 / region_scale, False
+    else:
+        img_full, scale, rotated = pre.prepare_page(img_full, src_dpi=dpi)
+    if words is not None and rotated:
+        words = None
+    elif words is not None and scale != 1.0:
+        words = [w._replace(x1=int(w.x1 * scale), y1=int(w.y1 * scale), x2=int(w.x2 * scale), y2=int(w.y2 * scale))
+                 for w in words]
+    view = PageOcrView(img_full, pre, render_region=render_region, scale=region_scale)
+
+    detections = detect_blocks(img_full)  # micro-batché avec les autres pages en cours
 
     # --- Champs généraux via YOLO ---
-    def ocr_first_box(class_name: str, psm_hint: int = 7) -> Optional[str]:
-        boxes = detections.get(class_name, []) or []
-        if not boxes:
-            return None
-        # on prend la meilleure (la première suffit souvent)
-        crop_img = crop(image_path, boxes[0], pad_px=8)
-        txt = ocr_text(preprocess_for_ocr(crop_img), psm=psm_hint)
-        txt = (txt or "").strip()
-        return txt if txt else None
+    boxes = {k: detections[k][0] for k in HEADER_FIELDS if detections.get(k)}
+    if HEADER_OCR_MODE == "per_box":
+        fields = header_fields_per_box(view, boxes)
+    else:
+        fields = header_fields_one_pass(view, boxes, words=words)
+    header_compare = None
+    if HEADER_OCR_COMPARE and boxes:
+        other = (header_fields_one_pass(view, boxes, words=words) if HEADER_OCR_MODE == "per_box"
+                 else header_fields_per_box(view, boxes))
+        per_box, one_pass = (fields, other) if HEADER_OCR_MODE == "per_box" else (other, fields)
+        header_compare = compare_header_modes(per_box, one_pass)
 
-    nom_banque = ocr_first_box("nom_banque", psm_hint=7)
-    numero_compte = ocr_first_box("numero_compte", psm_hint=7)
-    periode = ocr_first_box("periode", psm_hint=7)
-    titulaire = ocr_first_box("titulaire", psm_hint=7)
+    nom_banque = fields.get("nom_banque")
+    numero_compte = fields.get("numero_compte")
+    periode = fields.get("periode")
+    titulaire = fields.get("titulaire")
 
     # --- Transactions via YOLO ---
-    transactions: List[dict] = []
+    transactions: List[Transaction] = []
     tx_boxes = detections.get("lignes_transactions", []) or []
     for bb in tx_boxes:
-        tx_img = crop(image_path, bb, pad_px=12)
-        tx_proc = preprocess_for_ocr(tx_img)
+        tx_proc = view.region(bb, pad_px=12)
+        # Tableau reconstruit depuis les boîtes de mots du même OCR psm 6 (mis en
+        # cache : les lignes texte ci-dessous n'en relancent pas un second)
+        if TABLE_RECONSTRUCTION:
+            tx_words = words_from_data(ocr_data(tx_proc, lang="eng+fra", config="--oem 3 --psm 6", prep="otsu"))
+            parsed = parse_table_words([tx_words]) if tx_words else None
+            if parsed:
+                transactions.extend(parsed)
+                continue
+            if tx_words:
+                # des mots mais pas de colonnes exploitables : règles texte, sans relancer en psm 11
+                parsed = parse_transactions_fn(lines_from_words(tx_words))
+                if parsed:
+                    transactions.extend(parsed)
+                continue
         # psm=6 -> Assume a uniform block of text; psm=11 -> sparse text; selon tes données essaye 6/11
         tx_lines = ocr_lines(tx_proc, psm=6)
         if not tx_lines:
@@ -154,11 +419,26 @@ def extract_with_yolo_and_rules(
                 transactions.extend(parsed)
 
     # --- Fallback sur tes règles (si vide) ---
+    # Évaluation paresseuse : pas d'OCR global si YOLO a tout trouvé ; seulement
+    # le bandeau d'en-tête s'il ne manque que des champs d'en-tête.
+    header = {"banque": nom_banque, "compte": numero_compte, "titulaire": titulaire, "periode": periode}
+    missing = [k for k, v in header.items() if not (v and v.strip())]
+    fallback_scope = "none"
+    if ocr_full is not None:
+        fallback_scope = "provided"
+    elif not transactions:
+        fallback_scope = "full_page"
+        ocr_full = ocr_text(view.full(), psm=6)
+    elif missing:
+        fallback_scope = "header_band"
+        ocr_full = ocr_text(view.top(header_band_bottom(img_full.shape[0], tx_boxes)), psm=6)
+
     fallback = {}
-    try:
-        fallback = regex_fallback_fn(ocr_full) or {}
-    except Exception:
-        fallback = {}
+    if ocr_full is not None and (missing or not transactions):
+        try:
+            fallback = regex_fallback_fn(ocr_full) or {}
+        except Exception:
+            fallback = {}
 
     def pick(primary: Optional[str], fb_key: str) -> Optional[str]:
         if primary and primary.strip():
@@ -175,6 +455,12 @@ def extract_with_yolo_and_rules(
         "_debug": {
             "yolo_found": {k: len(v) for k, v in detections.items()},
             "ocr_full_len": len(ocr_full or ""),
+            "fallback_scope": fallback_scope,
+            "missing": missing,
+            "header_ocr_mode": HEADER_OCR_MODE,
+            "preprocess": {"profile": pre.name, "scope": view.scope, "scale": round(scale, 4), "deskewed": rotated},
         }
     }
+    if header_compare is not None:
+        data["_debug"]["header_ocr_compare"] = header_compare
     return data
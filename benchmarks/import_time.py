@@ -0,0 +1,77 @@
+# benchmarks/import_time.py
+"""
+Temps d'import de l'API (`python -X importtime -c "import app.main"`).
+
+    python benchmarks/import_time.py [--runs 5] [--budget-ms 800]
+
+Code de sortie 1 si la médiane dépasse le budget ou si un module lourd
+(torch, ultralytics, cv2...) est chargé au démarrage : à lancer en CI.
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# ⚙️ CONFIG — budget et modules interdits au démarrage
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "800"))
+FORBIDDEN_AT_STARTUP = ("torch", "ultralytics", "cv2", "pytesseract", "pandas", "pdf2image")
+
+LINE_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def run_importtime() -> Tuple[float, List[Tuple[str, float]]]:
+    """Une mesure à froid : (ms cumulées de app.main, [(module, ms cumulées)])."""
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    ).stderr
+    modules: Dict[str, float] = {}
+    for line in out.splitlines():
+        m = LINE_RE.match(line)
+        if m:
+            modules[m.group(4)] = int(m.group(2)) / 1000.0
+    return modules.get("app.main", 0.0), sorted(modules.items(), key=lambda kv: -kv[1])
+
+
+def loaded_forbidden() -> List[str]:
+    code = (
+        "import sys, app.main; "
+        f"print(','.join(m for m in {FORBIDDEN_AT_STARTUP!r} if m in sys.modules))"
+    )
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return [m for m in out.stdout.strip().split(",") if m]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=IMPORT_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=10, help="modules les plus coûteux affichés")
+    args = parser.parse_args()
+
+    totals, heaviest = [], []
+    for _ in range(max(1, args.runs)):
+        total, heaviest = run_importtime()
+        totals.append(total)
+    median = statistics.median(totals)
+
+    print(f"import app.main : médiane {median:.0f} ms sur {len(totals)} essais "
+          f"(min {min(totals):.0f}, max {max(totals):.0f}) — budget {args.budget_ms:.0f} ms")
+    for name, ms in heaviest[:args.top]:
+        print(f"  {ms:8.1f} ms  {name}")
+
+    forbidden = loaded_forbidden()
+    if forbidden:
+        print(f"ÉCHEC : modules lourds importés au démarrage : {', '.join(forbidden)}")
+    if median > args.budget_ms:
+        print("ÉCHEC : budget d'import dépassé")
+    return 1 if forbidden or median > args.budget_ms else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
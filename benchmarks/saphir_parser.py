@@ -0,0 +1,106 @@
+# benchmarks/saphir_parser.py
+"""
+Micro-benchmark du parseur SAPHIR sur des relevés synthétiques.
+
+    python benchmarks/saphir_parser.py [--rows 1000 10000 50000] [--repeat 3] [--baseline REF]
+
+Affiche le temps total et le coût par ligne pour chaque taille : un coût par
+ligne stable d'une taille à l'autre = temps linéaire. `--baseline REF` mesure
+aussi `app/utils/parser_saphir.py` tel qu'il est au commit git REF (ex. HEAD~1).
+"""
+import argparse
+import importlib.util
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app.utils import parser_saphir  # noqa: E402
+
+HEADER = [
+    "AFRILAND FIRST BANK",
+    "EXTRAIT DE COMPTE",
+    "Nom du client : SAFIR CONSULTING CAMEROUN",
+    "Numéro de compte : 00002-08237521001-09 XAF",
+    "Solde initial : 12 500 000",
+    "Date Opération Date valeur Libellé Débit (XAF) Crédit (XAF) Solde (XAF)",
+]
+LABELS = ["VIREMENT SALAIRE", "FRAIS TENUE DE COMPTE", "COMMISSION SUR VIREMENT",
+          "VERSEMENT ESPECES", "TAXE TVA", "RETRAIT GAB", "REMBOURSEMENT PRET"]
+
+
+def synthetic_statement(rows: int, seed: int = 0) -> str:
+    """Relevé de `rows` opérations : libellés sur deux lignes, dates éclatées, en-têtes de page."""
+    rnd = random.Random(seed)
+    lines = list(HEADER)
+    balance = 12_500_000
+    for i in range(rows):
+        d = f"{1 + i % 28:02d}/{1 + (i // 28) % 12:02d}/24"
+        amount = rnd.randint(1, 500) * 1000
+        debit = rnd.random() < 0.6
+        balance += -amount if debit else amount
+        cols = f"{amount:,}".replace(",", " ")
+        row = f"{d} {d} {rnd.choice(LABELS)} {cols} {balance:,}".replace(",", " ")
+        if i % 7 == 3:  # date de valeur coupée par l'OCR : "dd/mm" puis "/yy ..." à la ligne suivante
+            row = f"{d} {d[:5]}"
+            lines += [row, f"/24 {rnd.choice(LABELS)} {cols} {balance:,}".replace(",", " ")]
+        elif i % 5 == 1:  # libellé sur deux lignes
+            lines += [f"{d} {d} {rnd.choice(LABELS)}", f"REF {i:06d} {cols} {balance:,}".replace(",", " ")]
+        else:
+            lines.append(row)
+        if i % 40 == 39:  # saut de page : en-tête du tableau répété
+            lines += ["Page suivante", HEADER[-1]]
+    return "\n".join(lines)
+
+
+def load_baseline(ref: str):
+    """Module parser_saphir tel qu'au commit `ref`."""
+    src = subprocess.run(["git", "show", f"{ref}:app/utils/parser_saphir.py"],
+                         cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    path = os.path.join(tempfile.mkdtemp(prefix="bench_"), "parser_saphir_baseline.py")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(src)
+    spec = importlib.util.spec_from_file_location("parser_saphir_baseline", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def bench(fn: Callable[[str], Dict], text: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(text)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--baseline", help="commit git de référence (ex. HEAD~1)")
+    args = parser.parse_args()
+
+    impls = {"actuel": parser_saphir.extract_saphir_bank_statement_data}
+    if args.baseline:
+        impls[args.baseline] = load_baseline(args.baseline).extract_saphir_bank_statement_data
+
+    print(f"{'version':>10} {'lignes':>8} {'total (ms)':>11} {'µs/ligne':>9} {'transactions':>13}")
+    for rows in args.rows:
+        text = synthetic_statement(rows)
+        n_tx = len(parser_saphir.extract_saphir_bank_statement_data(text)["transactions"])
+        for name, fn in impls.items():
+            secs = bench(fn, text, args.repeat)
+            print(f"{name:>10} {rows:>8} {secs * 1000:>11.1f} {secs / rows * 1e6:>9.2f} {n_tx:>13}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
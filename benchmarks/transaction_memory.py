@@ -0,0 +1,63 @@
+# benchmarks/transaction_memory.py
+"""
+Mémoire des lignes parsées : `Transaction` (slots) contre dicts, sur un relevé
+SAPHIR synthétique.
+
+    python benchmarks/transaction_memory.py [--rows 100000]
+
+Le relevé est parsé une fois ; on mesure (tracemalloc) la mémoire retenue par
+la liste de `Transaction`, puis par la même liste sérialisée en dicts (forme
+JSON de l'API, celle que produisaient les parseurs avant les records).
+"""
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+from typing import Callable, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.utils.models import transactions_to_dicts  # noqa: E402
+from app.utils.parser_saphir import extract_saphir_bank_statement_data  # noqa: E402
+from saphir_parser import synthetic_statement  # noqa: E402
+
+
+def retained(build: Callable[[], List]) -> int:
+    """Octets encore alloués une fois `build()` terminé (l'objet retourné est gardé)."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    obj = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del obj
+    return after - before
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    text = synthetic_statement(args.rows)
+    txs = extract_saphir_bank_statement_data(text)["transactions"]
+    n = len(txs)
+
+    # les chaînes (date, libellé, montants) sont partagées par les deux formes :
+    # seul le conteneur de chaque ligne est mesuré
+    records = retained(lambda: [type(t)(t.date, t.description, t.montant, t.sens, t.solde) for t in txs])
+    dicts = retained(lambda: transactions_to_dicts(txs))
+
+    print(f"{'forme':>12} {'lignes':>8} {'total (Mo)':>11} {'octets/ligne':>13}")
+    for name, size in (("Transaction", records), ("dict", dicts)):
+        print(f"{name:>12} {n:>8} {size / 2**20:>11.1f} {size / n:>13.0f}")
+    print(f"gain : {dicts / records:.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
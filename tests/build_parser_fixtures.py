@@ -0,0 +1,80 @@
+# tests/build_parser_fixtures.py
+"""
+Régénère les sorties attendues des parseurs texte (tests/fixtures/parsers)
+à partir de `app/utils/parser.py` et `app/utils/parser_saphir.py` tels qu'au
+commit git REF (par défaut le commit d'origine, avant les optimisations).
+
+    python tests/build_parser_fixtures.py [--ref 66f9103]
+
+Les relevés SAPHIR synthétiques (`saphir_*.txt`) sont réécrits au passage.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from typing import Dict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(ROOT, "tests", "fixtures", "parsers")
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from saphir_parser import synthetic_statement  # noqa: E402
+
+BASELINE_REF = "66f9103"
+SYNTHETIC = {"saphir_120_seed0": (120, 0), "saphir_300_seed7": (300, 7)}
+
+
+def load_module(ref: str, relpath: str, name: str):
+    src = subprocess.run(["git", "show", f"{ref}:{relpath}"],
+                         cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    path = os.path.join(tempfile.mkdtemp(prefix="fixtures_"), f"{name}.py")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(src)
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def comparable(data: Dict) -> Dict:
+    """En-tête + transactions en dicts JSON ; `_debug` n'est pas comparé."""
+    out = {k: v for k, v in data.items() if k != "_debug"}
+    out["transactions"] = [t if isinstance(t, dict) else t.to_dict() for t in data.get("transactions") or []]
+    return out
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ref", default=BASELINE_REF)
+    args = parser.parse_args()
+
+    for name, (rows, seed) in SYNTHETIC.items():
+        with open(os.path.join(FIXTURES, f"{name}.txt"), "w", encoding="utf-8") as f:
+            f.write(synthetic_statement(rows, seed) + "\n")
+
+    generic = load_module(args.ref, "app/utils/parser.py", "parser_baseline")
+    saphir = load_module(args.ref, "app/utils/parser_saphir.py", "parser_saphir_baseline")
+    for fname in sorted(os.listdir(FIXTURES)):
+        if not fname.endswith(".txt"):
+            continue
+        with open(os.path.join(FIXTURES, fname), encoding="utf-8") as f:
+            text = f.read()
+        expected = {
+            "ref": args.ref,
+            "parser": comparable(generic.extract_bank_statement_data(text)),
+            "parser_saphir": comparable(saphir.extract_saphir_bank_statement_data(text)),
+        }
+        out = os.path.join(FIXTURES, fname[:-4] + ".expected.json")
+        with open(out, "w", encoding="utf-8") as f:
+            json.dump(expected, f, ensure_ascii=False, indent=1)
+            f.write("\n")
+        print(f"{out} : {len(expected['parser']['transactions'])} / "
+              f"{len(expected['parser_saphir']['transactions'])} transactions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+# tests/test_cache_service.py
+import pytest
+
+from app.utils import cache_service
+from app.utils.cache_service import TieredCache
+
+
+class Clock:
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = Clock()
+    monkeypatch.setattr(cache_service, "time", c)
+    return c
+
+
+def test_lru_evicts_least_recently_used(clock):
+    cache = TieredCache("t", max_items=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1        # "a" redevient la plus récente
+    cache.set("c", 3)                 # -> "b" sort
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["size"] == 2
+
+
+def test_ttl_expires_memory_entries(clock):
+    cache = TieredCache("t", max_items=10, ttl=60)
+    cache.set("a", {"x": 1})
+    clock.now += 59
+    assert cache.get("a") == {"x": 1}
+    clock.now += 2
+    assert cache.get("a") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_no_ttl_never_expires(clock):
+    cache = TieredCache("t", max_items=10, ttl=0)
+    cache.set("a", 1)
+    clock.now += 10 ** 9
+    assert cache.get("a") == 1
+
+
+def test_disk_tier_serves_after_memory_eviction(clock, tmp_path):
+    cache = TieredCache("t", max_items=1, ttl=60, db_path=str(tmp_path / "c.sqlite"))
+    cache.set("a", [1, 2])
+    cache.set("b", [3])               # "a" ne reste que sur disque
+    assert cache.get("a") == [1, 2]
+    assert cache.stats()["disk_hits"] == 1
+    clock.now += 61                   # expirée aussi sur disque
+    assert cache.get("b") is None
+
+
+def test_disk_tier_is_bounded_by_last_access(clock, tmp_path):
+    cache = TieredCache("t", max_items=0, db_path=str(tmp_path / "c.sqlite"), disk_max_items=2)
+    cache.set("a", 1)
+    clock.now += 1
+    cache.set("b", 2)
+    clock.now += 1
+    assert cache.get("a") == 1        # lecture : "a" plus récente que "b"
+    clock.now += 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+
+def test_namespaces_share_a_database(clock, tmp_path):
+    db = str(tmp_path / "c.sqlite")
+    TieredCache("x", max_items=0, db_path=db).set("k", "x")
+    assert TieredCache("y", max_items=0, db_path=db).get("k") is None
+
+
+def test_result_key_follows_content_extension_and_parser(monkeypatch):
+    from app.utils import extraction_service
+    from app.utils.extraction_service import result_cache_key
+
+    key = result_cache_key(b"%PDF-1.4 releve", "Releve Mars.PDF")
+    assert key == result_cache_key(b"%PDF-1.4 releve", "copie.pdf")   # le nom ne compte pas
+    assert key != result_cache_key(b"%PDF-1.4 releve", "releve.jpg")  # l'extension, si
+    assert key != result_cache_key(b"%PDF-1.4 autre", "releve.pdf")
+    monkeypatch.setattr(extraction_service, "PARSER_VERSION", "next")
+    assert key != result_cache_key(b"%PDF-1.4 releve", "releve.pdf")
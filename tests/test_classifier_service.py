@@ -0,0 +1,81 @@
+# tests/test_classifier_service.py
+import pytest
+
+from app.utils import classifier_service, extraction_service
+from app.utils.classifier_service import CLASSIFY_MIN_CONFIDENCE, classify_document
+
+HEADER = "RELEVE DE COMPTE courant numéro 0001 agence centrale "
+
+
+def _classify(monkeypatch, text, source):
+    monkeypatch.setattr(classifier_service, "_read_header_text", lambda path: (text, source))
+    return classify_document("releve.pdf")
+
+
+def test_markers_above_threshold_pick_saphir(monkeypatch):
+    r = _classify(monkeypatch, HEADER + "AFRILAND FIRST BANK extrait de compte", "text_layer")
+    assert r["template"] == "saphir" and r["confidence"] >= CLASSIFY_MIN_CONFIDENCE
+
+
+def test_text_layer_without_markers_is_confidently_generic(monkeypatch):
+    r = _classify(monkeypatch, HEADER, "text_layer")
+    assert r["template"] == "generic" and r["confidence"] == 0.9
+
+
+def test_text_layer_near_threshold_stays_in_doubt(monkeypatch):
+    r = _classify(monkeypatch, HEADER + "extrait de compte débit (xaf)", "text_layer")  # score 0.4
+    assert r["template"] == "generic" and r["confidence"] < CLASSIFY_MIN_CONFIDENCE
+
+
+def test_ocr_band_without_markers_stays_in_doubt(monkeypatch):
+    r = _classify(monkeypatch, HEADER, "ocr_band")
+    assert r["template"] == "generic" and r["confidence"] < CLASSIFY_MIN_CONFIDENCE
+
+
+def test_unreadable_header_has_no_confidence(monkeypatch):
+    assert _classify(monkeypatch, "", "ocr_band")["confidence"] == 0.0
+
+
+class _Page:
+    def __init__(self, text=None):
+        self._text = text
+
+    @property
+    def has_words(self):
+        return self._text is not None
+
+    @property
+    def text(self):
+        return self._text
+
+
+class _Doc:
+    filepath = "releve.pdf"
+
+    def __init__(self, *pages):
+        self.pages = list(pages)
+
+    @property
+    def text(self):
+        raise AssertionError("OCR complet du document")
+
+
+def test_doubt_is_confirmed_on_first_page_band_only(monkeypatch):
+    bands = []
+    monkeypatch.setattr(extraction_service, "read_header_band",
+                        lambda path: bands.append(path) or "AFRILAND FIRST BANK")
+    routing = {"template": "generic", "confidence": 0.4}
+    assert extraction_service._route_saphir(_Doc(_Page(), _Page()), routing)
+    assert bands == ["releve.pdf"]
+
+
+def test_doubt_reuses_known_first_page_words(monkeypatch):
+    monkeypatch.setattr(extraction_service, "read_header_band",
+                        lambda path: pytest.fail("bandeau relu alors que la page 1 est connue"))
+    routing = {"template": "generic", "confidence": 0.4}
+    assert not extraction_service._route_saphir(_Doc(_Page(HEADER), _Page()), routing)
+
+
+def test_confident_routing_reads_nothing(monkeypatch):
+    monkeypatch.setattr(extraction_service, "read_header_band", lambda path: pytest.fail("bandeau relu"))
+    assert extraction_service._route_saphir(_Doc(_Page()), {"template": "saphir", "confidence": 0.8})
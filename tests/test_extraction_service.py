@@ -0,0 +1,40 @@
+# tests/test_extraction_service.py
+import pytest
+
+from app.utils.extraction_service import _row_corrections
+
+
+def _apply(sent, corrections, count):
+    """Côté client : corrections appliquées aux lignes reçues, puis troncature."""
+    rows = [dict(r) for r in sent]
+    for c in corrections:
+        fields = {k: v for k, v in c.items() if k != "index"}
+        if c["index"] < len(rows):
+            rows[c["index"]].update(fields)
+        else:
+            rows.append(fields)
+    return [{k: v for k, v in r.items() if v is not None} for r in rows[:count]]
+
+
+A = {"date": "01/02/2024", "description": "FRAIS", "montant": "5.000", "sens": None}
+B = {"date": "02/02/2024", "description": "VIREMENT", "montant": "10.000", "sens": "Cr", "solde": "105.000"}
+C = {"date": "03/02/2024", "description": "RETRAIT", "montant": "20.000", "sens": "Dr"}
+
+
+@pytest.mark.parametrize("final", [
+    [A, B],                                # inchangé
+    [{**A, "sens": "Dr"}, B],              # sens déduit du solde
+    [A, {k: v for k, v in B.items() if k != "solde"}],  # champ retiré
+    [A, B, C],                             # ligne ajoutée (tableau colonnaire)
+    [C],                                   # lignes retirées
+])
+def test_corrections_rebuild_final_list(final):
+    sent = [A, B]
+    corrections = _row_corrections(sent, final)
+    drop_none = [{k: v for k, v in r.items() if v is not None} for r in final]
+    assert _apply(sent, corrections, len(final)) == drop_none
+
+
+def test_corrections_only_carry_changed_fields():
+    assert _row_corrections([A, B], [A, B]) == []
+    assert _row_corrections([A, B], [{**A, "sens": "Dr"}, B]) == [{"index": 0, "sens": "Dr"}]
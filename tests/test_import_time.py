@@ -0,0 +1,26 @@
+# tests/test_import_time.py
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_import_time_budget():
+    # budget et modules interdits : voir benchmarks/import_time.py
+    out = subprocess.run(
+        [sys.executable, os.path.join(ROOT, "benchmarks", "import_time.py"), "--runs", "3"],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    assert out.returncode == 0, out.stdout + out.stderr
+
+
+def test_result_cache_key_stays_light():
+    # la clé de cache est calculée à chaque requête, avant tout OCR
+    code = (
+        "import sys; from app.utils.extraction_service import result_cache_key; "
+        "result_cache_key(b'%PDF', 'releve.pdf'); "
+        "print(','.join(m for m in ('cv2', 'numpy', 'ultralytics', 'torch') if m in sys.modules))"
+    )
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == ""
@@ -0,0 +1,201 @@
+# tests/test_job_service.py
+import os
+import time
+
+import pytest
+
+from app.utils import job_service
+from app.utils.job_service import JobNotFound, JobStore, JobWorkers
+
+
+class Clock:
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = Clock()
+    monkeypatch.setattr(job_service, "time", c)
+    return c
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(str(tmp_path / "jobs.sqlite"), str(tmp_path / "files"), max_attempts=2, lease_seconds=60)
+
+
+def test_claim_order_priority_then_age(store, clock):
+    low = store.submit([("a.pdf", b"a")], priority=0)
+    clock.now += 1
+    high = store.submit([("b.pdf", b"b"), ("c.pdf", b"c")], priority=5)
+    claimed = [(r["job_id"], r["idx"]) for r in (store.claim(), store.claim(), store.claim())]
+    assert claimed == [(high, 0), (high, 1), (low, 0)]
+    assert store.claim() is None
+
+
+def test_claim_returns_lease_token(store, clock):
+    store.submit([("a.pdf", b"a")])
+    row = store.claim()
+    assert row["status"] == "running" and row["attempts"] == 1
+
+
+def test_expired_lease_is_reclaimed_and_stale_worker_is_fenced(store, clock):
+    job = store.submit([("a.pdf", b"a")])
+    first = store.claim()
+    clock.now += 30
+    assert store.claim() is None                      # bail encore valide
+    clock.now += 31
+    second = store.claim()
+    assert second["attempts"] == 2
+    # l'ancien worker revient : ni renouvellement, ni résultat, ni échec
+    assert not store.renew(job, 0, first["attempts"])
+    assert not store.complete(job, 0, first["attempts"], {"extracted_data": "stale"})
+    assert not store.fail(job, 0, first["attempts"], "stale")
+    assert store.status(job)["files"][0]["status"] == "running"
+    assert store.complete(job, 0, second["attempts"], {"extracted_data": "ok"})
+    assert store.results(job)[0]["extracted_data"] == "ok"
+
+
+def test_renew_keeps_the_file_owned(store, clock):
+    job = store.submit([("a.pdf", b"a")])
+    row = store.claim()
+    for _ in range(5):
+        clock.now += 40
+        assert store.renew(job, 0, row["attempts"])
+        assert store.claim() is None
+
+
+def test_fail_requeues_until_max_attempts(store, clock):
+    job = store.submit([("a.pdf", b"a")])
+    row = store.claim()
+    assert store.fail(job, 0, row["attempts"], "boom")
+    assert store.status(job)["files"][0]["status"] == "queued"
+    row = store.claim()
+    assert row["attempts"] == 2
+    assert store.fail(job, 0, row["attempts"], "boom again")
+    status = store.status(job)
+    assert status["status"] == "failed"
+    assert status["files"][0]["error"] == "boom again"
+    assert store.claim() is None
+
+
+def test_expired_lease_without_attempts_left_fails(store, clock):
+    job = store.submit([("a.pdf", b"a")])
+    store.claim()
+    clock.now += 61
+    store.claim()                                     # essai 2
+    clock.now += 61
+    assert store.claim() is None
+    assert store.status(job)["files"][0] == {
+        "index": 0, "filename": "a.pdf", "status": "failed", "attempts": 2, "error": "worker interrompu",
+    }
+
+
+def test_finished_file_upload_is_removed(store, clock):
+    job = store.submit([("a.pdf", b"a")])
+    row = store.claim()
+    assert os.path.isfile(row["path"])
+    store.complete(job, 0, row["attempts"], {})
+    assert not os.path.exists(row["path"])
+    assert not os.path.exists(os.path.join(store.files_dir, job))
+
+
+def test_status_aggregates_partial(store, clock):
+    job = store.submit([("a.pdf", b"a"), ("b.pdf", b"b")])
+    a = store.claim()
+    store.complete(job, 0, a["attempts"], {})
+    b = store.claim()
+    store.fail(job, 1, b["attempts"], "x")
+    b = store.claim()
+    store.fail(job, 1, b["attempts"], "x")
+    status = store.status(job)
+    assert status["status"] == "partial"
+    assert status["progress"] == {"total": 2, "finished": 2, "done": 1, "failed": 1}
+
+
+def test_unknown_job(store):
+    with pytest.raises(JobNotFound):
+        store.status("nope")
+
+
+def test_workers_retry_then_complete(store, monkeypatch):
+    calls = []
+
+    def run(path, filename):
+        calls.append(filename)
+        if len(calls) == 1:
+            raise RuntimeError("OCR indisponible")
+        return {"extracted_data": {"banque": "X"}}
+
+    monkeypatch.setattr(job_service, "run_job_file", run)
+    monkeypatch.setattr(job_service, "JOB_POLL_INTERVAL", 0.01)
+    workers = JobWorkers(store, workers=1)
+    workers.start()
+    try:
+        job = store.submit([("a.pdf", b"a")])
+        workers.notify()
+        deadline = time.time() + 5
+        while store.status(job)["status"] != "done" and time.time() < deadline:
+            time.sleep(0.01)
+    finally:
+        workers.stop()
+    assert store.status(job)["files"][0]["attempts"] == 2
+    assert store.results(job)[0]["extracted_data"] == {"banque": "X"}
+
+
+def test_heartbeat_keeps_long_extraction_leased(tmp_path, monkeypatch):
+    store = JobStore(str(tmp_path / "jobs.sqlite"), str(tmp_path / "files"), max_attempts=2, lease_seconds=1.5)
+    stolen = []
+
+    def run(path, filename):
+        # extraction plus longue que le bail : un autre worker ne doit rien réclamer
+        for _ in range(5):
+            time.sleep(0.5)
+            stolen.append(store.claim())
+        return {}
+
+    monkeypatch.setattr(job_service, "run_job_file", run)
+    monkeypatch.setattr(job_service, "JOB_POLL_INTERVAL", 0.01)
+    workers = JobWorkers(store, workers=1)
+    job = store.submit([("a.pdf", b"a")])
+    workers.start()
+    try:
+        deadline = time.time() + 10
+        while store.status(job)["status"] != "done" and time.time() < deadline:
+            time.sleep(0.05)
+    finally:
+        workers.stop()
+    assert stolen == [None] * 5
+    assert store.status(job)["files"][0]["attempts"] == 1
+
+
+def test_worker_survives_a_failing_completion(store, monkeypatch):
+    monkeypatch.setattr(job_service, "run_job_file", lambda path, filename: {"extracted_data": {}})
+    monkeypatch.setattr(job_service, "JOB_POLL_INTERVAL", 0.01)
+    real_complete, broken = store.complete, []
+
+    def complete(*args):
+        if not broken:
+            broken.append(args)
+            raise job_service.sqlite3.OperationalError("database is locked")
+        return real_complete(*args)
+
+    monkeypatch.setattr(store, "complete", complete)
+    workers = JobWorkers(store, workers=1)
+    workers.start()
+    try:
+        first = store.submit([("a.pdf", b"a")])
+        second = store.submit([("b.pdf", b"b")])
+        workers.notify()
+        deadline = time.time() + 5
+        while store.status(second)["status"] != "done" and time.time() < deadline:
+            time.sleep(0.01)
+        assert all(t.is_alive() for t in workers._threads)
+    finally:
+        workers.stop()
+    assert store.status(second)["status"] == "done"
+    assert store.status(first)["files"][0]["status"] == "running"  # repris à l'expiration du bail
@@ -0,0 +1,61 @@
+# tests/test_parsers_baseline.py
+"""
+Différentiel parseurs texte : sorties actuelles contre celles du code
+d'origine (tests/fixtures/parsers/*.expected.json, voir build_parser_fixtures.py).
+"""
+import json
+import os
+
+import pytest
+
+from app.utils.parser import extract_bank_statement_data
+from app.utils.parser_saphir import extract_saphir_bank_statement_data, iter_saphir_events
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "parsers")
+CASES = sorted(f[:-4] for f in os.listdir(FIXTURES) if f.endswith(".txt"))
+
+
+def _load(name):
+    with open(os.path.join(FIXTURES, f"{name}.txt"), encoding="utf-8") as f:
+        text = f.read()
+    with open(os.path.join(FIXTURES, f"{name}.expected.json"), encoding="utf-8") as f:
+        return text, json.load(f)
+
+
+def _tx(t):
+    d = t if isinstance(t, dict) else t.to_dict()
+    # `solde` est un champ ajouté depuis (Transaction) : hors comparaison
+    return {k: v for k, v in d.items() if k != "solde"}
+
+
+def _comparable(data):
+    out = {k: v for k, v in data.items() if k != "_debug"}
+    out["transactions"] = [_tx(t) for t in data.get("transactions") or []]
+    return out
+
+
+@pytest.mark.parametrize("name", CASES)
+def test_generic_parser_matches_baseline(name):
+    text, expected = _load(name)
+    assert _comparable(extract_bank_statement_data(text)) == _comparable(expected["parser"])
+
+
+@pytest.mark.parametrize("name", CASES)
+def test_saphir_parser_matches_baseline(name):
+    text, expected = _load(name)
+    assert _comparable(extract_saphir_bank_statement_data(text)) == _comparable(expected["parser_saphir"])
+
+
+@pytest.mark.parametrize("name", [c for c in CASES if c.startswith("saphir_")])
+def test_saphir_stream_matches_baseline(name):
+    # même résultat quel que soit le découpage en pages
+    text, expected = _load(name)
+    lines = text.splitlines()
+    pages = ["\n".join(lines[i:i + 37]) for i in range(0, len(lines), 37)]
+    events = list(iter_saphir_events(pages))
+    txs = [_tx(t) for e in events if e["event"] == "page" for t in e["transactions"]]
+    done = events[-1]
+    want = _comparable(expected["parser_saphir"])
+    assert txs == want["transactions"]
+    assert {k: done[k] for k in ("banque", "compte", "titulaire", "periode")} == \
+        {k: want[k] for k in ("banque", "compte", "titulaire", "periode")}
@@ -0,0 +1,112 @@
+# tests/test_table_service.py
+from app.utils.document_service import Word
+from app.utils import extraction_service
+from app.utils.table_service import _column_spans, parse_table_pages, parse_table_words
+
+CHAR_W, H = 10, 20
+COLS = {"date": 0, "libelle": 150, "debit": 600, "credit": 800, "solde": 1000}
+
+
+def _line(y, cells):
+    """Mots d'une ligne : `cells` = [(x, texte)], 10 px par caractère, 1 caractère entre mots."""
+    words = []
+    for x, text in cells:
+        for token in text.split():
+            words.append(Word(token, x, y, x + CHAR_W * len(token), y + H, (1, 1, y), 90.0))
+            x += CHAR_W * (len(token) + 1)
+    return words
+
+
+def _header(y):
+    return _line(y, [(COLS["date"], "Date"), (COLS["libelle"], "Libellé"), (COLS["debit"], "Débit"),
+                     (COLS["credit"], "Crédit"), (COLS["solde"], "Solde")])
+
+
+def _row(y, date, label, debit=None, credit=None, solde=None):
+    cells = [(COLS["date"], date), (COLS["libelle"], label)]
+    cells += [(COLS[k], v) for k, v in (("debit", debit), ("credit", credit), ("solde", solde)) if v]
+    return _line(y, cells)
+
+
+def _footer(y):
+    # mentions légales pleine largeur : leurs mots comblent les blancs entre colonnes
+    return _line(y, [(0, " ".join(["mentions"] * 15))])
+
+
+def _page(rows, header_at=None, footer=False):
+    words, y = [], 0
+    for i, row in enumerate(rows):
+        if header_at == i:
+            words += _header(y)
+            y += 40
+        words += row(y)
+        y += 40
+    if header_at == len(rows):
+        words += _header(y)
+    if footer:
+        words += _footer(y + 40)
+    return words
+
+
+def _txs(page):
+    return [(t.date, t.montant, t.sens, t.solde) for t in page]
+
+
+PAGE_1 = [lambda y: _row(y, "01/02/2024", "FRAIS TENUE", debit="5 000", solde="95 000"),
+          lambda y: _row(y, "02/02/2024", "VIREMENT RECU", credit="10 000", solde="105 000")]
+PAGE_2 = [lambda y: _row(y, "03/02/2024", "RETRAIT GAB", debit="20 000", solde="85 000"),
+          lambda y: _row(y, "04/02/2024", "VERSEMENT", credit="1 500", solde="86 500")]
+
+
+def test_full_width_footer_does_not_merge_columns():
+    pages = parse_table_pages([_page(PAGE_1, header_at=0), _page(PAGE_2, footer=True)])
+    # une transaction est rattachée à la page où elle se termine (où commence la suivante)
+    assert _txs(pages[1])[-2:] == [("03/02/2024", "20000", "Dr", "85000"), ("04/02/2024", "1500", "Cr", "86500")]
+
+
+def test_column_spans_ignore_rows_wider_than_header():
+    rows = [_header(0), _row(40, "01/02/2024", "FRAIS", debit="5 000", solde="95 000"), _footer(80)]
+    assert len(_column_spans(rows, 20, max_width=1100)) == 5
+    assert len(_column_spans(rows, 20)) == 1
+
+
+def test_page_without_reconstructed_table_is_reported():
+    # en-tête de la page 1 au-delà des HEADER_SEARCH_ROWS premières lignes
+    banner = [lambda y, i=i: _line(y, [(0, f"AFRILAND FIRST BANK ligne {i}")]) for i in range(14)]
+    pages = parse_table_pages([_page(banner + PAGE_1, header_at=14), _page(PAGE_2, header_at=0)])
+    assert pages[0] is None
+    assert len(pages[1]) == 2
+    # ancienne API : seules les pages reconstruites
+    assert len(parse_table_words([_page(banner + PAGE_1, header_at=14), _page(PAGE_2, header_at=0)])) == 2
+
+
+class _Page:
+    def __init__(self, words):
+        self.words = words
+
+
+class _Doc:
+    def __init__(self, pages):
+        self.pages = [_Page(w) for w in pages]
+
+
+def test_saphir_table_keeps_text_rules_for_failed_pages():
+    banner = [lambda y, i=i: _line(y, [(0, f"AFRILAND FIRST BANK ligne {i}")]) for i in range(14)]
+    doc = _Doc([_page(banner + PAGE_1, header_at=14), _page(PAGE_2, header_at=0)])
+    text_rows = [{"date": "01/02/2024", "description": "texte 1", "montant": "5000", "sens": "Dr"},
+                 {"date": "02/02/2024", "description": "texte 2", "montant": "10000", "sens": "Cr"},
+                 {"date": "03/02/2024", "description": "texte 3", "montant": "20000", "sens": "Dr"},
+                 {"date": "04/02/2024", "description": "texte 4", "montant": "1500", "sens": "Cr"}]
+    data = {"transactions": list(text_rows)}
+    extraction_service._saphir_table(doc, data, [0, 0, 1, 1])
+    descriptions = [t["description"] if isinstance(t, dict) else t.description for t in data["transactions"]]
+    assert descriptions == ["texte 1", "texte 2", "RETRAIT GAB", "VERSEMENT"]
+    assert data["_debug"]["table"] == "mixed" and data["_debug"]["text_rule_pages"] == [1]
+
+
+def test_saphir_table_takes_columns_when_every_page_is_read():
+    doc = _Doc([_page(PAGE_1, header_at=0), _page(PAGE_2, footer=True)])
+    data = {"transactions": [{"date": "x", "description": "texte", "montant": None, "sens": None}] * 4}
+    extraction_service._saphir_table(doc, data, [0, 0, 1, 1])
+    assert [t.description for t in data["transactions"]] == ["FRAIS TENUE", "VIREMENT RECU", "RETRAIT GAB", "VERSEMENT"]
+    assert data["_debug"]["table"] == "columns"
@@ -0,0 +1,90 @@
+# tests/test_transaction_service.py
+import pytest
+
+from app.utils.models import Transaction
+from app.utils.transaction_service import TransactionTable, decimal_to_minor, format_minor, to_minor
+
+
+@pytest.mark.parametrize("txt, minor", [
+    ("5.000", 500000),            # milliers (sortie de _norm_amount_txt)
+    ("1.257.225", 125722500),
+    ("10 195,50", 1019550),
+    ("10195.50", 1019550),
+    ("10195.5", 1019550),
+    ("1,257,225", 125722500),
+    ("-5.000", -500000),
+    ("12500000", 1250000000),
+    ("abc", None),
+    ("", None),
+    (None, None),
+])
+def test_to_minor(txt, minor):
+    assert to_minor(txt) == minor
+
+
+def test_decimal_to_minor_is_strict():
+    assert decimal_to_minor("5.000") == 500
+    assert decimal_to_minor("1.257.225") is None
+
+
+@pytest.mark.parametrize("value, txt", [(125722500, "1257225"), (1019550, "10195.50"), (-500, "-5")])
+def test_format_minor(value, txt):
+    assert format_minor(value) == txt
+    assert to_minor(txt) == value
+
+
+def test_records_keep_source_text():
+    txs = [
+        Transaction("01/01/24", "FRAIS", "5.000", "Dr", "95.000"),
+        Transaction("02/01/24", "VIREMENT", "1.257", "Cr", "96.257"),
+        Transaction("03/01/24", "ILLISIBLE", "12O5", "Dr", None),
+    ]
+    table = TransactionTable.from_transactions(txs)
+    assert table.montant.tolist()[:2] == [500000, 125700]
+    assert table.to_records() == [
+        {"date": "01/01/24", "description": "FRAIS", "montant": "5.000", "sens": "Dr", "solde": "95.000"},
+        {"date": "02/01/24", "description": "VIREMENT", "montant": "1.257", "sens": "Cr", "solde": "96.257"},
+        {"date": "03/01/24", "description": "ILLISIBLE", "montant": "12O5", "sens": "Dr"},
+    ]
+
+
+def test_infer_sens_from_balance_movement():
+    table = TransactionTable.from_transactions([
+        {"date": "01/01/24", "description": "a", "montant": "5.000", "sens": None, "solde": "95.000"},
+        {"date": "02/01/24", "description": "b", "montant": None, "sens": None, "solde": "97.500"},
+        {"date": "03/01/24", "description": "c", "montant": "??", "sens": None, "solde": "96.000"},
+        {"date": "04/01/24", "description": "d", "montant": "1.000", "sens": "Cr", "solde": "95.000"},
+    ])
+    assert table.infer_sens(to_minor("100.000")) == 3
+    records = table.to_records()
+    assert [r["sens"] for r in records] == ["Dr", "Cr", "Dr", "Cr"]   # sens lu jamais écrasé
+    assert records[1]["montant"] == "2500"                            # déduit : formaté
+    assert records[2]["montant"] == "??"                              # illisible : conservé
+
+
+def test_balance_check():
+    rows = [("01/01/24", "5.000", "Dr", "95.000"), ("02/01/24", "1.257", "Cr", "96.257"),
+            ("03/01/24", "1.000", "Dr", "99.000")]
+    table = TransactionTable.from_transactions([Transaction(d, "x", m, s, b) for d, m, s, b in rows])
+    report = table.balance_check(to_minor("100.000"))
+    assert report == {"checked": 3, "mismatches": 1, "rows": [2], "ok": False}
+    # sans solde d'ouverture : le premier solde lu sert de base
+    assert table.balance_check()["checked"] == 2
+
+
+def test_balance_check_does_not_hide_scaled_amounts():
+    # "5.000" lu 5,00 au lieu de 5 000 : le contrôle ne doit pas passer par hasard
+    table = TransactionTable.from_transactions([Transaction("01/01/24", "x", "5.000", "Dr", "95.000")])
+    assert table.balance_check(to_minor("100000"))["ok"] is True
+    assert table.balance_check(to_minor("100"))["ok"] is False
+
+
+def test_period_uses_min_and_max_dates():
+    table = TransactionTable.from_transactions([
+        Transaction("15/02/24", "x", "1", "Cr"),
+        Transaction("03/01/2024", "x", "1", "Cr"),
+        Transaction("illisible", "x", "1", "Cr"),
+        Transaction("28/02/24", "x", "1", "Cr"),
+    ])
+    assert table.period() == "03/01/2024 - 28/02/2024"
+    assert TransactionTable.from_transactions([]).period() is None
@@ -0,0 +1,35 @@
+# tests/test_warmup_service.py
+import asyncio
+
+from app.routes import health
+from app.utils import warmup_service
+
+
+def _boom():
+    raise FileNotFoundError("YOLO_WEIGHTS introuvable")
+
+
+def _ok():
+    pass
+
+
+def _patch(monkeypatch, **fns):
+    monkeypatch.setattr(warmup_service, "WARMUP_YOLO", True)
+    for name in ("_yolo", "_tesseract", "_extract_pool", "_page_pool"):
+        monkeypatch.setattr(warmup_service, name, fns.get(name, _ok))
+
+
+def test_optional_step_failure_keeps_instance_ready(monkeypatch):
+    _patch(monkeypatch, _yolo=_boom)
+    state = warmup_service.warm_up()
+    assert state["ready"] and state["degraded"] == ["yolo"]
+    assert state["steps"]["yolo"]["status"] == "error"
+    body = asyncio.run(health.ready())
+    assert body["status"] == "degraded"
+
+
+def test_required_step_failure_keeps_instance_unready(monkeypatch):
+    _patch(monkeypatch, _tesseract=_boom)
+    state = warmup_service.warm_up()
+    assert not state["ready"] and state["degraded"] == []
+    assert asyncio.run(health.ready()).status_code == 503
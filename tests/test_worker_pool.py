@@ -0,0 +1,121 @@
+# tests/test_worker_pool.py
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.utils import worker_pool
+from app.utils.worker_pool import ExtractionPool, PoolSaturated, StageTimeout
+
+
+@pytest.fixture
+def pool():
+    p = ExtractionPool(workers=1, queue_size=1, kind="thread")
+    yield p
+    p.shutdown()
+
+
+def test_admission_and_queue_position(pool):
+    assert pool.acquire() == 0            # worker libre
+    assert pool.acquire() == 1            # en file
+    with pytest.raises(PoolSaturated) as e:
+        pool.acquire()
+    assert e.value.queue_position == 2
+    pool.release()
+    assert pool.acquire() == 1
+    pool.release()
+    pool.release()
+    pool.release()                        # jamais négatif
+    assert pool.pending == 0
+
+
+def test_run_stage_returns_result(pool):
+    assert asyncio.run(pool.run_stage("classify", lambda a, b: a + b, 2, 3)) == 5
+
+
+def test_stage_timeout_keeps_future_and_worker(pool, monkeypatch):
+    monkeypatch.setitem(worker_pool.STAGE_TIMEOUTS, "extract", 0.1)
+    gate = threading.Event()
+
+    async def main():
+        with pytest.raises(StageTimeout) as e:
+            await pool.run_stage("extract", gate.wait, 5)
+        assert e.value.stage == "extract"
+        fut = e.value.future
+        assert not fut.done()                         # toujours dans le pool
+        assert pool._worker_slots().locked()          # son worker n'est pas rendu
+        gate.set()
+        assert await fut is True
+        await asyncio.sleep(0)
+        assert not pool._worker_slots().locked()
+
+    asyncio.run(main())
+
+
+def test_timeout_does_not_count_queue_wait(pool, monkeypatch):
+    # un seul worker : la 2e étape attend ~0.3s dans la file, puis s'exécute en ~0.1s
+    monkeypatch.setitem(worker_pool.STAGE_TIMEOUTS, "classify", 0.25)
+
+    async def main():
+        first = asyncio.create_task(pool.run_stage("classify", time.sleep, 0.2))
+        await asyncio.sleep(0.01)
+        second = pool.run_stage("classify", time.sleep, 0.1)
+        await asyncio.gather(first, second)
+
+    asyncio.run(main())
+
+
+def test_iterate_stage_tracks_every_step(pool):
+    tracked = []
+
+    def gen():
+        yield from range(3)
+
+    async def main():
+        return [x async for x in pool.iterate_stage("extract", gen(), track=tracked.append)]
+
+    assert asyncio.run(main()) == [0, 1, 2]
+    assert len(tracked) == 4 and all(f.done() for f in tracked)  # 3 éléments + fin
+
+
+def test_iterate_stage_budget_is_cumulative(pool, monkeypatch):
+    monkeypatch.setitem(worker_pool.STAGE_TIMEOUTS, "extract", 0.25)
+
+    def gen():
+        for i in range(5):
+            time.sleep(0.1)
+            yield i
+
+    async def main():
+        got = []
+        with pytest.raises(StageTimeout):
+            async for x in pool.iterate_stage("extract", gen()):
+                got.append(x)
+                await asyncio.sleep(0.2)          # lecture lente du client : hors budget
+        return got
+
+    assert asyncio.run(main()) == [0, 1]
+
+
+def test_no_queue_rejects_as_soon_as_workers_are_busy():
+    p = ExtractionPool(workers=2, queue_size=0, kind="thread")
+    try:
+        assert p.acquire() == 0 and p.acquire() == 0
+        with pytest.raises(PoolSaturated) as e:
+            p.acquire()
+        assert e.value.queue_position == 1
+    finally:
+        p.shutdown()
+
+
+def test_acquire_idle_takes_free_workers_only():
+    p = ExtractionPool(workers=3, queue_size=4, kind="thread")
+    try:
+        assert p.acquire() == 0
+        assert p.acquire_idle(5) == 2         # les deux workers restants, pas la file
+        assert p.acquire_idle(5) == 0
+        assert p.acquire() == 1               # la file reste disponible pour les autres
+        assert p.pending == 4
+    finally:
+        p.shutdown()